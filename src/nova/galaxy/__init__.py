@@ -1,13 +1,16 @@
-import importlib.metadata
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, Dict, List
 
-from .connection import Connection
-from .data_store import Datastore
-from .dataset import Dataset, DatasetCollection
-from .interfaces import BasicTool
-from .outputs import Outputs
-from .parameters import Parameters
-from .tool import Tool
-from .tool_runner import ToolRunner
+if TYPE_CHECKING:
+    from .connection import Connection
+    from .data_store import Datastore
+    from .dataset import Dataset, DatasetCollection
+    from .interfaces import BasicTool
+    from .outputs import Outputs
+    from .parameters import Parameters
+    from .tool import Tool
+    from .tool_runner import ToolRunner
+    from .workflow import Workflow
 
 __all__ = [
     "BasicTool",
@@ -19,6 +22,38 @@ __all__ = [
     "Parameters",
     "Tool",
     "ToolRunner",
+    "Workflow",
 ]
 
-__version__ = importlib.metadata.version("nova-galaxy")
+# Public names are resolved on first access so that importing the package (e.g. only for Parameters or Dataset)
+# does not pull in bioblend, blinker or the tool runner machinery.
+_LAZY_ATTRIBUTES: Dict[str, str] = {
+    "BasicTool": ".interfaces",
+    "Connection": ".connection",
+    "Datastore": ".data_store",
+    "Dataset": ".dataset",
+    "DatasetCollection": ".dataset",
+    "Outputs": ".outputs",
+    "Parameters": ".parameters",
+    "Tool": ".tool",
+    "ToolRunner": ".tool_runner",
+    "Workflow": ".workflow",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_ATTRIBUTES:
+        module = import_module(_LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+    elif name == "__version__":
+        from importlib.metadata import version
+
+        value = version("nova-galaxy")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__) | {"__version__"})
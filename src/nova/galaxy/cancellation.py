@@ -0,0 +1,124 @@
+"""Cooperative cancellation of transfers and wait loops."""
+
+import time
+from threading import Event
+from typing import Any, Callable, Dict, List, Optional
+
+from .rate_limit import RequestShedError
+
+# Seconds between two state checks of wait loops. Cancellation interrupts the wait between checks immediately.
+WAIT_INTERVAL = 3.0
+# Upper bound of the backoff after a status request was shed by the rate limiter.
+MAX_SHED_BACKOFF = 60.0
+
+
+class OperationCancelledError(Exception):
+    """Exception raised inside a transfer or wait loop when its cancellation token has been cancelled."""
+
+
+class CancellationToken:
+    """Signals transfers and wait loops of a job that they should stop.
+
+    Uploads and downloads check the token for every chunk, and wait loops sleep on it, so a cancel takes effect within
+    one chunk or one status request instead of after the whole operation.
+    """
+
+    def __init__(self) -> None:
+        self._event = Event()
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the token has been cancelled."""
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        """Cancels the token. Cancelling more than once has no further effect."""
+        self._event.set()
+
+    def raise_if_cancelled(self) -> None:
+        """Raises OperationCancelledError if the token has been cancelled."""
+        if self._event.is_set():
+            raise OperationCancelledError("The operation has been cancelled.")
+
+    def sleep(self, seconds: float) -> None:
+        """Sleeps for the given time, but raises OperationCancelledError as soon as the token is cancelled."""
+        if self._event.wait(max(seconds, 0)):
+            raise OperationCancelledError("The operation has been cancelled.")
+
+
+def check(token: Optional[CancellationToken]) -> None:
+    """Raises OperationCancelledError if the token is given and has been cancelled."""
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+def wait_for_state(
+    fetch: Callable[[], Dict[str, Any]],
+    terminal_states: List[str],
+    what: str,
+    token: Optional[CancellationToken] = None,
+    timeout: Optional[float] = None,
+    interval: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Polls a Galaxy object until it reaches a terminal state.
+
+    Parameters
+    ----------
+    fetch: Callable[[], Dict[str, Any]]
+        Returns the current details of the object, including its "state".
+    terminal_states: List[str]
+        The states after which the state no longer changes.
+    what: str
+        Description of the object for error messages, e.g. "Job 1234".
+    token: Optional[CancellationToken]
+        Stops waiting as soon as it is cancelled.
+    timeout: Optional[float]
+        Maximum number of seconds to wait. Waits without limit if not set.
+    interval: Optional[float]
+        Seconds between two requests. Defaults to WAIT_INTERVAL.
+
+    Returns
+    -------
+    Dict[str, Any]
+        The details of the object in state "ok".
+
+    Status requests that the rate limiter sheds because Galaxy is overloaded do not end the wait. They are retried with
+    a backoff that doubles up to MAX_SHED_BACKOFF seconds.
+
+    Raises
+    ------
+    OperationCancelledError
+        If the token is cancelled while waiting.
+    TimeoutError
+        If the object did not reach a terminal state in time.
+    Exception
+        If the object reached a terminal state other than "ok".
+    """
+    interval = WAIT_INTERVAL if interval is None else interval
+    deadline = None if timeout is None else time.monotonic() + timeout
+    state = "unknown"
+    backoff = interval
+    while True:
+        check(token)
+        try:
+            details = fetch()
+        except RequestShedError:
+            backoff = min(backoff * 2, MAX_SHED_BACKOFF)
+            delay = backoff
+        else:
+            state = details["state"]
+            if state in terminal_states:
+                if state != "ok":
+                    raise Exception(f"{what} is in terminal state {state}")
+                return details
+            backoff = interval
+            delay = interval
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"{what} did not reach a terminal state in time, last state was {state}.")
+            delay = min(delay, remaining)
+        if token is not None:
+            token.sleep(delay)
+        else:
+            time.sleep(delay)
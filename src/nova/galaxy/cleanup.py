@@ -0,0 +1,238 @@
+"""Background purging of datasets and histories that are no longer needed."""
+
+import atexit
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import partial
+from threading import Condition, Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .rate_limit import Priority, request_priority
+
+# Seconds to wait at interpreter exit for queued cleanup work.
+DRAIN_TIMEOUT = 10.0
+# Seconds that closing a connection or removing a data store waits for Galaxy to purge the histories.
+CLOSE_TIMEOUT = 30.0
+
+
+class _Task:
+    """A queued purge of datasets of a history or of a whole history."""
+
+    def __init__(
+        self, galaxy_instance: Any, history_id: str, dataset_ids: Optional[List[str]], stop_jobs: bool = False
+    ) -> None:
+        self.galaxy_instance = galaxy_instance
+        self.history_id = history_id
+        self.dataset_ids = dataset_ids
+        self.stop_jobs = stop_jobs
+        self.future: "Future[None]" = Future()
+        self.attempts = 0
+        self.not_before = 0.0
+
+
+class CleanupWorker:
+    """Purges datasets and histories in a background thread.
+
+    Callers get a future right away instead of waiting for Galaxy. All dataset purges queued for the same history are
+    combined into a single bulk request. Failed requests are retried with an exponential backoff. The thread stops
+    when there is no work left and is started again on demand.
+
+    Parameters
+    ----------
+    max_attempts: int
+        Number of attempts for each purge before its future fails.
+    retry_delay: float
+        Seconds to wait before the first retry. The delay doubles with every further attempt.
+    """
+
+    def __init__(self, max_attempts: int = 3, retry_delay: float = 1.0) -> None:
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._queue: List[_Task] = []
+        self._active = 0
+        self._condition = Condition()
+        self._thread: Optional[Thread] = None
+
+    def purge_datasets(self, galaxy_instance: Any, history_id: str, dataset_ids: List[str]) -> "Future[None]":
+        """Queues datasets of a history to be purged.
+
+        Returns
+        -------
+        Future[None]
+            Completes when the datasets have been purged.
+        """
+        return self._submit(_Task(galaxy_instance, history_id, list(dataset_ids)))
+
+    def purge_history(self, galaxy_instance: Any, history_id: str, stop_jobs: bool = False) -> "Future[None]":
+        """Queues a history to be purged.
+
+        Parameters
+        ----------
+        galaxy_instance: GalaxyInstance
+            The Galaxy instance of the history.
+        history_id: str
+            The id of the history.
+        stop_jobs: bool
+            Whether to cancel the jobs in the history before it is purged.
+
+        Returns
+        -------
+        Future[None]
+            Completes when the history has been purged.
+        """
+        return self._submit(_Task(galaxy_instance, history_id, None, stop_jobs))
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Waits until all queued work is done. Returns whether it finished in time."""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._queue and not self._active, timeout)
+
+    def _submit(self, task: _Task) -> "Future[None]":
+        with self._condition:
+            self._queue.append(task)
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name="nova-galaxy-cleanup", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+        return task.future
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while True:
+                    if not self._queue:
+                        self._thread = None
+                        self._condition.notify_all()
+                        return
+                    now = time.monotonic()
+                    ready = [task for task in self._queue if task.not_before <= now]
+                    if ready:
+                        break
+                    self._condition.wait(min(task.not_before for task in self._queue) - now)
+                self._queue = [task for task in self._queue if task not in ready]
+                self._active = len(ready)
+            with request_priority(Priority.LOW):
+                self._process(ready)
+            with self._condition:
+                self._active = 0
+                self._condition.notify_all()
+
+    def _process(self, tasks: List[_Task]) -> None:
+        batches: Dict[Tuple[int, str], List[_Task]] = {}
+        for task in tasks:
+            if task.dataset_ids is None:
+                self._attempt([task], partial(_purge_history, task))
+            else:
+                batches.setdefault((id(task.galaxy_instance), task.history_id), []).append(task)
+        for batch in batches.values():
+            dataset_ids = [dataset_id for task in batch for dataset_id in task.dataset_ids or []]
+            self._attempt(batch, partial(_purge_datasets, batch[0], dataset_ids))
+
+    def _attempt(self, tasks: List[_Task], purge: Callable[[], None]) -> None:
+        try:
+            purge()
+        except Exception as e:
+            retries = []
+            for task in tasks:
+                task.attempts += 1
+                if task.attempts >= self.max_attempts:
+                    task.future.set_exception(e)
+                else:
+                    task.not_before = time.monotonic() + self.retry_delay * 2 ** (task.attempts - 1)
+                    retries.append(task)
+            with self._condition:
+                self._queue.extend(retries)
+            return
+        for task in tasks:
+            task.future.set_result(None)
+
+
+def cancel_history_jobs(galaxy_instance: Any, history_id: str) -> None:
+    """Cancels all jobs in a history."""
+    jobs = galaxy_instance.jobs.get_jobs(history_id=history_id)
+    with request_priority(Priority.HIGH):
+        for job in jobs:
+            galaxy_instance.jobs.cancel_job(job["id"])
+
+
+def gather(futures: List["Future[None]"]) -> "Future[None]":
+    """Returns a future that completes when all given futures have completed, with the first error if any failed."""
+    result: "Future[None]" = Future()
+    pending = len(futures)
+    if not pending:
+        result.set_result(None)
+        return result
+    condition = Condition()
+
+    def done(_: "Future[None]") -> None:
+        nonlocal pending
+        with condition:
+            pending -= 1
+            if pending:
+                return
+        for future in futures:
+            error = future.exception()
+            if error:
+                result.set_exception(error)
+                return
+        result.set_result(None)
+
+    for future in futures:
+        future.add_done_callback(done)
+    return result
+
+
+def wait(future: "Future[None]", timeout: Optional[float] = CLOSE_TIMEOUT) -> "Future[None]":
+    """Waits for cleanup work to finish, but at most for the given time.
+
+    Errors of the work are raised. If it does not finish in time, it continues in the background and the future is
+    returned so that the caller can still wait for it.
+    """
+    try:
+        future.result(timeout)
+    except FutureTimeoutError:
+        pass
+    return future
+
+
+def _purge_history(task: _Task) -> None:
+    if task.stop_jobs:
+        cancel_history_jobs(task.galaxy_instance, task.history_id)
+    try:
+        task.galaxy_instance.histories.delete_history(history_id=task.history_id, purge=True)
+    except Exception as e:
+        if getattr(e, "status_code", None) != 404:
+            raise
+        # The history has already been removed.
+
+
+def _purge_datasets(task: _Task, dataset_ids: List[str]) -> None:
+    galaxy_instance = task.galaxy_instance
+    items = [{"id": dataset_id, "history_content_type": "dataset"} for dataset_id in dataset_ids]
+    try:
+        galaxy_instance.make_put_request(
+            f"{galaxy_instance.url}/histories/{task.history_id}/contents/bulk",
+            payload={"operation": "purge", "items": items},
+        )
+    except Exception as e:
+        if getattr(e, "status_code", None) not in [404, 405]:
+            raise
+        # Galaxy versions without bulk operations purge datasets one by one.
+        for dataset_id in dataset_ids:
+            galaxy_instance.histories.delete_dataset(history_id=task.history_id, dataset_id=dataset_id, purge=True)
+
+
+_worker = CleanupWorker()
+
+
+def get_cleanup_worker() -> CleanupWorker:
+    """Returns the cleanup worker shared by all connections."""
+    return _worker
+
+
+def _drain_at_exit() -> None:
+    _worker.drain(DRAIN_TIMEOUT)
+
+
+atexit.register(_drain_at_exit)
@@ -1,12 +1,19 @@
 """The NOVA class is responsible for managing interactions with a Galaxy server instance."""
 
-from typing import Any, List
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock, RLock
+from typing import Any, Dict, List, Optional, Tuple
 
 from bioblend import galaxy
 from deprecated import deprecated
 
+from .cleanup import CLOSE_TIMEOUT, gather, wait
 from .data_store import Datastore
-from .tool import stop_all_tools_in_store
+from .entry_points import EntryPointDiscovery
+from .rate_limit import RateLimiter, get_rate_limiter
+from .tool_schema import DEFAULT_SCHEMA_TTL, ToolSchemaCache
+from .transfer import TransferSettings
 
 
 class GalaxyConnectionError(Exception):
@@ -22,6 +29,41 @@ class GalaxyConnectionError(Exception):
         super().__init__(self.message)
 
 
+class RateLimitedGalaxyInstance(galaxy.GalaxyInstance):
+    """Galaxy instance that sends all API requests through a rate limiter.
+
+    File transfers, i.e. uploads with attached files and streamed downloads, bypass the limiter. They can take much
+    longer than the target latency without Galaxy being congested, and must not block a concurrency slot meanwhile.
+    """
+
+    def __init__(self, url: str, key: str, limiter: RateLimiter) -> None:
+        super().__init__(url=url, key=key)
+        self.limiter = limiter
+
+    def make_get_request(self, url: str, **kwargs: Any) -> Any:
+        if not url.startswith(self.url) or kwargs.get("stream"):
+            # Requests outside of the API, e.g. to interactive tool endpoints that are still starting up, and streamed
+            # downloads would be mistaken for Galaxy congestion.
+            return super().make_get_request(url, **kwargs)
+        return self.limiter.call(super().make_get_request, url, **kwargs)
+
+    def make_post_request(
+        self, url: str, payload: Optional[dict] = None, params: Optional[dict] = None, files_attached: bool = False
+    ) -> Any:
+        if files_attached:
+            return super().make_post_request(url, payload, params, files_attached)
+        return self.limiter.call(super().make_post_request, url, payload, params, files_attached)
+
+    def make_put_request(self, url: str, payload: Optional[dict] = None, params: Optional[dict] = None) -> Any:
+        return self.limiter.call(super().make_put_request, url, payload, params)
+
+    def make_patch_request(self, url: str, payload: Optional[dict] = None, params: Optional[dict] = None) -> Any:
+        return self.limiter.call(super().make_patch_request, url, payload, params)
+
+    def make_delete_request(self, url: str, payload: Optional[dict] = None, params: Optional[dict] = None) -> Any:
+        return self.limiter.call(super().make_delete_request, url, payload, params)
+
+
 class ConnectionHelper:
     """Manages datastore for current connection.
 
@@ -29,10 +71,63 @@ class ConnectionHelper:
     be persisted after connection is closed, unless Datastore.mark_for_cleanup() is called for that store.
     """
 
-    def __init__(self, galaxy_instance: galaxy.GalaxyInstance, galaxy_url: str):
+    def __init__(
+        self,
+        galaxy_instance: galaxy.GalaxyInstance,
+        galaxy_url: str,
+        transfer: Optional[TransferSettings] = None,
+        tool_schemas: Optional[ToolSchemaCache] = None,
+    ):
         self.galaxy_instance = galaxy_instance
         self.galaxy_url = galaxy_url
-        self.datastores: List[Datastore] = []
+        self.entry_points = EntryPointDiscovery(galaxy_instance, galaxy_url)
+        self.transfer = transfer or TransferSettings()
+        # Schemas of the tools run with this connection, used to validate parameters before any upload.
+        self.tool_schemas = tool_schemas
+        # Registry of data stores with one store per history, and the ids of known histories by name.
+        self._stores: Dict[str, Datastore] = {}
+        self._unresolved: Dict[str, Datastore] = {}
+        self._history_ids: Optional[Dict[str, str]] = None
+        self._registry_lock = RLock()
+        key = getattr(galaxy_instance, "key", None)
+        if key:
+            # Remembered for unpickling in this process and in workers forked from it.
+            _api_keys[galaxy_url] = key
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        """Support for pickling as the URL and settings, rebuilt from the connection pool of the unpickling process.
+
+        The API key is not pickled. The unpickling process uses the key it knows for the URL, see
+        get_pooled_connection().
+        """
+        return _get_pooled_connection, (self.galaxy_url, self._settings())
+
+    def _settings(self) -> "_Settings":
+        limiter = getattr(self.galaxy_instance, "limiter", None)
+        if limiter is None or limiter is get_rate_limiter(self.galaxy_url):
+            limiter_config = None
+        else:
+            limiter_config = (
+                limiter.rate,
+                limiter.burst,
+                limiter.max_concurrency,
+                limiter.min_concurrency,
+                limiter.target_latency,
+                tuple(sorted(limiter.shed_after.items())),
+            )
+        return (
+            self.transfer.compress,
+            self.transfer.compression_threshold,
+            self.transfer.compression_level,
+            self.tool_schemas.ttl if self.tool_schemas else None,
+            limiter_config,
+        )
+
+    @property
+    def datastores(self) -> List[Datastore]:
+        """The data stores fetched or created with this connection."""
+        with self._registry_lock:
+            return list(self._stores.values()) + list(self._unresolved.values())
 
     def __enter__(self) -> Any:
         """Enter method for use with "with" keyword."""
@@ -56,48 +151,209 @@ class ConnectionHelper:
     def get_data_store(self, name: str, create: bool = True) -> Datastore:
         """Fetches a datastore with the given name.
 
+        With create set, no request is sent to Galaxy. The history of the data store is looked up by name, or created
+        if it does not exist, the first time it is needed, e.g. when data is uploaded or a tool is run. Data stores that
+        are never used therefore cost nothing and leave no empty histories behind. The same Datastore object is
+        returned for every call with the same name.
+
         Parameters
         ----------
         name: str
             Name of the data store.
         create: bool
-            If true, creates a data store if one does not exist with the specified name.
+            If true, creates a data store if one does not exist with the specified name. If false, the history is looked
+            up right away.
 
         Returns
         -------
         Datastore
             Returns the specified or newly created data store.
         """
-        histories = self.galaxy_instance.histories.get_histories(name=name)
-        if len(histories) > 0:
-            store = Datastore(name, self, histories[0]["id"])
-            self.datastores.append(store)
-            return store
-        if create:
-            history_id = self.galaxy_instance.histories.create_history(name=name)["id"]
-            store = Datastore(name, self, history_id)
-            self.datastores.append(store)
-            return store
-        else:
+        with self._registry_lock:
+            store = self._unresolved.get(name)
+            if store:
+                return store
+            history_id = self._history_ids.get(name) if self._history_ids is not None else None
+            if history_id:
+                return self.bind_data_store(name, history_id)
+            store = Datastore(name, self)
+            self._unresolved[name] = store
+        if not create and not self.resolve_history(store, create=False):
+            self.forget_data_store(store)
             raise Exception("Data store does not exist and auto creation is set to false.")
+        return store
+
+    def get_data_stores(self, names: List[str], provision: bool = False) -> List[Datastore]:
+        """Fetches data stores for several names at once.
+
+        Parameters
+        ----------
+        names: List[str]
+            Names of the data stores.
+        provision: bool
+            If true, the histories of all data stores are looked up or created right away. The histories of the user are
+            listed with a single request and only missing histories are created, concurrently. Otherwise, the histories
+            are looked up or created on first use, as with get_data_store().
+
+        Returns
+        -------
+        List[Datastore]
+            The data stores in the order of the names.
+        """
+        stores = [self.get_data_store(name) for name in names]
+        missing = [store for store in stores if not store.has_history]
+        if provision and missing:
+            # List the histories again, so histories created elsewhere in the meantime are not created twice.
+            self._history_ids_by_name(refresh=True)
+            with ThreadPoolExecutor(max_workers=min(len(missing), 8)) as pool:
+                list(pool.map(lambda store: self.resolve_history(store, lookup=False), missing))
+        return stores
+
+    def bind_data_store(self, name: str, history_id: str) -> Datastore:
+        """Returns the data store for a known history without looking it up in Galaxy.
 
-    def remove_data_store(self, store: Datastore) -> None:
+        Parameters
+        ----------
+        name: str
+            Name of the data store.
+        history_id: str
+            Id of the Galaxy history of the data store.
+
+        Returns
+        -------
+        Datastore
+            The data store of the history. The same object is returned for every call with the same history.
+        """
+        with self._registry_lock:
+            store = self._stores.get(history_id)
+            if not store:
+                store = Datastore(name, self, history_id)
+                self._stores[history_id] = store
+            return store
+
+    def resolve_history(self, store: Datastore, create: bool = True, lookup: bool = True) -> Optional[str]:
+        """Binds a data store without a history to the history with its name, creating the history if needed.
+
+        Parameters
+        ----------
+        store: Datastore
+            The data store to resolve.
+        create: bool
+            Whether to create the history if it does not exist.
+        lookup: bool
+            Whether to look for a history that was created elsewhere since the histories were listed.
+
+        Returns
+        -------
+        Optional[str]
+            The id of the history, or None if it does not exist and create is false.
+        """
+        with store._history_lock:
+            if store._history_id is None:
+                history_id = self._find_history(store.name, lookup)
+                if not history_id:
+                    if not create:
+                        return None
+                    history_id = self.galaxy_instance.histories.create_history(name=store.name)["id"]
+                with self._registry_lock:
+                    if self._history_ids is not None:
+                        self._history_ids.setdefault(store.name, history_id)
+                    if self._unresolved.get(store.name) is store:
+                        del self._unresolved[store.name]
+                    self._stores.setdefault(history_id, store)
+                store._history_id = history_id
+            return store._history_id
+
+    def _history_ids_by_name(self, refresh: bool = False) -> Dict[str, str]:
+        with self._registry_lock:
+            if self._history_ids is not None and not refresh:
+                return self._history_ids
+        # Galaxy is asked without holding the registry lock, so other data stores can be used in the meantime.
+        history_ids: Dict[str, str] = {}
+        for history in self.galaxy_instance.histories.get_histories():
+            # Keep the first match, like a lookup by name does.
+            history_ids.setdefault(history["name"], history["id"])
+        with self._registry_lock:
+            if self._history_ids is not None:
+                if not refresh:
+                    return self._history_ids
+                # Keep histories created with this connection while the histories were listed.
+                for name, history_id in self._history_ids.items():
+                    history_ids.setdefault(name, history_id)
+            self._history_ids = history_ids
+            return history_ids
+
+    def _find_history(self, name: str, lookup: bool = True) -> Optional[str]:
+        with self._registry_lock:
+            listed = self._history_ids is not None
+        history_id = self._history_ids_by_name().get(name)
+        if history_id or not listed or not lookup:
+            return history_id
+        # The history may have been created elsewhere since the histories were listed.
+        histories = self.galaxy_instance.histories.get_histories(name=name)
+        if not histories:
+            return None
+        with self._registry_lock:
+            if self._history_ids is None:
+                return histories[0]["id"]
+            return self._history_ids.setdefault(name, histories[0]["id"])
+
+    def forget_data_store(self, store: Datastore) -> None:
+        """Removes a data store whose history has been deleted from the registry of this connection."""
+        with self._registry_lock:
+            if self._unresolved.get(store.name) is store:
+                del self._unresolved[store.name]
+            if store.has_history:
+                self._stores.pop(store.history_id, None)
+                if self._history_ids and self._history_ids.get(store.name) == store.history_id:
+                    del self._history_ids[store.name]
+
+    def remove_data_store(
+        self, store: Datastore, wait_for_purge: bool = True, timeout: Optional[float] = CLOSE_TIMEOUT
+    ) -> "Future[None]":
         """Permanently deletes the data store with the given name.
 
         Parameters
         ----------
         store: Datastore
             The data store to remove from this connection.
+        wait_for_purge: bool
+            Whether to wait until Galaxy has purged the history. Errors of the purge are raised in that case.
+        timeout: Optional[float]
+            Maximum number of seconds to wait. The purge continues in the background afterwards.
+
+        Returns
+        -------
+        Future[None]
+            Completes when the history of the data store has been purged.
         """
-        store.cleanup()
-        self.datastores.remove(store)
+        return store.cleanup(wait_for_purge=wait_for_purge, timeout=timeout)
+
+    def close(self, wait_for_purge: bool = True, timeout: Optional[float] = CLOSE_TIMEOUT) -> "Future[None]":
+        """Removes all data stores that are not persisted.
+
+        Their tools are stopped and their histories are purged together by the background cleanup worker.
+
+        Parameters
+        ----------
+        wait_for_purge: bool
+            Whether to wait until Galaxy has purged the histories. Errors of the purge are raised in that case.
+        timeout: Optional[float]
+            Maximum number of seconds to wait. The purge continues in the background afterwards.
 
-    def close(self) -> None:
-        # Remove all data stores after execution
-        for store in self.datastores:
-            if not store.persist_store:
-                stop_all_tools_in_store(store)
-                self.remove_data_store(store)
+        Returns
+        -------
+        Future[None]
+            Completes when all histories have been purged.
+        """
+        future = gather(
+            [
+                store.cleanup(stop_jobs=True, wait_for_purge=False)
+                for store in self.datastores
+                if not store.persist_store
+            ]
+        )
+        return wait(future, timeout) if wait_for_purge else future
 
 
 class Connection:
@@ -108,12 +364,22 @@ class Connection:
     ----------
         galaxy_url (Optional[str]): URL of the Galaxy instance.
         galaxy_api_key (Optional[str]): API key for the Galaxy instance.
+        compress_transfers (bool): Whether to compress large uploads.
+        compression_threshold (int): Minimum size in bytes for an upload to be compressed.
+        rate_limiter (Optional[RateLimiter]): Limiter for all requests of this connection.
+        validate_parameters (bool): Whether to check parameters against the tool inputs before submitting a job.
+        tool_schema_ttl (float): Seconds for which the inputs of a tool are cached for validation.
     """
 
     def __init__(
         self,
         galaxy_url: str,
         galaxy_key: str,
+        compress_transfers: bool = False,
+        compression_threshold: int = 1024 * 1024,
+        rate_limiter: Optional[RateLimiter] = None,
+        validate_parameters: bool = True,
+        tool_schema_ttl: float = DEFAULT_SCHEMA_TTL,
     ) -> None:
         """
         Initializes the Connection instance with the provided URL and API key.
@@ -121,9 +387,23 @@ class Connection:
         Args:
             galaxy_url str: URL of the Galaxy instance.
             galaxy_key str: API key for the Galaxy instance.
+            compress_transfers bool: Whether to gzip uploads above the compression threshold. Galaxy decompresses them
+                on upload. Compressed downloads are always accepted and decoded transparently.
+            compression_threshold int: Minimum size in bytes for an upload to be compressed.
+            rate_limiter Optional[RateLimiter]: Limiter for all requests of this connection. By default, all
+                connections to the same Galaxy server share one limiter.
+            validate_parameters bool: Whether to check parameters against the inputs of a tool before any input is
+                uploaded, so that unknown parameters and invalid values fail right away instead of after staging and
+                queueing.
+            tool_schema_ttl float: Seconds for which the inputs of a tool are cached for validation.
         """
         self.galaxy_url = galaxy_url
         self.galaxy_api_key = galaxy_key
+        self.compress_transfers = compress_transfers
+        self.compression_threshold = compression_threshold
+        self.rate_limiter = rate_limiter
+        self.validate_parameters = validate_parameters
+        self.tool_schema_ttl = tool_schema_ttl
         self.galaxy_instance: galaxy.GalaxyInstance
 
     def _init_galaxy_instance(self) -> None:
@@ -131,7 +411,8 @@ class Connection:
             raise ValueError("Galaxy URL and API key must be provided.")
         if not isinstance(self.galaxy_url, str):
             raise ValueError("Galaxy URL must be a string")
-        self.galaxy_instance = galaxy.GalaxyInstance(url=self.galaxy_url, key=self.galaxy_api_key)
+        limiter = self.rate_limiter or get_rate_limiter(self.galaxy_url)
+        self.galaxy_instance = RateLimitedGalaxyInstance(self.galaxy_url, self.galaxy_api_key, limiter)
         self.galaxy_instance.config.get_version()
 
     def connect(self) -> ConnectionHelper:
@@ -145,5 +426,77 @@ class Connection:
             ValueError: If the Galaxy URL or API key is not provided.
         """
         self._init_galaxy_instance()
-        conn = ConnectionHelper(self.galaxy_instance, self.galaxy_url)
+        transfer = TransferSettings(compress=self.compress_transfers, compression_threshold=self.compression_threshold)
+        tool_schemas = ToolSchemaCache(self.galaxy_instance, self.tool_schema_ttl) if self.validate_parameters else None
+        conn = ConnectionHelper(self.galaxy_instance, self.galaxy_url, transfer, tool_schemas)
         return conn
+
+
+# Transfer compression, threshold and level, tool schema TTL (None without validation), and the configuration of a
+# rate limiter that is not shared by all connections to the server (None for the shared one).
+_Settings = Tuple[bool, int, int, Optional[float], Optional[Tuple[Any, ...]]]
+_DEFAULT_SETTINGS: _Settings = (False, 1024 * 1024, 6, DEFAULT_SCHEMA_TTL, None)
+# Environment variable with the API key used for unpickled connections if this process has no key for their server.
+API_KEY_VARIABLE = "GALAXY_API_KEY"
+
+_pool: Dict[Tuple[str, str, _Settings], ConnectionHelper] = {}
+_pool_lock = Lock()
+_api_keys: Dict[str, str] = {}
+
+
+def get_pooled_connection(galaxy_url: str, galaxy_key: Optional[str] = None) -> ConnectionHelper:
+    """Returns the connection of this process to a Galaxy server, creating it on first use.
+
+    Unlike Connection.connect(), no request is sent to Galaxy to create the connection. Unpickled connections, data
+    stores, tools and datasets use the pooled connection, so workers of a process pool connect only once. Pickles do
+    not contain the API key. Unpickling uses the key of the last connection to the server created in this process,
+    including processes forked from it, or else the GALAXY_API_KEY environment variable. Workers that are not forked
+    can call this function with the key in the initializer of the pool.
+
+    Parameters
+    ----------
+    galaxy_url: str
+        URL of the Galaxy instance.
+    galaxy_key: Optional[str]
+        API key for the Galaxy instance. Defaults to the key known to this process for the URL.
+
+    Returns
+    -------
+    ConnectionHelper
+        The pooled connection. It is never closed, so its data stores are never cleaned up by this process.
+    """
+    return _get_pooled_connection(galaxy_url, _DEFAULT_SETTINGS, galaxy_key)
+
+
+def _get_pooled_connection(galaxy_url: str, settings: _Settings, galaxy_key: Optional[str] = None) -> ConnectionHelper:
+    key = galaxy_key or _api_keys.get(galaxy_url) or os.environ.get(API_KEY_VARIABLE)
+    if not key:
+        raise ValueError(f"No Galaxy API key for {galaxy_url}, set the {API_KEY_VARIABLE} environment variable.")
+    with _pool_lock:
+        connection = _pool.get((galaxy_url, key, settings))
+        if connection is None:
+            compress, compression_threshold, compression_level, schema_ttl, limiter_config = settings
+            if limiter_config is None:
+                limiter = get_rate_limiter(galaxy_url)
+            else:
+                rate, burst, max_concurrency, min_concurrency, target_latency, shed_after = limiter_config
+                limiter = RateLimiter(rate, burst, max_concurrency, min_concurrency, target_latency, dict(shed_after))
+            galaxy_instance = RateLimitedGalaxyInstance(galaxy_url, key, limiter)
+            connection = ConnectionHelper(
+                galaxy_instance,
+                galaxy_url,
+                TransferSettings(compress, compression_threshold, compression_level),
+                ToolSchemaCache(galaxy_instance, schema_ttl) if schema_ttl is not None else None,
+            )
+            _pool[(galaxy_url, key, settings)] = connection
+        return connection
+
+
+def _reset_pool() -> None:
+    global _pool_lock
+    _pool.clear()
+    _pool_lock = Lock()
+
+
+# Forked workers must not share the connections, and possibly held locks, of their parent.
+os.register_at_fork(after_in_child=_reset_pool)
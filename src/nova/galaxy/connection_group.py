@@ -0,0 +1,260 @@
+"""Groups of connections to spread tool runs across several Galaxy instances."""
+
+import time
+from concurrent.futures import Future
+from enum import Enum
+from threading import Lock
+from typing import Any, Dict, List, Optional, Sequence
+
+from .cleanup import CLOSE_TIMEOUT, gather, wait
+from .connection import Connection, ConnectionHelper
+from .data_store import Datastore
+from .dataset import AbstractData
+from .parameters import Parameters
+from .rate_limit import Priority, request_priority
+from .timeline import summarize
+
+# Galaxy job states that count towards the queue depth of an instance.
+_ACTIVE_JOB_STATES = ["new", "queued", "running"]
+# Maximum number of active jobs counted per instance. Instances with more active jobs are considered equally loaded.
+QUEUE_DEPTH_LIMIT = 10000
+
+
+class PlacementStrategy(Enum):
+    """How a connection group chooses the Galaxy instance for a tool run."""
+
+    WEIGHTED = 1
+    QUEUE_DEPTH = 2
+
+
+class _Instance:
+    """Placement state of a single Galaxy instance in a group."""
+
+    def __init__(self, connection: ConnectionHelper, weight: float) -> None:
+        self.connection = connection
+        self.weight = weight
+        self.current_weight = 0.0
+        self.queue_depth = 0
+        self.queue_depth_time = 0.0
+        self.tools: Dict[str, bool] = {}
+
+
+class ConnectionGroup:
+    """Connections to several Galaxy instances that are used as one.
+
+    Parameters
+    ----------
+    connections: Sequence[Connection]
+        Connections to the Galaxy instances of the group.
+    weights: Optional[Sequence[float]]
+        Relative capacity of each instance. Defaults to equal weights.
+    strategy: PlacementStrategy
+        WEIGHTED spreads runs in proportion to the weights. QUEUE_DEPTH places each run on the instance with the fewest
+        active jobs of the user relative to its weight. With both strategies, only instances that provide the tool are
+        considered.
+    queue_depth_ttl: float
+        Seconds for which the queue depth of an instance is reused before it is fetched again.
+    """
+
+    def __init__(
+        self,
+        connections: Sequence[Connection],
+        weights: Optional[Sequence[float]] = None,
+        strategy: PlacementStrategy = PlacementStrategy.QUEUE_DEPTH,
+        queue_depth_ttl: float = 5.0,
+    ) -> None:
+        if not connections:
+            raise ValueError("A connection group needs at least one connection.")
+        if weights is not None and len(weights) != len(connections):
+            raise ValueError("There must be one weight per connection.")
+        self.connections = list(connections)
+        self.weights = list(weights) if weights else [1.0] * len(connections)
+        self.strategy = strategy
+        self.queue_depth_ttl = queue_depth_ttl
+
+    def connect(self) -> "ConnectionGroupHelper":
+        """Connects to all Galaxy instances of the group.
+
+        Returns
+        -------
+        ConnectionGroupHelper
+            Manages the data stores of the group.
+        """
+        helpers = [connection.connect() for connection in self.connections]
+        return ConnectionGroupHelper(helpers, self.weights, self.strategy, self.queue_depth_ttl)
+
+
+class ConnectionGroupHelper:
+    """Manages data store groups for the current connections.
+
+    Should not be instantiated manually. Use ConnectionGroup.connect() instead.
+    """
+
+    def __init__(
+        self,
+        connections: List[ConnectionHelper],
+        weights: List[float],
+        strategy: PlacementStrategy,
+        queue_depth_ttl: float,
+    ) -> None:
+        self.connections = connections
+        self.strategy = strategy
+        self.queue_depth_ttl = queue_depth_ttl
+        self._instances = [
+            _Instance(connection, weight) for connection, weight in zip(connections, weights, strict=True)
+        ]
+        self._lock = Lock()
+
+    def __enter__(self) -> Any:
+        """Enter method for use with "with" keyword."""
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        """Exit method for use with "with" keyword."""
+        self.close()
+
+    def get_data_store(self, name: str) -> "DatastoreGroup":
+        """Fetches a data store group with the given name.
+
+        The data store of each instance is fetched or created when the first tool is placed on that instance.
+
+        Parameters
+        ----------
+        name: str
+            Name of the data stores.
+
+        Returns
+        -------
+        DatastoreGroup
+            A group that can be passed to Tool.run() in place of a data store.
+        """
+        return DatastoreGroup(name, self)
+
+    def close(self, wait_for_purge: bool = True, timeout: Optional[float] = CLOSE_TIMEOUT) -> "Future[None]":
+        """Closes the connections to all instances, see ConnectionHelper.close().
+
+        The histories of all instances are purged concurrently, so the timeout applies to all of them together.
+        """
+        future = gather([connection.close(wait_for_purge=False) for connection in self.connections])
+        return wait(future, timeout) if wait_for_purge else future
+
+    def place(self, tool_id: str, params: Optional[Parameters] = None) -> ConnectionHelper:
+        """Chooses the instance on which to run a tool.
+
+        Instances that already hold datasets used as inputs are preferred, so no data is moved between instances.
+        """
+        candidates = self._instances_with_inputs(params) or self._instances
+        available = [instance for instance in candidates if self._has_tool(instance, tool_id)]
+        if not available:
+            raise Exception(f"Tool {tool_id} is not available on any Galaxy instance of the group.")
+        if self.strategy != PlacementStrategy.WEIGHTED:
+            # Galaxy is asked without holding the lock, so placements are not serialized behind slow instances.
+            self._refresh_queue_depths(available)
+        with self._lock:
+            if self.strategy == PlacementStrategy.WEIGHTED:
+                instance = self._next_weighted(available)
+            else:
+                instance = min(available, key=lambda i: i.queue_depth / i.weight)
+            # Count the new run right away, so runs placed before the next refresh are spread as well.
+            instance.queue_depth += 1
+        return instance.connection
+
+    def _instances_with_inputs(self, params: Optional[Parameters]) -> List[_Instance]:
+        if not params:
+            return []
+        connections = {
+            id(value.store.nova_connection)
+            for value in params.inputs.values()
+            if isinstance(value, AbstractData) and value.id and value.store
+        }
+        return [instance for instance in self._instances if id(instance.connection) in connections]
+
+    def _has_tool(self, instance: _Instance, tool_id: str) -> bool:
+        if tool_id not in instance.tools:
+            try:
+                instance.connection.galaxy_instance.tools.show_tool(tool_id)
+                instance.tools[tool_id] = True
+            except Exception as e:
+                status_code = getattr(e, "status_code", None)
+                if status_code is None or not 400 <= status_code < 500:
+                    # The instance could not be reached, so check again on the next placement.
+                    return False
+                instance.tools[tool_id] = False
+        return instance.tools[tool_id]
+
+    def _next_weighted(self, instances: List[_Instance]) -> _Instance:
+        # Smooth weighted round robin: spreads runs in proportion to the weights without bursts on one instance.
+        total = sum(instance.weight for instance in instances)
+        for instance in instances:
+            instance.current_weight += instance.weight
+        selected = max(instances, key=lambda i: i.current_weight)
+        selected.current_weight -= total
+        return selected
+
+    def _refresh_queue_depths(self, instances: List[_Instance]) -> None:
+        """Fetches the number of active jobs of the instances whose count has expired."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [instance for instance in instances if now - instance.queue_depth_time > self.queue_depth_ttl]
+            # Claimed right away, so concurrent placements do not fetch the same count again.
+            for instance in expired:
+                instance.queue_depth_time = now
+        for instance in expired:
+            try:
+                with request_priority(Priority.LOW):
+                    jobs = instance.connection.galaxy_instance.jobs.get_jobs(
+                        state=_ACTIVE_JOB_STATES,  # type: ignore
+                        limit=QUEUE_DEPTH_LIMIT,
+                    )
+            except Exception:
+                continue
+            with self._lock:
+                instance.queue_depth = len(jobs)
+
+
+class DatastoreGroup:
+    """Data stores with the same name on all Galaxy instances of a connection group.
+
+    Pass it to Tool.run() in place of a Datastore to let the group choose the instance. The tool, its status and its
+    outputs are then bound to the data store of that instance, so they can be used as usual.
+    """
+
+    def __init__(self, name: str, connection_group: ConnectionGroupHelper) -> None:
+        self.name = name
+        self.connection_group = connection_group
+        self._stores: Dict[int, Datastore] = {}
+        self._persist_store: Optional[bool] = None
+        self._lock = Lock()
+
+    @property
+    def datastores(self) -> List[Datastore]:
+        """The data stores of the instances that have been used so far."""
+        return list(self._stores.values())
+
+    def select(self, tool_id: str, params: Optional[Parameters] = None) -> Datastore:
+        """Returns the data store of the instance chosen to run the given tool."""
+        connection = self.connection_group.place(tool_id, params)
+        with self._lock:
+            store = self._stores.get(id(connection))
+            if not store:
+                store = connection.get_data_store(self.name)
+                if self._persist_store is not None:
+                    store.persist_store = self._persist_store
+                self._stores[id(connection)] = store
+            return store
+
+    def persist(self) -> None:
+        """Persist the data stores of all instances even after the connections are closed."""
+        self._persist_store = True
+        for store in self.datastores:
+            store.persist()
+
+    def mark_for_cleanup(self) -> None:
+        """Clean up the data stores of all instances after the connections are closed."""
+        self._persist_store = False
+        for store in self.datastores:
+            store.mark_for_cleanup()
+
+    def get_timeline_stats(self) -> Dict[str, Dict[str, float]]:
+        """Aggregates the lifecycle timelines of all jobs run in the group."""
+        return summarize(timeline for store in self.datastores for timeline in store.timelines)
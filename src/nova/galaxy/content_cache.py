@@ -0,0 +1,182 @@
+"""Shared cache for the content of datasets downloaded from Galaxy."""
+
+import os
+import re
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_BLOCK_CACHE_BYTES = 32 * 1024 * 1024
+
+
+class ContentCache:
+    """Memory-budgeted LRU cache for dataset content.
+
+    Galaxy datasets are immutable once they are created, so their content can be cached by dataset id. When the memory
+    budget is exceeded, the least recently used entries are evicted. If a spill directory is configured, evicted
+    entries are written there and loaded back on the next access instead of being downloaded again.
+
+    Parameters
+    ----------
+    max_bytes: int
+        Maximum number of content bytes to keep in memory.
+    spill_dir: Optional[str]
+        Local directory to which evicted entries are written. Evicted entries are discarded if not set.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, spill_dir: Optional[str] = None) -> None:
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    @property
+    def size(self) -> int:
+        """Number of content bytes currently held in memory."""
+        return self._size
+
+    def __len__(self) -> int:
+        """Number of entries currently held in memory."""
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        """Checks if the key is cached in memory or in the spill directory."""
+        with self._lock:
+            if key in self._entries:
+                return True
+        spill_path = self._spill_path(key)
+        return spill_path is not None and os.path.exists(spill_path)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Returns the cached content for the key, or None if it is not cached."""
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return content
+        content = self._load_spilled(key)
+        with self._lock:
+            if content is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self.put(key, content)
+        return content
+
+    def put(self, key: str, content: bytes) -> None:
+        """Adds content to the cache, evicting the least recently used entries if needed."""
+        content = bytes(content)
+        spilled = []
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            if len(content) > self.max_bytes:
+                spilled.append((key, content))
+            else:
+                self._entries[key] = content
+                self._size += len(content)
+                while self._size > self.max_bytes:
+                    evicted_key, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+                    self.evictions += 1
+                    spilled.append((evicted_key, evicted))
+        for spilled_key, spilled_content in spilled:
+            self._spill(spilled_key, spilled_content)
+
+    def clear(self) -> None:
+        """Removes all entries, including spilled ones, and resets the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+        if self.spill_dir and os.path.isdir(self.spill_dir):
+            for file_name in os.listdir(self.spill_dir):
+                if file_name.endswith(".cache"):
+                    os.remove(os.path.join(self.spill_dir, file_name))
+
+    def _spill_path(self, key: str) -> Optional[str]:
+        if not self.spill_dir:
+            return None
+        return os.path.join(self.spill_dir, f"{re.sub(r'[^A-Za-z0-9_.-]', '_', key)}.cache")
+
+    def _spill(self, key: str, content: bytes) -> None:
+        spill_path = self._spill_path(key)
+        if not spill_path or os.path.exists(spill_path):
+            return
+        tmp_path = f"{spill_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(content)
+        os.replace(tmp_path, spill_path)
+
+    def _load_spilled(self, key: str) -> Optional[bytes]:
+        spill_path = self._spill_path(key)
+        if not spill_path:
+            return None
+        try:
+            with open(spill_path, "rb") as file:
+                return file.read()
+        except OSError:
+            return None
+
+
+_content_cache = ContentCache()
+_block_cache = ContentCache(max_bytes=DEFAULT_BLOCK_CACHE_BYTES)
+
+
+def get_content_cache() -> ContentCache:
+    """Returns the content cache shared by all datasets."""
+    return _content_cache
+
+
+def get_block_cache() -> ContentCache:
+    """Returns the cache for blocks fetched by ranged reads of datasets, shared by all datasets."""
+    return _block_cache
+
+
+def configure_block_cache(max_bytes: int = DEFAULT_BLOCK_CACHE_BYTES) -> ContentCache:
+    """Replaces the shared block cache with a new one using the given memory budget.
+
+    Parameters
+    ----------
+    max_bytes: int
+        Maximum number of block bytes to keep in memory.
+
+    Returns
+    -------
+    ContentCache
+        The new shared block cache.
+    """
+    global _block_cache
+    _block_cache = ContentCache(max_bytes=max_bytes)
+    return _block_cache
+
+
+def configure_content_cache(max_bytes: int = DEFAULT_MAX_BYTES, spill_dir: Optional[str] = None) -> ContentCache:
+    """Replaces the shared content cache with a new one using the given memory budget and spill directory.
+
+    Parameters
+    ----------
+    max_bytes: int
+        Maximum number of content bytes to keep in memory.
+    spill_dir: Optional[str]
+        Local directory to which evicted entries are written. Evicted entries are discarded if not set.
+
+    Returns
+    -------
+    ContentCache
+        The new shared content cache.
+    """
+    global _content_cache
+    _content_cache = ContentCache(max_bytes=max_bytes, spill_dir=spill_dir)
+    return _content_cache
@@ -1,12 +1,20 @@
 """DataStore is used to configure Galaxy to group outputs of a tool together."""
 
-from typing import TYPE_CHECKING, List
+from collections import deque
+from concurrent.futures import Future
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional, Tuple
 
 if TYPE_CHECKING:
     from .connection import ConnectionHelper  # Only imports for type checking
 
+from .cleanup import CLOSE_TIMEOUT, gather, get_cleanup_worker, wait
+from .timeline import Timeline, summarize, to_trace_events
 from .tool import Tool
 
+# Number of job timelines kept per data store for statistics and traces. Older timelines are dropped.
+MAX_TIMELINES = 1000
+
 
 class Datastore:
     """Groups tool outputs together.
@@ -14,11 +22,51 @@ class Datastore:
     The constructor is not intended for external use. Use nova.galaxy.Connection.create_data_store() instead.
     """
 
-    def __init__(self, name: str, nova_connection: "ConnectionHelper", history_id: str) -> None:
+    def __init__(self, name: str, nova_connection: "ConnectionHelper", history_id: Optional[str] = None) -> None:
         self.name = name
         self.nova_connection = nova_connection
-        self.history_id = history_id
+        self._history_id = history_id
+        self._history_lock = Lock()
         self.persist_store = True
+        self.timelines: Deque[Timeline] = deque(maxlen=MAX_TIMELINES)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        """Support for pickling as a handle to the same history.
+
+        The unpickled store uses the pooled connection of the unpickling process (see
+        nova.galaxy.connection.get_pooled_connection()) and is never cleaned up by that process.
+        """
+        return _bind_data_store, (self.nova_connection, self.name, self._history_id)
+
+    @property
+    def history_id(self) -> str:
+        """Id of the Galaxy history of this store. The history is looked up or created on first access."""
+        history_id = self.get_history_id()
+        if not history_id:
+            raise Exception(f"Data store {self.name} has no history.")
+        return history_id
+
+    @property
+    def has_history(self) -> bool:
+        """Whether this store has been bound to its Galaxy history."""
+        return self._history_id is not None
+
+    def get_history_id(self, create: bool = True) -> Optional[str]:
+        """Returns the id of the Galaxy history of this store.
+
+        Parameters
+        ----------
+        create: bool
+            Whether to create the history if it does not exist yet.
+
+        Returns
+        -------
+        Optional[str]
+            The id of the history, or None if it does not exist and create is false.
+        """
+        if self._history_id is not None:
+            return self._history_id
+        return self.nova_connection.resolve_history(self, create=create)
 
     def persist(self) -> None:
         """Persist this store even after the nova connection is closed.
@@ -32,9 +80,33 @@ class Datastore:
         """Clean up and delete all content related to this Data Store after the associated connection is closed."""
         self.persist_store = False
 
-    def cleanup(self) -> None:
-        history = self.nova_connection.galaxy_instance.histories.get_histories(name=self.name)[0]["id"]
-        self.nova_connection.galaxy_instance.histories.delete_history(history_id=history, purge=True)
+    def cleanup(
+        self, stop_jobs: bool = False, wait_for_purge: bool = True, timeout: Optional[float] = CLOSE_TIMEOUT
+    ) -> "Future[None]":
+        """Purges the history of this store.
+
+        The store is removed from its connection right away and the history is purged by the background cleanup worker.
+
+        Parameters
+        ----------
+        stop_jobs: bool
+            Whether to cancel the jobs in the history before it is purged.
+        wait_for_purge: bool
+            Whether to wait until Galaxy has purged the history. Errors of the purge are raised in that case.
+        timeout: Optional[float]
+            Maximum number of seconds to wait. The purge continues in the background afterwards.
+
+        Returns
+        -------
+        Future[None]
+            Completes when Galaxy has purged the history.
+        """
+        history_id = self.get_history_id(create=False)
+        self.nova_connection.forget_data_store(self)
+        if not history_id:
+            return gather([])
+        future = get_cleanup_worker().purge_history(self.nova_connection.galaxy_instance, history_id, stop_jobs)
+        return wait(future, timeout) if wait_for_purge else future
 
     def recover_tools(self, filter_running: bool = True) -> List[Tool]:
         """Recovers all running tools in this data_store.
@@ -51,13 +123,16 @@ class Datastore:
         -------
             List of tools from this data store.
         """
+        history_id = self.get_history_id(create=False)
+        if not history_id:
+            return []
         if filter_running:
             states = ["running", "queued"]
         else:
             states = ["running", "queued", "ok", "error"]
         jobs = self.nova_connection.galaxy_instance.jobs.get_jobs(
             state=states,  # type: ignore
-            history_id=self.history_id,
+            history_id=history_id,
         )
         tools = []
         for job in jobs:
@@ -67,3 +142,39 @@ class Datastore:
             t.assign_id(job_id, self)
             tools.append(t)
         return tools
+
+    def track_timeline(self, timeline: Timeline) -> None:
+        """Adds the timeline of a job run in this store to the statistics. Only the latest MAX_TIMELINES are kept."""
+        self.timelines.append(timeline)
+
+    def get_timeline_stats(self) -> Dict[str, Dict[str, float]]:
+        """Aggregates the lifecycle timelines of the jobs run in this store, up to the latest MAX_TIMELINES.
+
+        Returns
+        -------
+            For each phase (UPLOADING_DATA, QUEUED, RUNNING, DOWNLOADING, ...), the number of jobs that went through it
+            and the total, mean and maximum time in seconds.
+        """
+        return summarize(self.timelines)
+
+    def export_trace(self, path: Optional[str] = None) -> Dict[str, Any]:
+        """Exports the timelines of the jobs run in this store, up to the latest MAX_TIMELINES, as trace event JSON.
+
+        The trace can be opened in Perfetto or chrome://tracing.
+
+        Parameters
+        ----------
+        path: Optional[str]
+            If given, the trace is also written to this file.
+
+        Returns
+        -------
+            The trace as a JSON-serializable dictionary.
+        """
+        return to_trace_events(self.timelines, path)
+
+
+def _bind_data_store(nova_connection: "ConnectionHelper", name: str, history_id: Optional[str]) -> Datastore:
+    if history_id is None:
+        return nova_connection.get_data_store(name)
+    return nova_connection.bind_data_store(name, history_id)
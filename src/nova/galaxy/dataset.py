@@ -4,16 +4,41 @@ AbstractData objects are used to encapsulate data for use in Galaxy tools,
 as well as output data from Galaxy tools.
 """
 
+import mmap
+import os
+import time
 from abc import ABC, abstractmethod
 from enum import Enum
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Optional, Union
-
-from bioblend.galaxy.dataset_collections import DatasetCollectionClient
-from bioblend.galaxy.datasets import DatasetClient
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Literal, Optional, Union
+from urllib.parse import urlparse
+
+from .cancellation import CancellationToken, OperationCancelledError, check, wait_for_state
+from .content_cache import get_block_cache, get_content_cache
+from .local_cache import content_key, get_local_cache
+from .prefetch import wait_for_prefetch
+from .transfer import (
+    RANGE_BLOCK_SIZE,
+    BufferReader,
+    StreamReader,
+    fetch_datasets,
+    get_range,
+    is_buffer,
+    is_compressed_file,
+    iter_response,
+    upload_compressed,
+    upload_file,
+    upload_stream,
+)
 
 if TYPE_CHECKING:
     from .data_store import Datastore
+    from .timeline import Timeline
+
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+# Seconds to wait for Galaxy to process a dataset.
+DATASET_WAIT_TIMEOUT = 12000.0
 
 
 class DataState(Enum):
@@ -40,6 +65,41 @@ class DatasetRegistrationError(Exception):
         super().__init__(self.message, self.details)
 
 
+class DataChunk:
+    """Part of the content of a dataset.
+
+    Attributes
+    ----------
+        data (bytes): The bytes of this chunk.
+        offset (int): Position of the first byte of this chunk in the whole content.
+        total (Optional[int]): Size of the whole content in bytes, if known.
+    """
+
+    def __init__(self, data: bytes, offset: int, total: Optional[int] = None):
+        self.data = data
+        self.offset = offset
+        self.total = total
+
+    @property
+    def progress(self) -> Optional[float]:
+        """Fraction of the whole content delivered up to and including this chunk, if the total size is known."""
+        if not self.total:
+            return None
+        return min((self.offset + len(self.data)) / self.total, 1.0)
+
+
+def iter_chunks(content: Any, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[DataChunk]:
+    """Splits in-memory content into chunks."""
+    if not is_buffer(content):
+        content = str(content).encode("utf-8")
+    reader = BufferReader(content)
+    total = reader.len
+    offset = 0
+    while data := reader.read(chunk_size):
+        yield DataChunk(data, offset, total)
+        offset += len(data)
+
+
 class AbstractData(ABC):
     """Encapsulates data for use in Galaxy toools."""
 
@@ -65,6 +125,9 @@ class AbstractData(ABC):
     def cancel_upload(self) -> None:
         raise NotImplementedError()
 
+    def copy_to(self, store: "Datastore") -> "AbstractData":
+        raise NotImplementedError()
+
 
 class Dataset(AbstractData):
     """Singular file that can be uploaded and used in a Galaxy tool.
@@ -79,8 +142,69 @@ class Dataset(AbstractData):
         self.store: Optional["Datastore"] = None
         self.file_type: str = Path(path).suffix
         self._content: Any = None
+        self.timeline: Optional["Timeline"] = None
+        self._dataset_info: Dict[str, Dict[str, Any]] = {}
+        self._source: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_server_path(
+        cls, path: str, name: Optional[str] = None, link: bool = False, file_type: str = "auto"
+    ) -> "Dataset":
+        """Creates a dataset from a file that Galaxy can read on its own file system, e.g. on a shared file system.
 
-    def upload(self, store: "Datastore", name: Optional[str] = None) -> None:
+        Uploading the dataset lets Galaxy import the file, so no content is transferred from the client. Importing
+        server paths has to be allowed for the user by the Galaxy instance (usually admins or `allow_path_paste`).
+
+        Parameters
+        ----------
+        path: str
+            The path of the file on the Galaxy server.
+        name: Optional[str]
+            The name of the dataset. Defaults to the file name.
+        link: bool
+            Whether Galaxy should link to the file instead of copying it. Linked files must not be changed or removed
+            while the dataset is in use.
+        file_type: str
+            The Galaxy datatype of the file. Detected by Galaxy by default.
+        """
+        dataset = cls(path, name)
+        dataset._source = {"src": "path", "path": path, "ext": file_type}
+        if link:
+            dataset._source["link_data_only"] = True
+        return dataset
+
+    @classmethod
+    def from_url(cls, url: str, name: Optional[str] = None, file_type: str = "auto") -> "Dataset":
+        """Creates a dataset from a URL that Galaxy downloads itself when the dataset is uploaded.
+
+        Parameters
+        ----------
+        url: str
+            The URL of the file.
+        name: Optional[str]
+            The name of the dataset. Defaults to the file name in the URL.
+        file_type: str
+            The Galaxy datatype of the file. Detected by Galaxy by default.
+        """
+        dataset = cls(name=name or Path(urlparse(url).path).name or url)
+        dataset._source = {"src": "url", "url": url, "ext": file_type}
+        return dataset
+
+    @property
+    def is_server_import(self) -> bool:
+        """Whether Galaxy imports this dataset from a server path or URL instead of receiving it from the client."""
+        return self._source is not None and not self._has_content()
+
+    def _has_content(self) -> bool:
+        """Checks if content has been set or loaded into memory."""
+        if self._content is None:
+            return False
+        if is_buffer(self._content):
+            # Buffers such as NumPy arrays do not support truth testing, so check their size instead.
+            return memoryview(self._content).nbytes > 0
+        return bool(self._content)
+
+    def upload(self, store: "Datastore", name: Optional[str] = None, token: Optional[CancellationToken] = None) -> None:
         """Uploads this dataset to the data store given.
 
         This method will automatically set the id, and store class variables for future use.
@@ -91,29 +215,152 @@ class Dataset(AbstractData):
             The data store to upload this dataset to.
         name: Optional[str]
             The name that will be used for the dataset upstream. Defaults to the local name.
+        token: Optional[CancellationToken]
+            Aborts the upload, or waiting for Galaxy to process it, as soon as it is cancelled.
         """
+        self.start_upload(store, name, token)
+        wait_for_dataset(store.nova_connection.galaxy_instance, self.id, token)
+
+    def start_upload(
+        self, store: "Datastore", name: Optional[str] = None, token: Optional[CancellationToken] = None
+    ) -> str:
+        """Starts uploading this dataset to the data store given, without waiting for Galaxy to process it.
+
+        Content set with set_content() is uploaded directly: strings are pasted as text, while bytes, memoryview and
+        other buffer-protocol objects (e.g. NumPy arrays) are streamed as binary data without intermediate copies.
+        Datasets created with from_server_path() or from_url() are imported by Galaxy itself. Otherwise, the file at
+        the path of this dataset is uploaded.
+
+        Parameters
+        ----------
+        store: Datastore
+            The data store to upload this dataset to.
+        name: Optional[str]
+            The name that will be used for the dataset upstream. Defaults to the local name.
+        token: Optional[CancellationToken]
+            Aborts the upload as soon as it is cancelled, also in the middle of the transfer. Files are still uploaded
+            in resumable chunks, and the token is checked between them.
+
+        Returns
+        -------
+        str
+            The id of the new dataset in Galaxy.
+
+        Raises
+        ------
+        OperationCancelledError
+            If the token was cancelled. No dataset is created in Galaxy for an aborted transfer.
+        """
+        check(token)
+        if self.is_server_import:
+            return import_datasets(store, [self], [name or self.name])[0]
         galaxy_instance = store.nova_connection.galaxy_instance
-        dataset_client = DatasetClient(galaxy_instance)
-        history_id = galaxy_instance.histories.get_histories(name=store.name)[0]["id"]
-        if name:
-            file_name = name
-        else:
-            file_name = self.name
-        if self._content:
-            dataset_info = galaxy_instance.tools.paste_content(
-                content=self._content, history_id=history_id, file_name=file_name
-            )
+        transfer = store.nova_connection.transfer
+        file_name = name or self.name
+        source: Union[BufferReader, StreamReader]
+        if self._has_content():
+            if is_buffer(self._content):
+                source = BufferReader(self._content, token)
+                binary = True
+            else:
+                text = str(self._content)
+                if not transfer.should_compress(len(text)):
+                    dataset_info = galaxy_instance.tools.paste_content(
+                        content=text, history_id=store.history_id, file_name=file_name
+                    )
+                    transfer.record_upload(len(text), len(text))
+                    return self._set_uploaded(dataset_info, store)
+                source = BufferReader(text.encode("utf-8"), token)
+                binary = False
         else:
-            dataset_info = galaxy_instance.tools.upload_file(path=self.path, history_id=history_id, file_name=file_name)
+            size = os.path.getsize(self.path)
+            if not transfer.should_compress(size) or is_compressed_file(self.path):
+                if token is None:
+                    dataset_info = galaxy_instance.tools.upload_file(
+                        path=self.path, history_id=store.history_id, file_name=file_name
+                    )
+                else:
+                    dataset_info = upload_file(galaxy_instance, store.history_id, self.path, file_name, token)
+                transfer.record_upload(size, size)
+                return self._set_uploaded(dataset_info, store)
+            source = StreamReader(open(self.path, "rb"), size, token)
+            # Files are uploaded with the same line ending conversion as upload_file(), which Galaxy skips for binary
+            # data.
+            binary = False
+        try:
+            size = source.len
+            if transfer.should_compress(size):
+                dataset_info, sent = upload_compressed(
+                    galaxy_instance,
+                    store.history_id,
+                    file_name,
+                    source,
+                    transfer.compression_level,
+                    to_posix_lines=not binary,
+                    token=token,
+                )
+            else:
+                sent = size
+                dataset_info = upload_stream(
+                    galaxy_instance, store.history_id, file_name, source, to_posix_lines=not binary
+                )
+        finally:
+            source.close()
+        transfer.record_upload(size, sent)
+        return self._set_uploaded(dataset_info, store)
+
+    def _set_uploaded(self, dataset_info: Dict[str, Any], store: "Datastore") -> str:
         self.id = dataset_info["outputs"][0]["id"]
         self.store = store
-        dataset_client.wait_for_dataset(self.id)
+        return self.id
 
-    def download(self, local_path: str) -> AbstractData:
-        """Downloads this dataset to the local path given."""
+    def copy_to(self, store: "Datastore") -> "Dataset":
+        """Copies this dataset to another data store inside of Galaxy.
+
+        The copy references the same data on the server, so no content is transferred.
+
+        Parameters
+        ----------
+        store: Datastore
+            The data store to copy this dataset to.
+
+        Returns
+        -------
+        Dataset
+            The new dataset in the given data store.
+        """
+        if not self.store or not self.id:
+            raise Exception("Dataset is not present in Galaxy.")
+        info = store.nova_connection.galaxy_instance.histories.copy_dataset(store.history_id, self.id)
+        return self._copy_bound_to(info["id"], store)
+
+    def _copy_bound_to(self, dataset_id: str, store: "Datastore") -> "Dataset":
+        copy = Dataset(self.path, self.name)
+        copy.id = dataset_id
+        copy.store = store
+        copy.file_type = self.file_type
+        return copy
+
+    def download(self, local_path: str, token: Optional[CancellationToken] = None) -> AbstractData:
+        """Downloads this dataset to the local path given.
+
+        The content is streamed to the file, so it is never held in memory as a whole. Content that is already in the
+        shared content cache, e.g. because it was prefetched, is written without downloading it again. If the given
+        cancellation token is cancelled, the download stops before the next chunk with OperationCancelledError and
+        the partially written file is removed.
+        """
         if self.store and self.id:
-            dataset_client = DatasetClient(self.store.nova_connection.galaxy_instance)
-            dataset_client.download_dataset(self.id, use_default_filename=False, file_path=local_path)
+            content = self._cached_content()
+            try:
+                with open(local_path, "wb") as file:
+                    if content is not None:
+                        file.write(content)
+                    else:
+                        for data in self._download_chunks(token=token):
+                            file.write(data)
+            except OperationCancelledError:
+                os.remove(local_path)
+                raise
             return self
         else:
             raise Exception("Dataset is not present in Galaxy.")
@@ -122,28 +369,35 @@ class Dataset(AbstractData):
         """Directly set the content of this dataset.
 
         Use this method if instead of having a dataset load from a file, you want to directly pass in content.
-        Note, the content must be able to be serialized as a string in order to facilitate the uploading process.
+        Binary content (bytes, memoryview or any other object supporting the buffer protocol, such as NumPy arrays) is
+        uploaded as is. Any other content must be able to be serialized as a string in order to facilitate the
+        uploading process.
         """
-        try:
-            str(content)
-            self._content = content
-            self.file_type = file_type
-        except Exception as e:
-            raise Exception("Dataset content must be able to be serialized as a string.") from e
+        if not is_buffer(content):
+            try:
+                str(content)
+            except Exception as e:
+                raise Exception("Dataset content must be binary or able to be serialized as a string.") from e
+        self._content = content
+        self.file_type = file_type
 
     def get_content(self) -> Any:
         """Get the content of this dataset.
 
         If the content is not already present in memory, this method will download and/or load the file content into
-        memory. If not careful, this can cause performance issues with large datasets. For larger files, consider
-        using the download() method and writing the file to a local path.
+        memory. Content downloaded from Galaxy is kept in a shared cache with a limited memory budget (see
+        nova.galaxy.content_cache), so repeated calls for the same dataset do not download it again. For larger files,
+        consider using the download() method and writing the file to a local path.
         """
-        if self._content:
+        if self._has_content():
             return self._content
         try:
             if self.store and self.id:
-                dataset_client = DatasetClient(self.store.nova_connection.galaxy_instance)
-                self._content = dataset_client.download_dataset(self.id, use_default_filename=False, file_path=None)
+                content = self._cached_content()
+                if content is None:
+                    content = b"".join(self._download_chunks())
+                    get_content_cache().put(self._cache_key(), content)
+                return content
             else:
                 with open(self.path, "r") as file:
                     self._content = file.read()
@@ -151,6 +405,417 @@ class Dataset(AbstractData):
             raise Exception(f"Dataset is not present in Galaxy or locally. Error Details: {e}") from e
         return self._content
 
+    def iter_content(
+        self, chunk_size: int = DEFAULT_CHUNK_SIZE, token: Optional[CancellationToken] = None
+    ) -> Iterator[DataChunk]:
+        """Iterate over the content of this dataset in chunks.
+
+        Unlike get_content(), content that has to be downloaded from Galaxy or read from a local file is streamed and
+        never held in memory as a whole.
+
+        Parameters
+        ----------
+        chunk_size: int
+            Maximum size of each chunk in bytes.
+        token: Optional[CancellationToken]
+            Stops a download from Galaxy before the next chunk with OperationCancelledError once it is cancelled.
+
+        Returns
+        -------
+        Iterator[DataChunk]
+            The chunks of the content, each with its offset and the total size if known.
+        """
+        if self._has_content():
+            yield from iter_chunks(self._content, chunk_size)
+            return
+        if self.store and self.id:
+            content = self._cached_content()
+            if content is not None:
+                yield from iter_chunks(content, chunk_size)
+                return
+            start = time.time()
+            try:
+                response = self._open_download(token)
+                length = response.headers.get("content-length", None)
+                # The length of compressed responses is the compressed size, not the size of the delivered content.
+                encoded = response.headers.get("content-encoding", "identity") != "identity"
+                total = int(length) if length and not encoded else None
+                offset = 0
+                for data in iter_response(response, chunk_size, self.store.nova_connection.transfer, token):
+                    yield DataChunk(data, offset, total)
+                    offset += len(data)
+            finally:
+                if self.timeline:
+                    self.timeline.record_download(start, time.time())
+        elif self.path:
+            total = os.path.getsize(self.path)
+            offset = 0
+            with open(self.path, "rb") as file:
+                while data := file.read(chunk_size):
+                    yield DataChunk(data, offset, total)
+                    offset += len(data)
+        else:
+            raise Exception("Dataset is not present in Galaxy or locally.")
+
+    def read_range(self, offset: int, length: int) -> bytes:
+        """Read a part of the content of this dataset.
+
+        For datasets in Galaxy, only the blocks covering the range are fetched, using HTTP range requests. Fetched
+        blocks are kept in a shared block cache (see nova.galaxy.content_cache.get_block_cache()), so reading the same
+        or neighbouring ranges again, e.g. while scrolling through a preview, does not fetch them again.
+
+        Parameters
+        ----------
+        offset: int
+            Position of the first byte to read.
+        length: int
+            Maximum number of bytes to read. Fewer bytes are returned if the range extends past the end of the content.
+
+        Returns
+        -------
+        bytes
+            The content in the range.
+        """
+        if offset < 0 or length < 0:
+            raise ValueError("Offset and length must not be negative.")
+        if self._has_content():
+            return self._content_bytes()[offset : offset + length]
+        if self.store and self.id:
+            content = self._cached_content()
+            if content is not None:
+                return content[offset : offset + length]
+            return self._read_blocks(offset, length)
+        elif self.path:
+            with open(self.path, "rb") as file:
+                file.seek(offset)
+                return file.read(length)
+        else:
+            raise Exception("Dataset is not present in Galaxy or locally.")
+
+    def head(self, n_lines: int = 10) -> List[str]:
+        """Returns the first lines of the content of this dataset without reading all of it.
+
+        Parameters
+        ----------
+        n_lines: int
+            Number of lines to return.
+
+        Returns
+        -------
+        List[str]
+            The lines, without line breaks.
+        """
+        if n_lines <= 0:
+            return []
+        data = b""
+        while True:
+            block = self.read_range(len(data), RANGE_BLOCK_SIZE)
+            data += block
+            if data.count(b"\n") >= n_lines or len(block) < RANGE_BLOCK_SIZE:
+                break
+        return _decode_lines(data.splitlines()[:n_lines])
+
+    def tail(self, n_lines: int = 10) -> List[str]:
+        """Returns the last lines of the content of this dataset without reading all of it.
+
+        Parameters
+        ----------
+        n_lines: int
+            Number of lines to return.
+
+        Returns
+        -------
+        List[str]
+            The lines, without line breaks.
+        """
+        if n_lines <= 0:
+            return []
+        data = b""
+        end = self._content_size()
+        while end > 0:
+            # Read whole blocks backwards from the end, so they can be reused from the block cache.
+            start = (end - 1) // RANGE_BLOCK_SIZE * RANGE_BLOCK_SIZE
+            data = self.read_range(start, end - start) + data
+            end = start
+            if data.count(b"\n") > n_lines:
+                break
+        return _decode_lines(data.splitlines()[-n_lines:])
+
+    def as_mmap(self) -> Union[mmap.mmap, memoryview]:
+        """Returns a read-only memory map of the content of this dataset.
+
+        Datasets in Galaxy and content set in memory are written once to the shared local file cache (see
+        nova.galaxy.local_cache), which is then mapped instead of loading the content onto the heap. Processes that use
+        the same cache directory map the same file, so the operating system keeps a single copy in memory. Local
+        datasets are mapped directly from their path.
+
+        Returns
+        -------
+        Union[mmap.mmap, memoryview]
+            The memory map. It should be closed when it is no longer needed, e.g. by using it in a with statement. Empty
+            files cannot be mapped, so an empty read-only memoryview is returned for empty content instead.
+        """
+        with open(self._local_file(), "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return memoryview(b"")
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def as_array(self, dtype: Any, shape: Optional[Any] = None, offset: int = 0, order: Literal["C", "F"] = "C") -> Any:
+        """Returns a read-only NumPy memory map of the content of this dataset.
+
+        The content is cached locally like in as_mmap(). Requires NumPy to be installed.
+
+        Parameters
+        ----------
+        dtype: Any
+            The data type of the array elements.
+        shape: Optional[Any]
+            The shape of the array. Defaults to a one-dimensional array of all elements.
+        offset: int
+            Number of bytes before the first element, e.g. to skip a header.
+        order: str
+            The memory layout of the array, "C" for row-major or "F" for column-major.
+
+        Returns
+        -------
+        numpy.memmap
+            The array backed by the cached file.
+        """
+        try:
+            import numpy
+        except ImportError as e:
+            raise ImportError("Dataset.as_array() requires NumPy to be installed.") from e
+        path = self._local_file()
+        if os.path.getsize(path) == 0:
+            # Empty files cannot be mapped.
+            array = numpy.empty(shape if shape is not None else 0, dtype=dtype, order=order)
+            array.flags.writeable = False
+            return array
+        return numpy.memmap(path, dtype=dtype, mode="r", shape=shape, offset=offset, order=order)
+
+    def _local_file(self) -> str:
+        """Returns the path of a local file with the content of this dataset, downloading it if needed."""
+        cache = get_local_cache()
+        if self._has_content():
+            content = self._content_bytes()
+            key = content_key(content)
+            return cache.get(key) or cache.put(key, [content])
+        if self.store and self.id:
+            info = self._remote_info()
+            key = info.get("uuid") or content_key(self._cache_key().encode())
+            # Downloads are converted to the extension of the dataset, so the same uuid can have several files.
+            file_type = self.file_type.lstrip(".")
+            if file_type:
+                key = f"{key}.{file_type}"
+            path = cache.get(key)
+            if path is None:
+                cached = self._cached_content()
+                path = cache.put(key, [cached] if cached is not None else self._download_chunks())
+            return path
+        elif self.path:
+            return self.path
+        else:
+            raise Exception("Dataset is not present in Galaxy or locally.")
+
+    def _content_bytes(self) -> bytes:
+        """Returns the content set in memory as bytes."""
+        if isinstance(self._content, str):
+            return self._content.encode()
+        return memoryview(self._content).tobytes()
+
+    def _content_size(self) -> int:
+        """Returns the size of the content of this dataset in bytes."""
+        if self._has_content():
+            return len(self._content_bytes())
+        if self.store and self.id:
+            content = self._cached_content()
+            return len(content) if content is not None else self._remote_size()
+        elif self.path:
+            return os.path.getsize(self.path)
+        else:
+            raise Exception("Dataset is not present in Galaxy or locally.")
+
+    def _remote_info(self) -> Dict[str, Any]:
+        """Waits for this dataset to be ready in Galaxy and returns its details."""
+        if not self.store or not self.id:
+            raise Exception("Dataset is not present in Galaxy.")
+        if self.id not in self._dataset_info:
+            self._dataset_info[self.id] = wait_for_dataset(self.store.nova_connection.galaxy_instance, self.id)
+        return self._dataset_info[self.id]
+
+    def _remote_size(self) -> int:
+        """Returns the size of the file of this dataset in Galaxy."""
+        return int(self._remote_info().get("file_size") or 0)
+
+    def _read_blocks(self, offset: int, length: int) -> bytes:
+        """Reads a range of the content of this dataset in Galaxy through the block cache."""
+        end = min(offset + length, self._remote_size())
+        if offset >= end:
+            return b""
+        first = offset // RANGE_BLOCK_SIZE
+        last = (end - 1) // RANGE_BLOCK_SIZE
+        cache = get_block_cache()
+        blocks: Dict[int, bytes] = {}
+        missing = []
+        for index in range(first, last + 1):
+            block = cache.get(f"{self._cache_key()}:{index}")
+            if block is None:
+                missing.append(index)
+            else:
+                blocks[index] = block
+        if missing:
+            # All missing blocks are fetched with a single request.
+            blocks.update(self._fetch_blocks(missing[0], missing[-1]))
+        data = b"".join(blocks[index] for index in range(first, last + 1))
+        start = offset - first * RANGE_BLOCK_SIZE
+        return data[start : start + end - offset]
+
+    def _fetch_blocks(self, first: int, last: int) -> Dict[int, bytes]:
+        """Fetches the blocks from first to last (inclusive) from Galaxy and adds them to the block cache."""
+        if not self.store or not self.id:
+            raise Exception("Dataset is not present in Galaxy.")
+        connection = self.store.nova_connection
+        start = first * RANGE_BLOCK_SIZE
+        end = (last + 1) * RANGE_BLOCK_SIZE - 1
+        response = get_range(
+            connection.galaxy_instance, f"{connection.galaxy_url}/api/datasets/{self.id}/display", start, end
+        )
+        response.raise_for_status()
+        cache = get_block_cache()
+        blocks: Dict[int, bytes] = {}
+        # Servers without support for ranges send the complete content, which is then only read up to the range.
+        position = start if response.status_code == 206 else 0
+        pending = bytearray()
+        chunks = iter_response(response, RANGE_BLOCK_SIZE, connection.transfer)
+        try:
+            for data in chunks:
+                pending += data
+                while len(pending) >= RANGE_BLOCK_SIZE and position <= end:
+                    index = position // RANGE_BLOCK_SIZE
+                    if index >= first:
+                        blocks[index] = bytes(pending[:RANGE_BLOCK_SIZE])
+                        cache.put(f"{self._cache_key()}:{index}", blocks[index])
+                    del pending[:RANGE_BLOCK_SIZE]
+                    position += RANGE_BLOCK_SIZE
+                if position > end:
+                    break
+            else:
+                # The last block of the content is shorter than the block size.
+                if pending and position >= start:
+                    index = position // RANGE_BLOCK_SIZE
+                    blocks[index] = bytes(pending)
+                    cache.put(f"{self._cache_key()}:{index}", blocks[index])
+        finally:
+            chunks.close()
+        return blocks
+
+    def _cache_key(self) -> str:
+        """Returns the key of the content of this dataset in the shared caches.
+
+        Dataset ids are only unique within one Galaxy server, so the key includes the URL of the server.
+        """
+        if not self.store or not self.id:
+            raise Exception("Dataset is not present in Galaxy.")
+        return f"{self.store.nova_connection.galaxy_url.rstrip('/')}/{self.id}"
+
+    def _cached_content(self) -> Optional[bytes]:
+        """Returns the content of this dataset from the content cache, after waiting for a running prefetch."""
+        key = self._cache_key()
+        wait_for_prefetch(key)
+        return get_content_cache().get(key)
+
+    def _download_chunks(
+        self, chunk_size: int = DEFAULT_CHUNK_SIZE, token: Optional[CancellationToken] = None
+    ) -> Iterator[bytes]:
+        """Streams the decoded content of this dataset from Galaxy."""
+        if not self.store or not self.id:
+            raise Exception("Dataset is not present in Galaxy.")
+        start = time.time()
+        try:
+            yield from iter_response(self._open_download(token), chunk_size, self.store.nova_connection.transfer, token)
+        finally:
+            if self.timeline:
+                # Downloads of job outputs are part of the lifecycle of the job that produced them.
+                self.timeline.record_download(start, time.time())
+
+    def _open_download(self, token: Optional[CancellationToken] = None) -> Any:
+        """Opens a streaming download of this dataset from Galaxy.
+
+        The request accepts gzip and deflate encodings, which are decoded transparently while reading the response.
+        """
+        if not self.store or not self.id:
+            raise Exception("Dataset is not present in Galaxy.")
+        wait_for_dataset(self.store.nova_connection.galaxy_instance, self.id, token)
+        file_type = self.file_type.lstrip(".")
+        response = self.store.nova_connection.galaxy_instance.make_get_request(
+            f"{self.store.nova_connection.galaxy_url}/api/datasets/{self.id}/display",
+            params={"to_ext": file_type} if file_type else None,
+            stream=True,
+        )
+        response.raise_for_status()
+        return response
+
+
+def wait_for_dataset(
+    galaxy_instance: Any, dataset_id: str, token: Optional[CancellationToken] = None
+) -> Dict[str, Any]:
+    """Waits until Galaxy has processed a dataset and returns its details.
+
+    Raises
+    ------
+    OperationCancelledError
+        If the token is cancelled while waiting.
+    Exception
+        If the dataset ended up in a state other than "ok".
+    """
+    from bioblend.galaxy.datasets import TERMINAL_STATES
+
+    return wait_for_state(
+        lambda: galaxy_instance.datasets.show_dataset(dataset_id),
+        list(TERMINAL_STATES),
+        f"Dataset {dataset_id}",
+        token,
+        timeout=DATASET_WAIT_TIMEOUT,
+    )
+
+
+def import_datasets(store: "Datastore", datasets: List[Dataset], names: Optional[List[str]] = None) -> List[str]:
+    """Imports datasets created with from_server_path() or from_url() into a data store with a single request.
+
+    Parameters
+    ----------
+    store: Datastore
+        The data store to import the datasets into.
+    datasets: List[Dataset]
+        The datasets to import.
+    names: Optional[List[str]]
+        The names used for the datasets upstream. Defaults to their local names.
+
+    Returns
+    -------
+    List[str]
+        The ids of the new datasets in Galaxy, in the order of the given datasets.
+    """
+    if not datasets:
+        return []
+    names = names or [dataset.name for dataset in datasets]
+    elements = []
+    for dataset, name in zip(datasets, names, strict=True):
+        if dataset._source is None:
+            raise Exception(f"Dataset {dataset.name} is not imported from a server path or URL.")
+        elements.append({**dataset._source, "name": name})
+    outputs = fetch_datasets(store.nova_connection.galaxy_instance, store.history_id, elements)
+    if len(outputs) != len(datasets):
+        raise DatasetRegistrationError("Galaxy did not create a dataset for every import.", outputs)
+    for dataset, output in zip(datasets, outputs, strict=True):
+        dataset.id = output["id"]
+        dataset.store = store
+    return [dataset.id for dataset in datasets]
+
+
+def _decode_lines(lines: List[bytes]) -> List[str]:
+    return [line.decode("utf-8", errors="replace") for line in lines]
+
 
 class DatasetCollection(AbstractData):
     """A group of files that can be uploaded as a collection and collectively be used in a Galaxy tool."""
@@ -158,16 +823,39 @@ class DatasetCollection(AbstractData):
     def __init__(self, path: str, name: Optional[str] = None):
         self.path = path
         self.name = name or Path(path).name
-        self.id: str
-        self.store: "Datastore"
+        self.id: str = ""
+        self.store: Optional["Datastore"] = None
 
     def upload(self, store: "Datastore") -> None:
         """Will need to handle this differently than single datasets."""
         raise NotImplementedError
 
+    def copy_to(self, store: "Datastore") -> "DatasetCollection":
+        """Copies this dataset collection to another data store inside of Galaxy without transferring any content.
+
+        Parameters
+        ----------
+        store: Datastore
+            The data store to copy this dataset collection to.
+
+        Returns
+        -------
+        DatasetCollection
+            The new dataset collection in the given data store.
+        """
+        if not self.store or not self.id:
+            raise Exception("Dataset collection is not present in Galaxy.")
+        info = store.nova_connection.galaxy_instance.histories.copy_content(store.history_id, self.id, source="hdca")
+        copy = DatasetCollection(self.path, self.name)
+        copy.id = info["id"]
+        copy.store = store
+        return copy
+
     def download(self, local_path: str) -> AbstractData:
         """Downloads this dataset collection to the local path given."""
         if self.store and self.id:
+            from bioblend.galaxy.dataset_collections import DatasetCollectionClient
+
             dataset_client = DatasetCollectionClient(self.store.nova_connection.galaxy_instance)
             dataset_client.download_dataset_collection(self.id, file_path=local_path)
             return self
@@ -177,6 +865,8 @@ class DatasetCollection(AbstractData):
     def get_content(self) -> Any:
         """Get a list of the content of this Collection along with info on each element."""
         if self.store and self.id:
+            from bioblend.galaxy.dataset_collections import DatasetCollectionClient
+
             dataset_client = DatasetCollectionClient(self.store.nova_connection.galaxy_instance)
             info = dataset_client.show_dataset_collection(self.id)
             return info["elements"]
@@ -0,0 +1,144 @@
+"""Internal discovery service for interactive tool entry points."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock, Thread
+from typing import Any, Dict, List, Optional
+
+from .rate_limit import Priority, request_priority
+
+
+class _PendingEntryPoint:
+    """Discovery state of a single interactive tool job."""
+
+    def __init__(self) -> None:
+        self.url: Optional[str] = None
+        self.check_url = False
+        self.probing = False
+        self.waiters = 0
+        self.found = Event()
+        self.ready = Event()
+
+
+class EntryPointDiscovery:
+    """Resolves the URLs of interactive tools for a connection.
+
+    Should not be instantiated manually, each ConnectionHelper owns one. While there are callers waiting for a URL, a
+    single background thread fetches the entry points of all running interactive tools with one request per poll
+    interval. Newly found endpoints are probed concurrently with a timeout, and every caller waiting on a job is
+    released as soon as its endpoint is up.
+
+    Parameters
+    ----------
+    galaxy_instance: GalaxyInstance
+        The Galaxy instance to query.
+    galaxy_url: str
+        The URL of the Galaxy instance. Entry point targets are relative to this URL.
+    poll_interval: float
+        Seconds between two entry point listings.
+    probe_timeout: float
+        Timeout in seconds for a single entry point listing or readiness probe.
+    max_probes: int
+        Maximum number of readiness probes to run at the same time.
+    """
+
+    def __init__(
+        self,
+        galaxy_instance: Any,
+        galaxy_url: str,
+        poll_interval: float = 1.0,
+        probe_timeout: float = 5.0,
+        max_probes: int = 8,
+    ) -> None:
+        self.galaxy_instance = galaxy_instance
+        self.galaxy_url = galaxy_url
+        self.poll_interval = poll_interval
+        self.probe_timeout = probe_timeout
+        self.max_probes = max_probes
+        self._lock = Lock()
+        self._pending: Dict[str, _PendingEntryPoint] = {}
+        self._thread: Optional[Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def wait_for_url(self, job_id: str, timeout: float, check_url: bool = True) -> Optional[str]:
+        """Blocks until the entry point of the given job is available.
+
+        Parameters
+        ----------
+        job_id: str
+            The id of the interactive tool job.
+        timeout: float
+            Maximum time in seconds to wait for the endpoint.
+        check_url: bool
+            Whether to wait until the endpoint responds with a 200 status code.
+
+        Returns
+        -------
+        Optional[str]
+            The URL of the interactive tool, or None if it did not become available in time.
+        """
+        with self._lock:
+            pending = self._pending.setdefault(job_id, _PendingEntryPoint())
+            pending.waiters += 1
+            if check_url:
+                pending.check_url = True
+            if not self._thread:
+                self._thread = Thread(target=self._poll, daemon=True)
+                self._thread.start()
+        event = pending.ready if check_url else pending.found
+        try:
+            if event.wait(timeout):
+                return pending.url
+            return None
+        finally:
+            with self._lock:
+                pending.waiters -= 1
+                if pending.waiters < 1 and self._pending.get(job_id) is pending:
+                    del self._pending[job_id]
+
+    def _poll(self) -> None:
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+                pending_jobs = dict(self._pending)
+            for entry_point in self._fetch_entry_points():
+                pending = pending_jobs.get(entry_point.get("job_id", ""))
+                if pending and entry_point.get("target", None):
+                    self._resolve(pending, f"{self.galaxy_url}{entry_point['target']}")
+            time.sleep(self.poll_interval)
+
+    def _fetch_entry_points(self) -> List[Dict[str, Any]]:
+        try:
+            with request_priority(Priority.LOW):
+                response = self.galaxy_instance.make_get_request(
+                    f"{self.galaxy_url}/api/entry_points?running=true", timeout=self.probe_timeout
+                )
+            response.raise_for_status()
+            return response.json()
+        except Exception:
+            return []
+
+    def _resolve(self, pending: _PendingEntryPoint, url: str) -> None:
+        with self._lock:
+            pending.url = url
+            pending.found.set()
+            if not pending.check_url or pending.ready.is_set() or pending.probing:
+                return
+            pending.probing = True
+            if not self._executor:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_probes)
+            executor = self._executor
+        executor.submit(self._probe, pending, url)
+
+    def _probe(self, pending: _PendingEntryPoint, url: str) -> None:
+        try:
+            response = self.galaxy_instance.make_get_request(url, timeout=self.probe_timeout)
+            if response.status_code == 200:
+                pending.ready.set()
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                pending.probing = False
@@ -0,0 +1,229 @@
+"""Futures for tool runs that are completed by a single shared watcher thread."""
+
+import concurrent.futures
+import time
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from threading import Lock, Thread
+from typing import TYPE_CHECKING, Any, Dict, Generator, Iterable, Iterator, List, Optional, Tuple, Union
+
+from nova.common.job import WorkState
+
+from .outputs import Outputs
+from .rate_limit import Priority, request_priority
+
+if TYPE_CHECKING:
+    from .job import Job
+    from .parameters import Parameters
+    from .tool import Tool
+
+# Uploads and submissions of all futures share a bounded pool instead of using one thread per tool.
+_submit_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="nova-galaxy-submit")
+
+
+class ToolFuture(Future):
+    """Future of a tool run that resolves to the outputs of the tool.
+
+    It can be used like any concurrent.futures.Future, e.g. with concurrent.futures.wait(), and awaited in asyncio code.
+    Should not be instantiated manually. Use Tool.submit() instead.
+    """
+
+    def __init__(self, tool: "Tool") -> None:
+        super().__init__()
+        self.tool = tool
+
+    def __await__(self) -> Generator[Any, None, Optional[Outputs]]:
+        """Waits for the outputs in an asyncio event loop without blocking it."""
+        import asyncio
+
+        return asyncio.wrap_future(self).__await__()
+
+    def cancel(self) -> bool:
+        """Cancels the tool run in Galaxy and this future, unless the tool has already completed."""
+        if self.done():
+            return False
+        self.tool.cancel()
+        return super().cancel()
+
+
+class _JobWatcher:
+    """Polls the state of all submitted jobs in one thread and completes their futures.
+
+    The jobs of each history are fetched with a single request per round, so the number of requests does not grow with
+    the number of watched jobs. The thread stops when no jobs are left and is started again on demand.
+    """
+
+    def __init__(self, poll_interval: float = 1.0) -> None:
+        self.poll_interval = poll_interval
+        self._watched: List[Tuple["Job", ToolFuture]] = []
+        self._lock = Lock()
+        self._thread: Optional[Thread] = None
+
+    def watch(self, job: "Job", future: ToolFuture) -> None:
+        with self._lock:
+            self._watched.append((job, future))
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name="nova-galaxy-watcher", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                watched = list(self._watched)
+                if not watched:
+                    self._thread = None
+                    return
+            self._poll(watched)
+            time.sleep(self.poll_interval)
+
+    def _poll(self, watched: List[Tuple["Job", ToolFuture]]) -> None:
+        groups: Dict[Tuple[int, str], List[Tuple["Job", ToolFuture]]] = {}
+        for job, future in watched:
+            groups.setdefault((id(job.galaxy_instance), job.store.history_id), []).append((job, future))
+        for entries in groups.values():
+            try:
+                states = _fetch_states(entries)
+            except Exception:
+                # Galaxy could not be reached, so try again in the next round.
+                continue
+            for job, future in entries:
+                if job.id in states and self._apply(job, future, states[job.id]):
+                    with self._lock:
+                        self._watched.remove((job, future))
+
+    def _apply(self, job: "Job", future: ToolFuture, state: str) -> bool:
+        """Updates the job and completes its future for a Galaxy job state. Returns whether the job is done."""
+        if state == "running":
+            # Only the transition is published, so the status version does not change while the job keeps running.
+            if job.status.state == WorkState.QUEUED:
+                job.update_status(WorkState.RUNNING)
+            return False
+        if state == "ok":
+            try:
+                outputs = job.finish()
+            except Exception as e:
+                _set_exception(future, e)
+            else:
+                _set_result(future, outputs)
+            return True
+        if state in ["error", "deleted", "deleting"]:
+            if job.status.state in [WorkState.CANCELING, WorkState.CANCELED]:
+                job.update_status(WorkState.CANCELED)
+                Future.cancel(future)
+            else:
+                message = f"Job {job.id} is in terminal state {state}"
+                job.update_status(WorkState.ERROR, message)
+                _set_exception(future, Exception(message))
+            return True
+        return False
+
+
+_watcher = _JobWatcher()
+
+
+def submit_job(tool: "Tool", job: "Job", params: Optional["Parameters"]) -> ToolFuture:
+    """Submits a job in the background and returns a future that is completed by the shared watcher."""
+    future = ToolFuture(tool)
+    _submit_executor.submit(_submit, job, params, future)
+    return future
+
+
+def as_completed(tools: Iterable[Union["Tool", ToolFuture]], timeout: Optional[float] = None) -> Iterator[ToolFuture]:
+    """Yields the futures of the given tools as they complete.
+
+    Parameters
+    ----------
+    tools: Iterable[Union[Tool, ToolFuture]]
+        Tools started with Tool.submit(), or their futures.
+    timeout: Optional[float]
+        Maximum number of seconds to wait for all tools. Waits without limit if not set.
+
+    Returns
+    -------
+    Iterator[ToolFuture]
+        The futures in the order in which they complete. The tool of a future is available as its `tool` attribute.
+    """
+    for future in concurrent.futures.as_completed([_future_of(tool) for tool in tools], timeout):
+        yield future  # type: ignore
+
+
+def wait_all(tools: Iterable[Union["Tool", ToolFuture]], timeout: Optional[float] = None) -> List[Optional[Outputs]]:
+    """Waits for all given tools to complete.
+
+    Parameters
+    ----------
+    tools: Iterable[Union[Tool, ToolFuture]]
+        Tools started with Tool.submit(), or their futures.
+    timeout: Optional[float]
+        Maximum number of seconds to wait. Waits without limit if not set.
+
+    Returns
+    -------
+    List[Optional[Outputs]]
+        The outputs of the tools, in the order of the given tools.
+
+    Raises
+    ------
+    TimeoutError
+        If not all tools completed in time.
+    Exception
+        The error of the first tool that failed, in the order of the given tools.
+    """
+    futures = [_future_of(tool) for tool in tools]
+    _, not_done = concurrent.futures.wait(futures, timeout)
+    if not_done:
+        raise TimeoutError(f"{len(not_done)} of {len(futures)} tools did not complete in time.")
+    return [future.result() for future in futures]
+
+
+def _submit(job: "Job", params: Optional["Parameters"], future: ToolFuture) -> None:
+    try:
+        job.submit(params)
+    except Exception as e:
+        job.update_status(WorkState.ERROR, str(e))
+        _set_exception(future, e)
+        return
+    finally:
+        job._submitted.set()
+    if job.status.state == WorkState.CANCELED:
+        Future.cancel(future)
+    elif future.cancelled():
+        # The future was cancelled while the job was being submitted.
+        job.cancel()
+    else:
+        _watcher.watch(job, future)
+
+
+def _fetch_states(entries: List[Tuple["Job", ToolFuture]]) -> Dict[str, str]:
+    galaxy_instance = entries[0][0].galaxy_instance
+    with request_priority(Priority.LOW):
+        jobs = galaxy_instance.jobs.get_jobs(history_id=entries[0][0].store.history_id)
+        states = {job["id"]: job["state"] for job in jobs}
+        # The listing is limited to the most recently updated jobs, so older jobs are fetched one by one.
+        for job, _ in entries:
+            if job.id not in states:
+                states[job.id] = galaxy_instance.jobs.show_job(job.id)["state"]
+    return states
+
+
+def _future_of(tool: Union["Tool", ToolFuture]) -> ToolFuture:
+    if isinstance(tool, ToolFuture):
+        return tool
+    future = tool.get_future()
+    if future is None:
+        raise Exception(f"Tool {tool.id} has not been submitted.")
+    return future
+
+
+def _set_result(future: ToolFuture, outputs: Optional[Outputs]) -> None:
+    try:
+        future.set_result(outputs)
+    except InvalidStateError:
+        # The future has been cancelled in the meantime.
+        pass
+
+
+def _set_exception(future: ToolFuture, exception: BaseException) -> None:
+    try:
+        future.set_exception(exception)
+    except InvalidStateError:
+        pass
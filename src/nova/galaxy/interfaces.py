@@ -1,11 +1,13 @@
 """Abstract interfaces and type definitions."""
 
 from abc import ABC, abstractmethod
-from typing import Tuple
+from typing import Iterator, Tuple
 
 from nova.galaxy.data_store import Datastore
+from nova.galaxy.dataset import DEFAULT_CHUNK_SIZE, DataChunk, iter_chunks
 from nova.galaxy.parameters import Parameters
 from nova.galaxy.tool import Tool
+from nova.galaxy.transfer import is_buffer
 
 
 class BasicTool(ABC):
@@ -31,6 +33,18 @@ class BasicTool(ABC):
         """Get tool results as bytes."""
         raise Exception("Please implement in a concrete class")
 
+    def stream_results(self, tool: Tool, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[DataChunk]:
+        """Get tool results as a sequence of chunks.
+
+        The default implementation splits the result of get_results(), which must be bytes or another buffer in that
+        case. Override this method to stream large results without holding them in memory, e.g. with
+        Dataset.iter_content().
+        """
+        results = self.get_results(tool)
+        if not is_buffer(results):
+            raise TypeError(f"Results of type {type(results).__name__} cannot be streamed, expected bytes.")
+        yield from iter_chunks(results, chunk_size)
+
     def validate_for_run(self) -> None:
         """Validate tool inputs."""
         return
@@ -1,54 +1,79 @@
 """Internal job related classes and functions."""
 
 import time
-from threading import Lock, Thread
-from typing import TYPE_CHECKING, Dict, Optional
-
-from bioblend import galaxy
-from bioblend.galaxy.datasets import DatasetClient
+from concurrent.futures import Future
+from threading import Event, Lock, Thread
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
 
 if TYPE_CHECKING:
     from .data_store import Datastore
 from nova.common.job import WorkState
 
-from .dataset import Dataset, DatasetCollection
+from .cancellation import CancellationToken, OperationCancelledError, wait_for_state
+from .cleanup import get_cleanup_worker
+from .dataset import AbstractData, Dataset, DatasetCollection, import_datasets, wait_for_dataset
 from .outputs import Outputs
 from .parameters import Parameters
+from .prefetch import PrefetchPolicy
+from .rate_limit import Priority, request_priority
+from .timeline import Timeline
 
 
 class JobStatus:
-    """Internal structure to hold job status info."""
-
-    def __init__(self) -> None:
-        self.lock = Lock()
-        self._details = ""
-        self._state = WorkState.NOT_STARTED
-
-    @property
-    def state(self) -> WorkState:
-        with self.lock:
-            return self._state
-
-    @state.setter
-    def state(self, value: WorkState) -> None:
-        with self.lock:
-            self._state = value
-
-    @property
-    def details(self) -> str:
-        with self.lock:
-            return self._details
-
-    @details.setter
-    def details(self, value: str) -> None:
-        with self.lock:
-            self._details = value
+    """Immutable snapshot of a job status.
+
+    Snapshots are never modified in place. Every change publishes a new snapshot with a higher version, so readers do
+    not need any locking and can detect changes by comparing versions.
+    """
+
+    __slots__ = ("state", "details", "version", "timestamp")
+
+    state: WorkState
+    details: str
+    version: int
+    timestamp: float
+
+    def __init__(
+        self,
+        state: WorkState = WorkState.NOT_STARTED,
+        details: str = "",
+        version: int = 0,
+        timestamp: Optional[float] = None,
+    ) -> None:
+        object.__setattr__(self, "state", state)
+        object.__setattr__(self, "details", details)
+        object.__setattr__(self, "version", version)
+        object.__setattr__(self, "timestamp", time.time() if timestamp is None else timestamp)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Prevents modification of the snapshot."""
+        raise AttributeError("JobStatus is immutable, use evolve() to create an updated status.")
+
+    def __delattr__(self, name: str) -> None:
+        """Prevents modification of the snapshot."""
+        raise AttributeError("JobStatus is immutable.")
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        """Support for pickling and copying."""
+        return JobStatus, (self.state, self.details, self.version, self.timestamp)
+
+    def __repr__(self) -> str:
+        """String representation for debugging."""
+        return f"JobStatus(state={self.state}, details={self.details!r}, version={self.version})"
+
+    def evolve(self, state: Optional[WorkState] = None, details: Optional[str] = None) -> "JobStatus":
+        """Returns a new snapshot with the given changes and the next version."""
+        return JobStatus(
+            state=self.state if state is None else state,
+            details=self.details if details is None else details,
+            version=self.version + 1,
+        )
 
 
 class Job:
     """Internal class managing Galaxy job execution. Should not be used by end users."""
 
-    def __init__(self, tool_id: str, data_store: "Datastore") -> None:
+    def __init__(self, tool_id: str, data_store: "Datastore", prefetch: Optional[PrefetchPolicy] = None) -> None:
         self.id = ""
         self.datasets = None
         self.collections = None
@@ -56,28 +81,76 @@ class Job:
         self.store = data_store
         self.galaxy_instance = self.store.nova_connection.galaxy_instance
         self.status = JobStatus()
+        self._status_lock = Lock()
         self.url: Optional[str] = None
         self.thread: Optional[Thread] = None
+        self._submitted = Event()
+        # Cancelled by stop() and cancel() to abort running uploads and waits of the job thread.
+        self.cancel_token = CancellationToken()
+        self.prefetch = prefetch
+        self.timeline = Timeline(tool_id)
+        self.timeline.record(self.status.state, timestamp=self.status.timestamp)
+        data_store.track_timeline(self.timeline)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Support for pickling as a handle to the same Galaxy job.
+
+        The thread and synchronization primitives of this process are not pickled. The unpickled job reports the status
+        at the time of pickling, and its results can be fetched if the job had finished.
+        """
+        state = self.__dict__.copy()
+        for name in ["galaxy_instance", "_status_lock", "thread", "_submitted", "cancel_token"]:
+            del state[name]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Restores a pickled job bound to the connection of its data store."""
+        self.__dict__.update(state)
+        self.galaxy_instance = self.store.nova_connection.galaxy_instance
+        self._status_lock = Lock()
+        self.thread = None
+        self._submitted = Event()
+        self.cancel_token = CancellationToken()
+        if self.id:
+            self._submitted.set()
+
+    def update_status(self, state: Optional[WorkState] = None, details: Optional[str] = None) -> JobStatus:
+        """Atomically replaces the status snapshot of this job."""
+        with self._status_lock:
+            self.status = self.status.evolve(state=state, details=details)
+            self.timeline.record(self.status.state, self.status.details, self.status.timestamp)
+            return self.status
 
     def _run_and_wait(self, params: Optional[Parameters]) -> None:
         """Runs tools and waits for result."""
         try:
-            self.submit(params)
+            try:
+                self.submit(params)
+            finally:
+                self._submitted.set()
             self.wait_for_results()
         except Exception as e:
             self.url = None
             if self.status.state in [WorkState.CANCELING, WorkState.CANCELED]:
-                self.status.state = WorkState.CANCELED
+                self.update_status(WorkState.CANCELED)
                 return
-            self.status.state = WorkState.ERROR
-            self.status.details = str(e)
+            self.update_status(WorkState.ERROR, str(e))
             return
 
-        self.status.state = WorkState.FINISHED
+        self.finish()
+
+    def finish(self) -> Optional[Outputs]:
+        """Marks the job as finished, starts prefetching its outputs if requested and returns them."""
+        self.update_status(WorkState.FINISHED)
+        outputs = self.get_results()
+        if self.prefetch and outputs:
+            self.prefetch.start(outputs)
+        return outputs
 
     def run(self, params: Optional[Parameters], wait: bool) -> Optional[Outputs]:
         """Runs a job in Galaxy."""
         if self.status.state in [WorkState.NOT_STARTED, WorkState.FINISHED, WorkState.ERROR]:
+            self._submitted.clear()
             self.thread = Thread(target=self._run_and_wait, args=(params,))
             self.thread.start()
             if wait:
@@ -110,15 +183,24 @@ class Job:
 
     def submit(self, params: Optional[Parameters]) -> None:
         """Handles uploading inputs and submitting job."""
-        self.status.state = WorkState.UPLOADING_DATA
+        from bioblend.galaxy.tools.inputs import inputs
+
+        tool_schemas = self.store.nova_connection.tool_schemas
+        if tool_schemas:
+            tool_schemas.validate(self.tool, params)
+        self.update_status(WorkState.UPLOADING_DATA)
         self.url = None
         datasets_to_upload = {}
 
         # Set Tool Inputs
-        tool_inputs = galaxy.tools.inputs.inputs()
+        tool_inputs = inputs()
         if params:
             for param, val in params.inputs.items():
-                if isinstance(val, Dataset):
+                if isinstance(val, AbstractData) and self._is_in_store(val):
+                    # Already present in the target store, so it can be passed by reference without any transfer.
+                    src = "hdca" if isinstance(val, DatasetCollection) else "hda"
+                    tool_inputs.set_dataset_param(param, str(val.id), src=src)
+                elif isinstance(val, Dataset):
                     datasets_to_upload[param] = val
                 else:
                     tool_inputs.set_param(param, val)
@@ -128,68 +210,85 @@ class Job:
                     tool_inputs.set_dataset_param(param, val)
 
         if self.status.state in [WorkState.STOPPING, WorkState.CANCELING]:
-            self.status.state = WorkState.CANCELED
+            self.update_status(WorkState.CANCELED)
             return
         # Run tool and wait for job to finish
-        self.status.state = WorkState.QUEUED
-        results = self.galaxy_instance.tools.run_tool(
-            history_id=self.store.history_id, tool_id=self.tool, tool_inputs=tool_inputs
-        )
+        self.update_status(WorkState.QUEUED)
+        with request_priority(Priority.HIGH):
+            results = self.galaxy_instance.tools.run_tool(
+                history_id=self.store.history_id, tool_id=self.tool, tool_inputs=tool_inputs
+            )
         self.id = results["jobs"][0]["id"]
+        self.timeline.job_id = self.id
+        if self.cancel_token.cancelled:
+            # The job was stopped or canceled while it was being submitted, before its id was known.
+            self.cancel()
         self.datasets = results["outputs"]
         self.collections = results["output_collections"]
 
+    def _is_in_store(self, data: AbstractData) -> bool:
+        """Checks if the data has already been uploaded to or produced in the store of this job."""
+        return bool(data.id) and data.store is not None and data.store.history_id == self.store.history_id
+
     def upload_datasets(self, datasets: Dict[str, Dataset]) -> Optional[Dict[str, str]]:
-        """Helper method to upload multiple datasets or collections in parallel."""
+        """Helper method to upload multiple datasets or collections in parallel.
+
+        Uploads and waits are aborted as soon as the job is stopped or canceled. Datasets that were already created
+        in Galaxy are then purged in the background, and None is returned.
+        """
         galaxy_instance = self.store.nova_connection.galaxy_instance
-        dataset_client = DatasetClient(galaxy_instance)
-        history_id = galaxy_instance.histories.get_histories(name=self.store.name)[0]["id"]
         dataset_ids: Dict[str, str] = {}
-        for name, dataset in datasets.items():
-            if self.status.state in [WorkState.STOPPING, WorkState.CANCELING]:
-                self.cleanup_datasets(dataset_ids)
-                return None
-            if len(dataset.path) < 1 and dataset.get_content():
-                dataset_info = galaxy_instance.tools.paste_content(
-                    content=str(dataset.get_content()), history_id=history_id, file_name=dataset.name
-                )
-            else:
-                dataset_info = galaxy_instance.tools.upload_file(path=dataset.path, history_id=history_id)
-            dataset_ids[name] = dataset_info["outputs"][0]["id"]
-            dataset.id = dataset_info["outputs"][0]["id"]
-            dataset.store = self.store
-        for dataset_output in dataset_ids.values():
-            if self.status.state in [WorkState.STOPPING, WorkState.CANCELING]:
-                self.cleanup_datasets(dataset_ids)
-                return None
-            dataset_client.wait_for_dataset(dataset_output)
+        try:
+            # Datasets on server paths or URLs are imported by Galaxy, all of them with a single request.
+            imports = {name: dataset for name, dataset in datasets.items() if dataset.is_server_import}
+            if imports:
+                self.cancel_token.raise_if_cancelled()
+                dataset_ids.update(zip(imports, import_datasets(self.store, list(imports.values())), strict=True))
+            for name, dataset in datasets.items():
+                if name not in dataset_ids:
+                    dataset_ids[name] = dataset.start_upload(self.store, token=self.cancel_token)
+            for dataset_output in dataset_ids.values():
+                wait_for_dataset(galaxy_instance, dataset_output, self.cancel_token)
+        except OperationCancelledError:
+            self.cleanup_datasets(dataset_ids)
+            return None
         return dataset_ids
 
-    def cleanup_datasets(self, datasets: Dict[str, str]) -> None:
-        galaxy_instance = self.store.nova_connection.galaxy_instance
-        history_id = galaxy_instance.histories.get_histories(name=self.store.name)[0]["id"]
-        for dataset_id in datasets.values():
-            galaxy_instance.histories.delete_dataset(history_id=history_id, dataset_id=dataset_id, purge=True)
+    def cleanup_datasets(self, datasets: Dict[str, str]) -> "Future[None]":
+        """Purges uploaded datasets in the background with a single bulk request."""
+        return get_cleanup_worker().purge_datasets(
+            self.store.nova_connection.galaxy_instance, self.store.history_id, list(datasets.values())
+        )
 
     def stop(self) -> bool:
         """Stops a job in Galaxy."""
         self.url = None
-        self.status.state = WorkState.STOPPING
-        response = self.galaxy_instance.make_put_request(
-            f"{self.store.nova_connection.galaxy_url}/api/jobs/{self.id}/finish"
-        )
+        self.update_status(WorkState.STOPPING)
+        if not self.id:
+            # Nothing is running in Galaxy yet, so only the uploads of the job thread have to be aborted.
+            self.cancel_token.cancel()
+            return True
+        with request_priority(Priority.HIGH):
+            response = self.galaxy_instance.make_put_request(
+                f"{self.store.nova_connection.galaxy_url}/api/jobs/{self.id}/finish"
+            )
         if response:
             return True
         else:
-            self.status.details = "could not stop job"
+            self.update_status(details="could not stop job")
             return False
 
     def cancel(self) -> bool:
         """Cancel a job in Galaxy."""
         self.url = None
-        self.status.state = WorkState.CANCELING
+        self.update_status(WorkState.CANCELING)
+        self.cancel_token.cancel()
+        if not self.id:
+            # The job thread stops its uploads and does not submit the job.
+            return True
         try:
-            return self.galaxy_instance.jobs.cancel_job(self.id)
+            with request_priority(Priority.HIGH):
+                return self.galaxy_instance.jobs.cancel_job(self.id)
         except Exception:
             return False
 
@@ -198,20 +297,35 @@ class Job:
             self.thread.join()
 
     def wait_for_results(self, timeout: float = 1200000) -> None:
-        """Wait for job to finish."""
-        self.galaxy_instance.jobs.wait_for_job(self.id, maxwait=timeout, check=True)
+        """Wait for job to finish. Stops waiting with OperationCancelledError as soon as the job is canceled."""
+        from bioblend.galaxy.jobs import JOB_TERMINAL_STATES
+
+        with request_priority(Priority.LOW):
+            wait_for_state(
+                self._show_job,
+                list(JOB_TERMINAL_STATES),
+                f"Job {self.id}",
+                self.cancel_token,
+                timeout,
+            )
+
+    def _show_job(self) -> Dict[str, Any]:
+        """Fetches the job from Galaxy and records when it starts running, so queue and run time can be told apart."""
+        job = self.galaxy_instance.jobs.show_job(self.id)
+        if job["state"] == "running" and self.status.state == WorkState.QUEUED:
+            self.update_status(WorkState.RUNNING)
+        return job
 
     def get_state(self) -> JobStatus:
         """Returns current state of job."""
         if self.status.state == WorkState.QUEUED:
             try:
-                job = self.galaxy_instance.jobs.show_job(self.id)
-                if job["state"] == "running":
-                    self.status.state = WorkState.RUNNING
-                elif job["state"] == "error":
-                    self.status.state = WorkState.ERROR
+                with request_priority(Priority.LOW):
+                    job = self._show_job()
+                if job["state"] == "error":
+                    self.update_status(WorkState.ERROR)
                 elif job["state"] == "deleted":
-                    self.status.state = WorkState.DELETED
+                    self.update_status(WorkState.DELETED)
             except Exception:
                 pass
         return self.status
@@ -226,6 +340,7 @@ class Job:
                     d.id = dataset["id"]
                     d.file_type = dataset.get("file_ext", "")
                     d.store = self.store
+                    d.timeline = self.timeline
                     outputs.add_output(d)
             if self.collections:
                 for collection in self.collections:
@@ -244,32 +359,25 @@ class Job:
         """Get the URL or endpoint for this tool."""
         if self.url:
             return self.url
-        timer = max_tries
-        while timer > 0:
-            try:
-                entry_points = self.galaxy_instance.make_get_request(
-                    f"{self.store.nova_connection.galaxy_url}/api/entry_points?job_id={self.id}"
-                )
-                for ep in entry_points.json():
-                    if ep["job_id"] == self.id and ep.get("target", None):
-                        url = f"{self.store.nova_connection.galaxy_url}{ep['target']}"
-                        self.url = url
-                        response = self.galaxy_instance.make_get_request(url)
-                        if response.status_code == 200 or not check_url:
-                            return url
-            except Exception:
-                continue
-            finally:
-                timer -= 1
-                time.sleep(1)
-        return None
+        discovery = self.store.nova_connection.entry_points
+        deadline = time.monotonic() + max_tries * discovery.poll_interval
+        # The job id is only known once the job thread has submitted the job.
+        if not self.id:
+            self._submitted.wait(max(deadline - time.monotonic(), 0))
+        if not self.id:
+            return None
+        url = discovery.wait_for_url(self.id, timeout=max(deadline - time.monotonic(), 0), check_url=check_url)
+        if url:
+            self.url = url
+        return url
 
     def get_console_output(self, start: int, length: int) -> Dict[str, str]:
         """Get all the current console output."""
-        out = self.galaxy_instance.make_get_request(
-            f"{self.store.nova_connection.galaxy_url}/api/jobs/"
-            f"{self.id}/console_output?stdout_position={start}&stdout_length="
-            f"{length}&stderr_position={start}&stderr_length={length}"
-        )
+        with request_priority(Priority.LOW):
+            out = self.galaxy_instance.make_get_request(
+                f"{self.store.nova_connection.galaxy_url}/api/jobs/"
+                f"{self.id}/console_output?stdout_position={start}&stdout_length="
+                f"{length}&stderr_position={start}&stderr_length={length}"
+            )
         out.raise_for_status()
         return out.json()
@@ -0,0 +1,133 @@
+"""Local directory cache for dataset files that are memory-mapped instead of loaded into memory."""
+
+import hashlib
+import os
+import re
+import tempfile
+from typing import Iterable, Optional
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "nova-galaxy", "files")
+DEFAULT_MAX_SIZE = 10 * 1024 * 1024 * 1024
+
+
+class LocalFileCache:
+    """Directory of dataset files named by a key that identifies their content.
+
+    Galaxy datasets are keyed by their uuid, which is shared by all copies of a dataset, and content set in memory is
+    keyed by its SHA-256 hash. Files are written to a temporary file and renamed once complete, so several processes on
+    the same node can share the directory, and a file that exists is never partially written.
+
+    When the files exceed the size limit after a file has been written, the least recently used files are removed.
+    Reading a file counts as a use. Files that are still mapped stay valid until they are unmapped, since the
+    operating system only frees their space once the last mapping is closed.
+
+    Parameters
+    ----------
+    directory: str
+        Directory in which the files are stored.
+    max_size: Optional[int]
+        Maximum total size in bytes of the cached files. The size is not limited if set to None.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_size: Optional[int] = DEFAULT_MAX_SIZE) -> None:
+        self.directory = directory
+        self.max_size = max_size
+
+    def path(self, key: str) -> str:
+        """Returns the path of the file for the key, whether it exists or not."""
+        return os.path.join(self.directory, re.sub(r"[^A-Za-z0-9_.-]", "_", key))
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the path of the cached file for the key, or None if it is not cached."""
+        path = self.path(key)
+        try:
+            # Marks the file as recently used, for eviction.
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key: str, chunks: Iterable[bytes]) -> str:
+        """Writes the content to the file for the key and returns its path."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                for data in chunks:
+                    file.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self._evict(keep=path)
+        return path
+
+    def _evict(self, keep: str) -> None:
+        """Removes the least recently used files until the total size is within the limit."""
+        if self.max_size is None:
+            return
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_size:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                # Removed by another process, or still in use on platforms that do not allow removing it.
+                continue
+            total -= size
+
+    def clear(self) -> None:
+        """Removes all cached files."""
+        if not os.path.isdir(self.directory):
+            return
+        for file_name in os.listdir(self.directory):
+            path = os.path.join(self.directory, file_name)
+            if os.path.isfile(path):
+                os.remove(path)
+
+
+def content_key(content: bytes) -> str:
+    """Returns the key of content that is not stored in Galaxy."""
+    return f"sha256-{hashlib.sha256(content).hexdigest()}"
+
+
+_local_cache = LocalFileCache()
+
+
+def get_local_cache() -> LocalFileCache:
+    """Returns the local file cache shared by all datasets."""
+    return _local_cache
+
+
+def configure_local_cache(
+    directory: str = DEFAULT_CACHE_DIR, max_size: Optional[int] = DEFAULT_MAX_SIZE
+) -> LocalFileCache:
+    """Replaces the shared local file cache with one using the given directory.
+
+    Parameters
+    ----------
+    directory: str
+        Directory in which the files are stored. Processes that use the same directory share the cached files.
+    max_size: Optional[int]
+        Maximum total size in bytes of the cached files. The size is not limited if set to None.
+
+    Returns
+    -------
+    LocalFileCache
+        The new shared local file cache.
+    """
+    global _local_cache
+    _local_cache = LocalFileCache(directory, max_size)
+    return _local_cache
@@ -0,0 +1,111 @@
+"""Event loop lag monitoring."""
+
+import asyncio
+from typing import Optional
+from weakref import WeakKeyDictionary
+
+
+class LoopLagMonitor:
+    """Measures how late an asyncio event loop runs scheduled callbacks.
+
+    A background task sleeps for a fixed interval and records how much later than requested it was woken up. A loop
+    that is blocked by synchronous work (e.g. blocking HTTP calls in a coroutine) shows up as a growing lag.
+
+    Parameters
+    ----------
+    interval: float
+        Seconds between two measurements.
+    """
+
+    def __init__(self, interval: float = 0.1) -> None:
+        self.interval = interval
+        self.samples = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._total_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._holders = 0
+
+    @property
+    def mean_lag(self) -> float:
+        """Mean lag in seconds over all measurements since the last reset."""
+        if self.samples == 0:
+            return 0.0
+        return self._total_lag / self.samples
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Starts measuring on the running event loop."""
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops measuring."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def acquire(self) -> None:
+        """Starts measuring on the running event loop until every call is matched by a call of release()."""
+        self._holders += 1
+        self.start()
+
+    def release(self) -> None:
+        """Stops measuring once the last holder released the monitor. Must be called on the loop of the monitor."""
+        self._holders = max(self._holders - 1, 0)
+        if self._holders == 0 and self._task:
+            self._task.cancel()
+            self._task = None
+
+    def reset(self) -> None:
+        """Resets all statistics."""
+        self.samples = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._total_lag = 0.0
+
+    def record(self, lag: float) -> None:
+        """Records a single lag measurement in seconds."""
+        self.samples += 1
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self._total_lag += lag
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            try:
+                await asyncio.sleep(self.interval)
+            except asyncio.CancelledError:
+                # Keep the measurement in progress if it is already late, e.g. when stopped after a blocked period.
+                lag = loop.time() - start - self.interval
+                if lag > 0:
+                    self.record(lag)
+                raise
+            self.record(max(loop.time() - start - self.interval, 0.0))
+
+
+_monitors: "WeakKeyDictionary[asyncio.AbstractEventLoop, LoopLagMonitor]" = WeakKeyDictionary()
+
+
+def get_loop_lag_monitor() -> LoopLagMonitor:
+    """Returns the lag monitor of the running event loop.
+
+    ToolRunner keeps the monitor of its event loop running while it monitors a tool, so the lag of the loop that serves
+    the UI can be inspected while tools run. The monitor stops when the last tool finishes. Use acquire() and release()
+    to keep it running otherwise.
+    """
+    loop = asyncio.get_running_loop()
+    monitor = _monitors.get(loop)
+    if monitor is None:
+        monitor = LoopLagMonitor()
+        _monitors[loop] = monitor
+    return monitor
@@ -1,9 +1,16 @@
 """Encapsulates the output datasets and collections for a Tool."""
 
-from typing import Any, List
+from typing import TYPE_CHECKING, Any, List
 
+if TYPE_CHECKING:
+    from .data_store import Datastore
+
+from .cleanup import get_cleanup_worker
 from .dataset import AbstractData, Dataset, DatasetCollection
 
+# Number of datasets above which they are copied through a temporary collection instead of one by one.
+BULK_COPY_THRESHOLD = 3
+
 
 class Outputs:
     """Contains the output datasets and collections for a Tool."""
@@ -38,3 +45,72 @@ class Outputs:
             return next(filter(lambda x: isinstance(x, DatasetCollection) and x.name == name, self.data))
         except StopIteration as e:
             raise Exception(f"There is no dataset collection: {name}") from e
+
+    def copy_to(self, store: "Datastore") -> "Outputs":
+        """Copies all outputs to another data store inside of Galaxy without transferring any content.
+
+        Several datasets are copied together through a temporary collection, which takes three requests regardless of
+        their number. A few datasets and each collection are copied with their own request.
+
+        Parameters
+        ----------
+        store: Datastore
+            The data store to copy the outputs to.
+
+        Returns
+        -------
+        Outputs
+            The copied outputs, in the same order, bound to the given data store.
+        """
+        datasets = [data for data in self.data if isinstance(data, Dataset)]
+        for data in self.data:
+            if not data.store or not data.id:
+                raise Exception(f"Output {data.name} is not present in Galaxy.")
+        if len(datasets) > BULK_COPY_THRESHOLD:
+            copied = iter(_copy_datasets(datasets, store))
+        else:
+            copied = iter(dataset.copy_to(store) for dataset in datasets)
+
+        outputs = Outputs()
+        for data in self.data:
+            outputs.add_output(next(copied) if isinstance(data, Dataset) else data.copy_to(store))
+        return outputs
+
+
+def _copy_datasets(datasets: List[Dataset], store: "Datastore") -> List[Dataset]:
+    """Copies several datasets to a data store with a fixed number of requests.
+
+    Galaxy copies all elements of a new collection into the target history at once, so the datasets are copied by
+    creating a temporary list collection from them. The copies are then made visible and the temporary collection is
+    removed, which does not affect the copied datasets. The temporary collection is removed even if making the copies
+    visible fails, in which case the copies are purged as well.
+    """
+    galaxy_instance = store.nova_connection.galaxy_instance
+    collection = galaxy_instance.histories.create_dataset_collection(
+        store.history_id,
+        {
+            "name": "nova-galaxy copy",
+            "collection_type": "list",
+            "element_identifiers": [
+                {"name": str(index), "src": "hda", "id": dataset.id} for index, dataset in enumerate(datasets)
+            ],
+        },
+        copy_elements=True,
+    )
+    ids = {element["element_identifier"]: element["object"]["id"] for element in collection.get("elements", [])}
+    try:
+        copies = [dataset._copy_bound_to(ids[str(index)], store) for index, dataset in enumerate(datasets)]
+        galaxy_instance.make_put_request(
+            f"{galaxy_instance.url}/histories/{store.history_id}/contents/bulk",
+            payload={
+                "operation": "unhide",
+                "items": [{"id": copy.id, "history_content_type": "dataset"} for copy in copies],
+            },
+        )
+    except Exception:
+        if ids:
+            get_cleanup_worker().purge_datasets(galaxy_instance, store.history_id, list(ids.values()))
+        raise
+    finally:
+        galaxy_instance.histories.delete_dataset_collection(store.history_id, collection["id"])
+    return copies
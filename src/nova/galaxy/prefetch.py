@@ -0,0 +1,102 @@
+"""Background prefetching of job outputs into the shared content cache."""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from .content_cache import get_content_cache
+
+if TYPE_CHECKING:
+    from .dataset import Dataset
+    from .outputs import Outputs
+
+# Prefetches of all jobs share a small pool, so they do not compete with the application for bandwidth.
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="nova-galaxy-prefetch")
+_in_flight: Dict[str, "Future[bool]"] = {}
+_in_flight_lock = Lock()
+
+
+class PrefetchPolicy:
+    """Selects the outputs of a job that are downloaded in the background as soon as the job finishes.
+
+    Prefetched content is kept in the shared content cache (see nova.galaxy.content_cache), so get_content() and
+    download() of those outputs return without waiting for Galaxy.
+
+    Parameters
+    ----------
+    outputs: Optional[List[str]]
+        Names of the output datasets to prefetch. All output datasets are prefetched if not set.
+    max_size: Optional[int]
+        Maximum size in bytes of a single output. Larger outputs are not prefetched.
+    """
+
+    def __init__(self, outputs: Optional[List[str]] = None, max_size: Optional[int] = None) -> None:
+        self.outputs = outputs
+        self.max_size = max_size
+
+    def selects(self, dataset: "Dataset") -> bool:
+        """Checks if the dataset should be prefetched."""
+        return self.outputs is None or dataset.name in self.outputs
+
+    def start(self, outputs: "Outputs") -> List["Future[bool]"]:
+        """Starts prefetching the selected datasets of the given outputs.
+
+        Returns
+        -------
+        List[Future[bool]]
+            One future per prefetched dataset, resolving to whether the content was cached.
+        """
+        from .dataset import Dataset
+
+        return [
+            prefetch_dataset(data, self.max_size)
+            for data in outputs.data
+            if isinstance(data, Dataset) and self.selects(data)
+        ]
+
+
+def prefetch_dataset(dataset: "Dataset", max_size: Optional[int] = None) -> "Future[bool]":
+    """Downloads the content of a dataset into the content cache in the background."""
+    key = dataset._cache_key()
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        if future is not None:
+            return future
+        future = _executor.submit(_prefetch, dataset, max_size)
+        _in_flight[key] = future
+    # Registered without holding the lock, since the callback runs right away if the prefetch has already finished.
+    future.add_done_callback(lambda _: _forget(key))
+    return future
+
+
+def wait_for_prefetch(key: str) -> None:
+    """Waits for a running prefetch of the content with the given cache key, so it is not downloaded twice."""
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+    if future is not None:
+        try:
+            future.result()
+        except Exception:
+            pass
+
+
+def _forget(key: str) -> None:
+    with _in_flight_lock:
+        _in_flight.pop(key, None)
+
+
+def _prefetch(dataset: "Dataset", max_size: Optional[int]) -> bool:
+    cache = get_content_cache()
+    key = dataset._cache_key()
+    if key in cache:
+        return True
+    # Galaxy reports the size of finished datasets, so larger outputs are skipped without downloading any of them.
+    if max_size is not None and dataset._remote_size() > max_size:
+        return False
+    content = bytearray()
+    for data in dataset._download_chunks():
+        content += data
+        if max_size is not None and len(content) > max_size:
+            return False
+    cache.put(key, bytes(content))
+    return True
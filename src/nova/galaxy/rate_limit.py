@@ -0,0 +1,201 @@
+"""Client-side rate limiting of Galaxy API requests."""
+
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from threading import Condition, Lock
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class Priority(IntEnum):
+    """Priority class of a Galaxy request. Requests with a lower value are sent first."""
+
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
+class RequestShedError(Exception):
+    """Exception raised when a request is shed because Galaxy is overloaded."""
+
+
+_request_priority: ContextVar[Priority] = ContextVar("nova_galaxy_request_priority", default=Priority.NORMAL)
+
+
+@contextmanager
+def request_priority(priority: Priority) -> Iterator[None]:
+    """Sets the priority of all Galaxy requests made in this context.
+
+    Submissions and cancellations should use HIGH, status polls LOW, so they are the first to be delayed or shed.
+    """
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+class RateLimiter:
+    """Token bucket with adaptive concurrency control shared by all requests to a Galaxy server.
+
+    The token bucket bounds the request rate. The number of concurrent requests is adapted with AIMD: the limit grows
+    by one request per round of fast successful requests and is halved whenever Galaxy is congested, i.e. it returns
+    429 or 5xx, times out, or answers slower than the target latency. Waiting requests are served in priority order,
+    and low priority requests are shed when they could not be sent in time.
+
+    Parameters
+    ----------
+    rate: float
+        Maximum number of requests per second.
+    burst: int
+        Number of requests that can be sent at once after an idle period.
+    max_concurrency: int
+        Upper bound for the number of concurrent requests.
+    min_concurrency: int
+        Lower bound for the number of concurrent requests.
+    target_latency: float
+        Requests slower than this (in seconds) are treated as a sign of congestion.
+    shed_after: Dict[Priority, float]
+        Maximum seconds a request of a priority waits before being shed. Priorities not listed are never shed.
+    """
+
+    def __init__(
+        self,
+        rate: float = 50.0,
+        burst: int = 50,
+        max_concurrency: int = 32,
+        min_concurrency: int = 1,
+        target_latency: float = 5.0,
+        shed_after: Optional[Dict[Priority, float]] = None,
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.target_latency = target_latency
+        self.shed_after = {Priority.LOW: 30.0} if shed_after is None else shed_after
+        self.concurrency_limit = float(min(8, max_concurrency))
+        self.in_flight = 0
+        self.sent = 0
+        self.congested = 0
+        self.shed = 0
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0
+        self._waiting: List[Tuple[int, int]] = []
+        self._counter = itertools.count()
+        self._condition = Condition(Lock())
+
+    @property
+    def queue_length(self) -> int:
+        """Number of requests waiting to be sent."""
+        return len(self._waiting)
+
+    def acquire(self, priority: Optional[Priority] = None) -> None:
+        """Waits until a request of the given priority (by default the one of the current context) may be sent."""
+        priority = _request_priority.get() if priority is None else priority
+        entry = (int(priority), next(self._counter))
+        max_wait = self.shed_after.get(priority)
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        with self._condition:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiting[0] == entry and self.in_flight < int(self.concurrency_limit):
+                        wait = max(self._paused_until - now, (1 - self._tokens) / self.rate, 0.0)
+                        if wait == 0.0:
+                            self._tokens -= 1
+                            self.in_flight += 1
+                            self.sent += 1
+                            return
+                    else:
+                        wait = None
+                    if deadline is not None:
+                        if now >= deadline:
+                            self.shed += 1
+                            raise RequestShedError(f"Galaxy is overloaded, {priority.name} priority request was shed.")
+                        wait = deadline - now if wait is None else min(wait, deadline - now)
+                    self._condition.wait(wait)
+            finally:
+                if entry in self._waiting:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                self._condition.notify_all()
+
+    def release(self, latency: float, congested: bool, retry_after: Optional[float] = None) -> None:
+        """Records the outcome of a request that was sent after acquire()."""
+        with self._condition:
+            self.in_flight -= 1
+            if congested or latency > self.target_latency:
+                self.congested += 1
+                self.concurrency_limit = max(self.concurrency_limit / 2, float(self.min_concurrency))
+            else:
+                self.concurrency_limit = min(
+                    self.concurrency_limit + 1 / self.concurrency_limit, float(self.max_concurrency)
+                )
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            self._condition.notify_all()
+
+    def call(self, request: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Sends a request through this limiter and records its outcome.
+
+        Responses with a 429 or 5xx status, errors carrying such a status and network errors such as timeouts are
+        treated as congestion.
+        """
+        self.acquire()
+        start = time.monotonic()
+        congested = False
+        retry_after = None
+        try:
+            result = request(*args, **kwargs)
+            # GET and DELETE requests return the response as is, other requests raise an error for unexpected statuses.
+            if _is_congestion_status(getattr(result, "status_code", None)):
+                congested = True
+                retry_after = _retry_after(result)
+            return result
+        except OSError:
+            # Timeouts and dropped connections are the most common symptom of an overloaded server.
+            congested = True
+            raise
+        except Exception as e:
+            congested = _is_congestion_status(getattr(e, "status_code", None))
+            raise
+        finally:
+            self.release(time.monotonic() - start, congested, retry_after)
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self._tokens + (now - self._refilled) * self.rate, float(self.burst))
+        self._refilled = now
+
+
+def _is_congestion_status(status_code: Optional[int]) -> bool:
+    return status_code is not None and (status_code == 429 or status_code >= 500)
+
+
+def _retry_after(response: Any) -> Optional[float]:
+    try:
+        return float(response.headers.get("Retry-After", ""))
+    except (AttributeError, ValueError):
+        return None
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = Lock()
+
+
+def get_rate_limiter(galaxy_url: str) -> RateLimiter:
+    """Returns the rate limiter shared by all connections to the given Galaxy server."""
+    with _limiters_lock:
+        limiter = _limiters.get(galaxy_url.rstrip("/"))
+        if limiter is None:
+            limiter = RateLimiter()
+            _limiters[galaxy_url.rstrip("/")] = limiter
+        return limiter
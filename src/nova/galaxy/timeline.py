@@ -0,0 +1,188 @@
+"""Lifecycle timelines of jobs for profiling where end-to-end latency goes."""
+
+import json
+import time
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from nova.common.job import WorkState
+
+# Name of the phase in which results are downloaded from Galaxy.
+DOWNLOADING = "DOWNLOADING"
+
+_TERMINAL_STATES = [WorkState.FINISHED, WorkState.ERROR, WorkState.CANCELED, WorkState.DELETED]
+
+
+class Transition:
+    """A state change of a job, with the time at which it was observed."""
+
+    __slots__ = ("state", "timestamp", "details")
+
+    def __init__(self, state: WorkState, timestamp: float, details: str = "") -> None:
+        self.state = state
+        self.timestamp = timestamp
+        self.details = details
+
+    def __repr__(self) -> str:
+        """String representation for debugging."""
+        return f"Transition(state={self.state}, timestamp={self.timestamp})"
+
+
+class Span:
+    """A phase of a job lifecycle with its start and end time."""
+
+    __slots__ = ("name", "start", "end")
+
+    def __init__(self, name: str, start: float, end: float) -> None:
+        self.name = name
+        self.start = start
+        self.end = end
+
+    @property
+    def duration(self) -> float:
+        """Duration of the phase in seconds."""
+        return self.end - self.start
+
+    def __repr__(self) -> str:
+        """String representation for debugging."""
+        return f"Span(name={self.name!r}, duration={self.duration:.3f})"
+
+
+class Timeline:
+    """Timestamped state transitions and result downloads of a single job.
+
+    Parameters
+    ----------
+    name: str
+        Name of the timeline, e.g. the tool id.
+    """
+
+    def __init__(self, name: str = "") -> None:
+        self.name = name
+        self.job_id = ""
+        self._transitions: List[Transition] = []
+        self._downloads: List[Span] = []
+        self._lock = Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Support for pickling without the lock."""
+        with self._lock:
+            state = self.__dict__.copy()
+            state["_transitions"] = list(self._transitions)
+            state["_downloads"] = list(self._downloads)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Restores a pickled timeline with a new lock."""
+        self.__dict__.update(state)
+        self._lock = Lock()
+
+    @property
+    def transitions(self) -> List[Transition]:
+        """All state transitions in the order they were observed."""
+        with self._lock:
+            return list(self._transitions)
+
+    def record(self, state: WorkState, details: str = "", timestamp: Optional[float] = None) -> None:
+        """Records a transition to a new state. Repeated observations of the current state are ignored."""
+        with self._lock:
+            if self._transitions and self._transitions[-1].state == state:
+                return
+            self._transitions.append(Transition(state, time.time() if timestamp is None else timestamp, details))
+
+    def record_download(self, start: float, end: float) -> None:
+        """Records the download of results between the given times."""
+        with self._lock:
+            self._downloads.append(Span(DOWNLOADING, start, end))
+
+    def spans(self) -> List[Span]:
+        """Returns the phases of the lifecycle.
+
+        Each state after NOT_STARTED lasts until the next transition, or until now if it is still the current state.
+        Terminal states have no duration. Downloads are appended as separate phases.
+        """
+        with self._lock:
+            transitions = list(self._transitions)
+            spans = []
+            for index, transition in enumerate(transitions):
+                if transition.state == WorkState.NOT_STARTED or transition.state in _TERMINAL_STATES:
+                    continue
+                end = transitions[index + 1].timestamp if index + 1 < len(transitions) else time.time()
+                spans.append(Span(transition.state.name, transition.timestamp, end))
+            return spans + list(self._downloads)
+
+    def durations(self) -> Dict[str, float]:
+        """Returns the total time in seconds spent in each phase."""
+        durations: Dict[str, float] = {}
+        for span in self.spans():
+            durations[span.name] = durations.get(span.name, 0.0) + span.duration
+        return durations
+
+
+def summarize(timelines: Iterable[Timeline]) -> Dict[str, Dict[str, float]]:
+    """Aggregates the phase durations of several timelines.
+
+    Returns
+    -------
+    Dict[str, Dict[str, float]]
+        For each phase, the number of jobs that went through it and the total, mean and maximum time in seconds.
+    """
+    stats: Dict[str, Dict[str, float]] = {}
+    for timeline in timelines:
+        for name, duration in timeline.durations().items():
+            phase = stats.setdefault(name, {"count": 0, "total": 0.0, "mean": 0.0, "max": 0.0})
+            phase["count"] += 1
+            phase["total"] += duration
+            phase["max"] = max(phase["max"], duration)
+    for phase in stats.values():
+        phase["mean"] = phase["total"] / phase["count"]
+    return stats
+
+
+def to_trace_events(timelines: Iterable[Timeline], path: Optional[str] = None) -> Dict[str, Any]:
+    """Exports timelines in the trace event format of Chrome tracing and Perfetto.
+
+    Every timeline is shown as its own track, with one complete event per phase.
+
+    Parameters
+    ----------
+    timelines: Iterable[Timeline]
+        The timelines to export.
+    path: Optional[str]
+        If given, the trace is also written to this file as JSON.
+
+    Returns
+    -------
+    Dict[str, Any]
+        The trace as a JSON-serializable dictionary.
+    """
+    events: List[Dict[str, Any]] = []
+    for track, timeline in enumerate(timelines, start=1):
+        label = f"{timeline.name} ({timeline.job_id})" if timeline.job_id else timeline.name
+        events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": track, "args": {"name": label}})
+        for span in timeline.spans():
+            events.append(_trace_event(span, track, timeline))
+    trace = {"traceEvents": events, "displayTimeUnit": "ms"}
+    if path:
+        with open(path, "w") as file:
+            json.dump(trace, file)
+    return trace
+
+
+def _trace_event(span: Span, track: int, timeline: Timeline) -> Dict[str, Any]:
+    start, duration = _microseconds(span.start, span.end)
+    return {
+        "name": span.name,
+        "cat": "nova-galaxy",
+        "ph": "X",
+        "ts": start,
+        "dur": duration,
+        "pid": 1,
+        "tid": track,
+        "args": {"tool": timeline.name, "job_id": timeline.job_id},
+    }
+
+
+def _microseconds(start: float, end: float) -> Tuple[int, int]:
+    return int(start * 1e6), int((end - start) * 1e6)
@@ -1,17 +1,23 @@
 """Contains classes to run tools in Galaxy via Connection."""
 
+import concurrent.futures
 import sys
-from typing import TYPE_CHECKING, List, Optional, Union
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
 
 if TYPE_CHECKING:
+    from .connection_group import DatastoreGroup
     from .data_store import Datastore  # Only imports for type checking
 
 from nova.common.job import WorkState
 
+from .cleanup import cancel_history_jobs
 from .dataset import AbstractData
+from .futures import ToolFuture, submit_job
 from .job import Job, JobStatus
 from .outputs import Outputs
 from .parameters import Parameters
+from .prefetch import PrefetchPolicy
+from .timeline import Timeline
 
 
 class AbstractWork:
@@ -41,8 +47,25 @@ class Tool(AbstractWork):
     def __init__(self, id: str):
         super().__init__(id)
         self._job: Optional[Job] = None
+        self._future: Optional[ToolFuture] = None
 
-    def run(self, data_store: "Datastore", params: Optional[Parameters] = None, wait: bool = True) -> Optional[Outputs]:
+    def __getstate__(self) -> Dict[str, Any]:
+        """Support for pickling as a handle to the same Galaxy job.
+
+        The future of a submitted tool belongs to this process and is not pickled, so get_future() of the unpickled tool
+        returns None. Its status and results are available through the pickled job.
+        """
+        state = self.__dict__.copy()
+        state["_future"] = None
+        return state
+
+    def run(
+        self,
+        data_store: Union["Datastore", "DatastoreGroup"],
+        params: Optional[Parameters] = None,
+        wait: bool = True,
+        prefetch: Optional[PrefetchPolicy] = None,
+    ) -> Optional[Outputs]:
         """Run this tool.
 
         By default, will be run in a blocking manner, unless `wait` is set to False. Will return the
@@ -51,12 +74,16 @@ class Tool(AbstractWork):
 
         Parameters
         ----------
-        data_store: Datastore
-            The data store to run this tool in.
+        data_store: Union[Datastore, DatastoreGroup]
+            The data store to run this tool in. If a data store group is given, the group chooses the Galaxy instance
+            and the tool runs in the data store of that instance.
         params: Parameters
             The input parameters for this tool.
         wait: bool
             Whether to run this tool in a blocking manner (True) or not (False). Default is True.
+        prefetch: Optional[PrefetchPolicy]
+            Outputs to download in the background as soon as the tool finishes, so their content is available locally
+            when it is requested. Nothing is prefetched by default.
 
         Returns
         -------
@@ -64,12 +91,49 @@ class Tool(AbstractWork):
             If run in a blocking manner, returns the Outputs once the tool is finished running. Otherwise, returns None.
 
         """
-        self._job = Job(self.id, data_store)
+        self._job = Job(self.id, resolve_data_store(data_store, self.id, params), prefetch)
+        self._future = None
         return self._job.run(params, wait)
 
+    def submit(
+        self,
+        data_store: Union["Datastore", "DatastoreGroup"],
+        params: Optional[Parameters] = None,
+        prefetch: Optional[PrefetchPolicy] = None,
+    ) -> ToolFuture:
+        """Start this tool and return a future of its outputs.
+
+        Inputs are uploaded and the job is submitted by a shared pool of threads, and all submitted tools are tracked
+        by a single watcher thread, so many tools can run at once without a blocked thread per tool. The future can be
+        used with concurrent.futures, awaited in asyncio code, or passed to nova.galaxy.futures.as_completed() and
+        nova.galaxy.futures.wait_all().
+
+        Parameters
+        ----------
+        data_store: Union[Datastore, DatastoreGroup]
+            The data store or data store group to run this tool in.
+        params: Parameters
+            The input parameters for this tool.
+        prefetch: Optional[PrefetchPolicy]
+            Outputs to download in the background as soon as the tool finishes.
+
+        Returns
+        -------
+        ToolFuture
+            Resolves to the Outputs of the tool, or raises the error if the tool fails. Cancelling the future cancels
+            the tool in Galaxy.
+        """
+        self._job = Job(self.id, resolve_data_store(data_store, self.id, params), prefetch)
+        self._future = submit_job(self, self._job, params)
+        return self._future
+
+    def get_future(self) -> Optional[ToolFuture]:
+        """Returns the future of the last run of this tool if it was started with submit()."""
+        return self._future
+
     def run_interactive(
         self,
-        data_store: "Datastore",
+        data_store: Union["Datastore", "DatastoreGroup"],
         params: Optional[Parameters] = None,
         wait: bool = True,
         max_tries: int = 100,
@@ -82,8 +146,8 @@ class Tool(AbstractWork):
 
         Parameters
         ----------
-        data_store: Datastore
-            The data store to run this tool in.
+        data_store: Union[Datastore, DatastoreGroup]
+            The data store or data store group to run this tool in.
         params: Parameters
             The input parameters for this tool.
         wait: bool
@@ -100,7 +164,8 @@ class Tool(AbstractWork):
             the URL to the interactive tool otherwise.
 
         """
-        self._job = Job(self.id, data_store)
+        self._job = Job(self.id, resolve_data_store(data_store, self.id, params))
+        self._future = None
         return self._job.run_interactive(params, wait=wait, max_tries=max_tries, check_url=check_url)
 
     def get_status(self) -> WorkState:
@@ -151,7 +216,9 @@ class Tool(AbstractWork):
 
     def wait_for_results(self) -> None:
         """Wait for this Tool to finish running."""
-        if self._job:
+        if self._future:
+            concurrent.futures.wait([self._future])
+        elif self._job:
             self._job.join_job_thread()
 
     def stop(self) -> None:
@@ -227,6 +294,21 @@ class Tool(AbstractWork):
             return self._job.get_url(max_tries=max_tries, check_url=check_url)
         return None
 
+    def get_timeline(self) -> Optional[Timeline]:
+        """Get the lifecycle timeline of the last run of this tool.
+
+        The timeline holds a timestamped transition for every state change of the job (uploading data, queued, running
+        and so on) as well as the download of its results, so slow runs can be broken down by phase.
+
+        Returns
+        -------
+        Optional[Timeline]
+           The timeline of this tool if it has been run.
+        """
+        if self._job:
+            return self._job.timeline
+        return None
+
     def get_uid(self) -> Optional[str]:
         """Get the unique ID for this tool.
 
@@ -258,12 +340,23 @@ class Tool(AbstractWork):
             raise Exception("Tool cannot be currently assigned an ID. Do not directly call this method.")
         self._job = Job(self.id, data_store)
         self._job.id = new_id
-        self._job.status.state = WorkState.QUEUED
+        self._job.timeline.job_id = new_id
+        self._job.update_status(WorkState.QUEUED)
 
 
 def stop_all_tools_in_store(data_store: "Datastore") -> None:
     """Stops all the tools from running in a particular store."""
-    galaxy_instance = data_store.nova_connection.galaxy_instance
-    jobs = galaxy_instance.jobs.get_jobs(history_id=data_store.history_id)
-    for job in jobs:
-        galaxy_instance.jobs.cancel_job(job["id"])
+    history_id = data_store.get_history_id(create=False)
+    if history_id:
+        cancel_history_jobs(data_store.nova_connection.galaxy_instance, history_id)
+
+
+def resolve_data_store(
+    data_store: Union["Datastore", "DatastoreGroup"], work_id: str, params: Optional[Parameters] = None
+) -> "Datastore":
+    """Returns the data store to run in, letting a data store group choose the Galaxy instance."""
+    from .connection_group import DatastoreGroup
+
+    if isinstance(data_store, DatastoreGroup):
+        return data_store.select(work_id, params)
+    return data_store
@@ -2,20 +2,40 @@
 
 import asyncio
 import threading
-from concurrent.futures import CancelledError
-from copy import copy
-from typing import Any, Callable, Optional
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from typing import Any, Callable, Generator, Optional, Tuple, TypeVar
 
 from blinker import signal
 
 from nova.common.job import ToolOutputs, WorkState
 from nova.common.signals import Signal, ToolCommand, get_signal_id
 from nova.galaxy import Connection, Tool
+from nova.galaxy.dataset import DEFAULT_CHUNK_SIZE, DataChunk, iter_chunks
 from nova.galaxy.interfaces import BasicTool
 from nova.galaxy.job import JobStatus
+from nova.galaxy.loop_monitor import get_loop_lag_monitor
+from nova.galaxy.transfer import is_buffer
 
 StoreFactoryFunction = Callable[[], str]
 
+# Suffix of the signal that receives result chunks while results are being retrieved.
+RESULTS_CHUNK_SIGNAL = "results_chunk"
+
+T = TypeVar("T")
+
+# Seconds a cancel waits for the run thread. Uploads and waits of a canceled job stop at their next chunk or status
+# check, so the thread normally ends well within this time.
+CANCEL_JOIN_TIMEOUT = 10.0
+
+# Blocking Galaxy requests made by tool runners run in this pool, never on the event loop. A dedicated pool keeps many
+# runners from starving other users of the loop's default executor.
+_io_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="nova-galaxy-io")
+
+
+async def run_in_io_thread(func: Callable[..., T], *args: Any) -> T:
+    """Runs a blocking function in the Galaxy I/O thread pool and waits for its result without blocking the loop."""
+    return await asyncio.get_running_loop().run_in_executor(_io_executor, func, *args)
+
 
 def job_stopped(state: WorkState) -> bool:
     return state in [
@@ -44,13 +64,31 @@ class ToolRunner:
         The URL of the Galaxy server to interact with.
     galaxy_api_key : str
         API key used for authentication with the Galaxy server.
+    max_result_size : Optional[int]
+        Maximum size of the results in bytes. Retrieval fails with an error message if the results are larger.
+    result_chunk_size : int
+        Size of the chunks in which results are delivered to the results chunk signal.
+    keep_results : bool
+        Whether results of a tool that overrides BasicTool.stream_results() are also collected in memory and returned.
+        Disable it for large results that clients only consume through the results chunk signal.
     """
 
     def __init__(
-        self, id: str, tool: BasicTool, store_factory: StoreFactoryFunction, galaxy_url: str, galaxy_api_key: str
+        self,
+        id: str,
+        tool: BasicTool,
+        store_factory: StoreFactoryFunction,
+        galaxy_url: str,
+        galaxy_api_key: str,
+        max_result_size: Optional[int] = None,
+        result_chunk_size: int = DEFAULT_CHUNK_SIZE,
+        keep_results: bool = True,
     ) -> None:
         self.galaxy_url = galaxy_url
         self.galaxy_api_key = galaxy_api_key
+        self.max_result_size = max_result_size
+        self.result_chunk_size = result_chunk_size
+        self.keep_results = keep_results
 
         self.sender_id = f"ToolRunner_{id}"
         self.store_factory = store_factory
@@ -65,6 +103,7 @@ class ToolRunner:
         self.error_message_signal = signal(get_signal_id(id, Signal.ERROR_MESSAGE))
         self.execution_signal = signal(get_signal_id(id, Signal.TOOL_COMMAND))
         self.outputs_signal = signal(get_signal_id(id, Signal.OUTPUTS))
+        self.results_chunk_signal = signal(get_signal_id(id, RESULTS_CHUNK_SIGNAL))
 
         self.error: str = ""
         self.loop: Optional[asyncio.AbstractEventLoop] = None
@@ -88,9 +127,10 @@ class ToolRunner:
             try:
                 if self.error or self.nova_tool:
                     if self.nova_tool:
-                        tool_status = self.nova_tool.get_full_status()
+                        tool_status = await run_in_io_thread(self.nova_tool.get_full_status)
                         tool_state = tool_status.state
-                        self._update_outputs(tool_status)
+                        stdout, stderr = await run_in_io_thread(self._fetch_outputs)
+                        self._update_outputs(tool_status, stdout, stderr)
                     else:
                         tool_state = WorkState.ERROR
                         self.current_outputs.stderr = self.error
@@ -101,16 +141,19 @@ class ToolRunner:
                 print(f"Exception during output monitoring: {e}")
             await asyncio.sleep(1)
 
-    def _update_outputs(self, tool_status: JobStatus) -> None:
+    def _fetch_outputs(self) -> Tuple[str, str]:
         if not self.nova_tool:
-            return
-        tool_state = tool_status.state
+            return "", ""
         try:
             stdout = self.nova_tool.get_stdout(len(self.current_outputs.stdout), 100000) or ""
             stderr = self.nova_tool.get_stderr(len(self.current_outputs.stderr), 100000) or ""
         except Exception:
             stdout = ""
             stderr = ""
+        return stdout, stderr
+
+    def _update_outputs(self, tool_status: JobStatus, stdout: str, stderr: str) -> None:
+        tool_state = tool_status.state
         if tool_state in [WorkState.RUNNING, WorkState.STOPPING]:
             self.current_outputs.stdout += stdout
             self.current_outputs.stderr += stderr
@@ -126,12 +169,15 @@ class ToolRunner:
         while True:
             try:
                 if self.nova_tool or self.error:
-                    status = self._get_job_status()
-                    if self.current_status.state != status.state:
+                    status = await run_in_io_thread(self._get_job_status)
+                    # Unchanged snapshots keep their version, so an integer comparison is enough to skip them.
+                    if self.current_status.version != status.version:
+                        state_changed = self.current_status.state != status.state
                         self.current_status = status
-                        await self._send_status_change_signal()
-                        if job_stopped(self.current_status.state):
-                            break
+                        if state_changed:
+                            await self._send_status_change_signal()
+                            if job_stopped(self.current_status.state):
+                                break
             except Exception as e:
                 print(f"Exception during run monitoring: {e}")
 
@@ -146,13 +192,16 @@ class ToolRunner:
 
     def _get_job_status(self) -> JobStatus:
         if self.nova_tool:
-            status = copy(self.nova_tool.get_full_status())
+            status = self.nova_tool.get_full_status()
             if status.state == WorkState.ERROR:
-                status.details = "Error running NDIP tool. Please see tool outputs for more information."
+                status = JobStatus(
+                    WorkState.ERROR,
+                    "Error running NDIP tool. Please see tool outputs for more information.",
+                    status.version,
+                    status.timestamp,
+                )
         else:
-            status = JobStatus()
-            status.state = WorkState.ERROR
-            status.details = self.error
+            status = JobStatus(WorkState.ERROR, self.error, version=1)
         return status
 
     def _run_in_background(self) -> None:
@@ -190,14 +239,18 @@ class ToolRunner:
             pass
 
     def _start_tool(self) -> None:
-        self.current_status.state = WorkState.NOT_STARTED
+        self.current_status = JobStatus()
         self.nova_tool = None
         self.error = ""
         self.current_outputs = ToolOutputs()
         self.loop = asyncio.get_event_loop()
+        monitor = get_loop_lag_monitor()
+        monitor.acquire()
         self.run_thread = threading.Thread(target=self._run_in_background, daemon=True)
         self.run_thread.start()
         self.monitoring_task = asyncio.create_task(self._monitor_run())
+        # The lag monitor runs as long as any tool of the loop is monitored.
+        self.monitoring_task.add_done_callback(lambda _: monitor.release())
         self.output_monitoring_task = asyncio.create_task(self._output_monitor_run())
 
     def _cancel_in_background(self) -> None:
@@ -205,20 +258,62 @@ class ToolRunner:
             raise Exception("Job should be started first")
         self.nova_tool.cancel()
         if self.run_thread:
-            self.run_thread.join()
+            self.run_thread.join(CANCEL_JOIN_TIMEOUT)
+            if self.run_thread.is_alive() and self.loop:
+                message = f"tool did not stop within {CANCEL_JOIN_TIMEOUT} seconds after cancel"
+                asyncio.run_coroutine_threadsafe(
+                    self.error_message_signal.send_async(self.sender_id, error_message=message), self.loop
+                )
         self._wait_async_task_finishes(self.monitoring_task)
         self._wait_async_task_finishes(self.output_monitoring_task)
 
-    async def _get_results(self) -> Optional[bytes]:
+    async def _get_results(self) -> Any:
         if not self.nova_tool:
             return None
+        # Results are retrieved in a worker thread, so the event loop is never blocked by the download. Each chunk is
+        # sent to the results chunk signal to let clients display partial results and progress.
+        if type(self.tool).stream_results is BasicTool.stream_results:
+            return await self._get_complete_results(self.nova_tool)
+        chunks = self.tool.stream_results(self.nova_tool, self.result_chunk_size)
+        res = bytearray()
+        size = 0
         try:
-            res = self.tool.get_results(self.nova_tool)
+            while True:
+                chunk = await run_in_io_thread(next, chunks, None)
+                if chunk is None:
+                    break
+                size += len(chunk.data)
+                if self.max_result_size is not None and size > self.max_result_size:
+                    raise Exception(f"results exceed the size limit of {self.max_result_size} bytes")
+                if self.keep_results:
+                    res += chunk.data
+                await self._send_chunk(chunk)
         except Exception as e:
+            if isinstance(chunks, Generator):
+                await run_in_io_thread(chunks.close)
             await self.error_message_signal.send_async(self.sender_id, error_message=f"cannot download results: {e}")
-            res = None
+            return None
+        return bytes(res) if self.keep_results else None
+
+    async def _get_complete_results(self, nova_tool: Tool) -> Any:
+        """Returns the value of get_results() unchanged, after sending it to the chunk signal if it is binary."""
+        try:
+            res = await run_in_io_thread(self.tool.get_results, nova_tool)
+            if is_buffer(res):
+                if self.max_result_size is not None and memoryview(res).nbytes > self.max_result_size:
+                    raise Exception(f"results exceed the size limit of {self.max_result_size} bytes")
+                for chunk in iter_chunks(res, self.result_chunk_size):
+                    await self._send_chunk(chunk)
+        except Exception as e:
+            await self.error_message_signal.send_async(self.sender_id, error_message=f"cannot download results: {e}")
+            return None
         return res
 
+    async def _send_chunk(self, chunk: DataChunk) -> None:
+        await self.results_chunk_signal.send_async(
+            self.sender_id, data=chunk.data, offset=chunk.offset, total=chunk.total, progress=chunk.progress
+        )
+
     def _cancel_tool(self) -> None:
         cancel_thread = threading.Thread(target=self._cancel_in_background, daemon=True)
         cancel_thread.start()
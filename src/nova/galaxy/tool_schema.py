@@ -0,0 +1,240 @@
+"""Cached input schemas of Galaxy tools for validating parameters before a job is submitted."""
+
+import difflib
+import re
+import time
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+from .dataset import AbstractData, DatasetCollection
+from .parameters import Parameters
+
+DEFAULT_SCHEMA_TTL = 600.0
+
+_REPEAT_INDEX = re.compile(r"^(.+)_\d+$")
+
+
+class ParameterValidationError(Exception):
+    """Exception raised when parameters do not match the inputs of a tool.
+
+    Attributes
+    ----------
+        tool_id (str): The id of the tool.
+        errors (List[str]): One message per invalid, unknown or missing parameter.
+    """
+
+    def __init__(self, tool_id: str, errors: List[str]):
+        self.tool_id = tool_id
+        self.errors = errors
+        super().__init__(f"Invalid parameters for tool {tool_id}: " + "; ".join(errors))
+
+
+class ToolSchema:
+    """The inputs and version of a Galaxy tool.
+
+    Parameters
+    ----------
+    tool_id: str
+        The id of the tool.
+    version: str
+        The version of the tool.
+    inputs: List[Dict[str, Any]]
+        The input definitions of the tool as returned by Galaxy.
+    """
+
+    def __init__(self, tool_id: str, version: str, inputs: List[Dict[str, Any]]) -> None:
+        self.tool_id = tool_id
+        self.version = version
+        self.inputs = inputs
+
+    def validate(self, params: Optional[Parameters]) -> None:
+        """Checks the parameters against the inputs of the tool.
+
+        Parameter names may address nested inputs with "|", e.g. "section|name", "conditional|name" or
+        "repeat_0|name". Values of data, numeric, boolean and select inputs are type checked, and required data inputs
+        outside of conditionals and repeats must be set.
+
+        Raises
+        ------
+        ParameterValidationError
+            With a message for every problem that was found.
+        """
+        values = params.inputs if params else {}
+        errors = []
+        for name, value in values.items():
+            if name.startswith("__"):
+                # Internal parameters such as job resource selections are not part of the tool inputs.
+                continue
+            spec, known = _find_input(self.inputs, name.split("|"))
+            if spec is None:
+                suggestion = difflib.get_close_matches(name, known, n=1)
+                hint = f" Did you mean '{suggestion[0]}'?" if suggestion else ""
+                errors.append(f"unknown parameter '{name}'.{hint}")
+                continue
+            error = _check_value(spec, value)
+            if error:
+                errors.append(f"parameter '{name}' {error}")
+        for name in _required_data_inputs(self.inputs):
+            if name not in values:
+                errors.append(f"required input '{name}' is missing")
+        if errors:
+            raise ParameterValidationError(self.tool_id, errors)
+
+
+class ToolSchemaCache:
+    """Cache of tool schemas for one connection.
+
+    Schemas are fetched once per tool and reused until they expire, so validating parameters does not add a request
+    to every run.
+
+    Parameters
+    ----------
+    galaxy_instance: GalaxyInstance
+        The Galaxy instance of the connection.
+    ttl: float
+        Seconds for which a schema is reused before it is fetched again.
+    """
+
+    def __init__(self, galaxy_instance: Any, ttl: float = DEFAULT_SCHEMA_TTL) -> None:
+        self.galaxy_instance = galaxy_instance
+        self.ttl = ttl
+        self._schemas: Dict[str, Tuple[float, ToolSchema]] = {}
+        self._lock = Lock()
+
+    def get(self, tool_id: str) -> ToolSchema:
+        """Returns the schema of the tool, fetching it from Galaxy if it is not cached or has expired."""
+        with self._lock:
+            cached = self._schemas.get(tool_id)
+        if cached and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+        tool = self.galaxy_instance.tools.show_tool(tool_id, io_details=True)
+        schema = ToolSchema(tool_id, tool.get("version", ""), tool.get("inputs", []))
+        with self._lock:
+            self._schemas[tool_id] = (time.monotonic(), schema)
+        return schema
+
+    def validate(self, tool_id: str, params: Optional[Parameters]) -> None:
+        """Checks the parameters against the schema of the tool.
+
+        Tools that do not exist are reported right away. If the schema cannot be fetched for any other reason, the
+        parameters are not checked and Galaxy validates them on submission as usual.
+
+        Raises
+        ------
+        ParameterValidationError
+            If the parameters do not match the inputs of the tool.
+        Exception
+            If the tool does not exist.
+        """
+        try:
+            schema = self.get(tool_id)
+        except Exception as e:
+            if getattr(e, "status_code", None) in [400, 404]:
+                raise Exception(f"Tool {tool_id} is not available on this Galaxy instance.") from e
+            return
+        schema.validate(params)
+
+    def clear(self) -> None:
+        """Removes all cached schemas."""
+        with self._lock:
+            self._schemas.clear()
+
+
+def _find_input(inputs: List[Dict[str, Any]], path: List[str]) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """Finds the input definition for a parameter path and returns it with the names known at the failing level."""
+    known = [spec["name"] for spec in inputs]
+    name = path[0]
+    for spec in inputs:
+        input_type = spec.get("type")
+        if input_type == "repeat":
+            match = _REPEAT_INDEX.match(name)
+            if not match or match.group(1) != spec["name"]:
+                continue
+        elif spec["name"] != name:
+            continue
+        if len(path) == 1:
+            return (spec, known) if input_type not in ["repeat", "section", "conditional"] else (None, known)
+        if input_type in ["repeat", "section", "conditional"]:
+            nested, nested_known = _find_input(_nested_inputs(spec), path[1:])
+            return nested, [f"{name}|{child}" for child in nested_known]
+        return None, known
+    return None, known
+
+
+def _nested_inputs(spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if spec.get("type") == "conditional":
+        inputs = [spec["test_param"]] if spec.get("test_param") else []
+        for case in spec.get("cases", []):
+            inputs.extend(case.get("inputs", []))
+        return inputs
+    return spec.get("inputs", [])
+
+
+def _required_data_inputs(inputs: List[Dict[str, Any]], prefix: str = "") -> List[str]:
+    required = []
+    for spec in inputs:
+        input_type = spec.get("type")
+        if input_type == "section":
+            required.extend(_required_data_inputs(spec.get("inputs", []), f"{prefix}{spec['name']}|"))
+        elif input_type in ["data", "data_collection"] and not spec.get("optional") and not spec.get("value"):
+            required.append(f"{prefix}{spec['name']}")
+    return required
+
+
+def _check_value(spec: Dict[str, Any], value: Any) -> Optional[str]:
+    """Returns a description of the problem if the value does not fit the input, or None if it does."""
+    input_type = spec.get("type")
+    if input_type in ["data", "data_collection"]:
+        if value is None:
+            return None if spec.get("optional") else "is required and must not be None"
+        if isinstance(value, dict) and "src" in value and "id" in value:
+            return None
+        if not isinstance(value, AbstractData):
+            return f"expects a dataset, got {type(value).__name__}"
+        if input_type == "data_collection" and not isinstance(value, DatasetCollection):
+            return "expects a dataset collection, got a dataset"
+        return None
+    if spec.get("optional") and value in [None, "", []]:
+        # Galaxy uses the default, or no value, for optional inputs that are left empty.
+        return None
+    if input_type == "integer":
+        return _check_number(spec, value, int)
+    if input_type == "float":
+        return _check_number(spec, value, float)
+    if input_type == "boolean":
+        if isinstance(value, bool) or str(value).lower() in ["true", "false"]:
+            return None
+        return f"expects a boolean, got {value!r}"
+    if input_type == "select":
+        options = [option[1] for option in spec.get("options") or [] if isinstance(option, (list, tuple))]
+        if not options:
+            # Options that are computed from other inputs or datasets are not known in advance.
+            return None
+        selected = [value]
+        if spec.get("multiple"):
+            # Galaxy accepts several options as a list or as a comma-separated string.
+            if isinstance(value, list):
+                selected = value
+            elif isinstance(value, str):
+                selected = value.split(",")
+        invalid = [item for item in selected if str(item) not in options]
+        if invalid:
+            return f"has invalid value {invalid[0]!r}, expected one of {', '.join(options)}"
+    return None
+
+
+def _check_number(spec: Dict[str, Any], value: Any, number_type: type) -> Optional[str]:
+    expected = "an integer" if number_type is int else "a number"
+    if isinstance(value, bool) or (number_type is int and isinstance(value, float) and not value.is_integer()):
+        return f"expects {expected}, got {value!r}"
+    try:
+        number = number_type(value)
+    except (TypeError, ValueError):
+        return f"expects {expected}, got {value!r}"
+    minimum = spec.get("min")
+    maximum = spec.get("max")
+    if minimum not in [None, ""] and number < float(minimum):
+        return f"must be at least {minimum}, got {value!r}"
+    if maximum not in [None, ""] and number > float(maximum):
+        return f"must be at most {maximum}, got {value!r}"
+    return None
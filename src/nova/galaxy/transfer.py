@@ -0,0 +1,411 @@
+"""Helpers and settings to transfer data between the client and Galaxy."""
+
+import gzip
+import os
+import tempfile
+from threading import Lock
+from typing import Any, Dict, Generator, List, Optional, Tuple
+
+from .cancellation import CancellationToken, check
+
+TRANSFER_CHUNK_SIZE = 1024 * 1024
+# Size of the blocks fetched by ranged reads of datasets.
+RANGE_BLOCK_SIZE = 256 * 1024
+# Uncompressed size above which compressed uploads are sent in chunks with the resumable tus protocol, so that no
+# single request exceeds the body size limits of proxies in front of Galaxy.
+RESUMABLE_UPLOAD_THRESHOLD = 10 * 1024 * 1024
+# Signatures of compressed formats that are not worth compressing again.
+COMPRESSED_SIGNATURES = [b"\x1f\x8b", b"BZh", b"PK\x03\x04", b"\xfd7zXZ", b"\x28\xb5\x2f\xfd"]
+
+
+class TransferSettings:
+    """Transfer options and statistics of a connection.
+
+    Compression is opt-in. When enabled, uploads at or above the size threshold are gzip compressed on the client and
+    decompressed by Galaxy on upload. Downloads always accept compressed encodings, which are decoded transparently.
+
+    Parameters
+    ----------
+    compress: bool
+        Whether to compress uploads.
+    compression_threshold: int
+        Minimum size in bytes for an upload to be compressed.
+    compression_level: int
+        The gzip compression level, from 1 (fastest) to 9 (smallest).
+    """
+
+    def __init__(self, compress: bool = False, compression_threshold: int = 1024 * 1024, compression_level: int = 6):
+        self.compress = compress
+        self.compression_threshold = compression_threshold
+        self.compression_level = compression_level
+        self.bytes_sent = 0
+        self.bytes_sent_uncompressed = 0
+        self.bytes_received = 0
+        self.bytes_received_uncompressed = 0
+        self._lock = Lock()
+
+    @property
+    def bytes_saved(self) -> int:
+        """Number of bytes that compression kept off the network in both directions."""
+        return (self.bytes_sent_uncompressed - self.bytes_sent) + (
+            self.bytes_received_uncompressed - self.bytes_received
+        )
+
+    def should_compress(self, size: int) -> bool:
+        """Checks if an upload of the given size should be compressed."""
+        return self.compress and size >= self.compression_threshold
+
+    def record_upload(self, uncompressed: int, sent: int) -> None:
+        with self._lock:
+            self.bytes_sent_uncompressed += uncompressed
+            self.bytes_sent += sent
+
+    def record_download(self, uncompressed: int, received: int) -> None:
+        with self._lock:
+            self.bytes_received_uncompressed += uncompressed
+            self.bytes_received += received
+
+
+class BufferReader:
+    """Read-only file-like view of a buffer-protocol object (bytes, memoryview, NumPy arrays, ...).
+
+    Used to stream in-memory content in a multipart request without copying the whole content first. Reading raises
+    OperationCancelledError once the given cancellation token is cancelled, which aborts the request.
+    """
+
+    def __init__(self, content: Any, token: Optional[CancellationToken] = None) -> None:
+        self._token = token
+        view = memoryview(content)
+        if not view.contiguous:
+            # Non-contiguous buffers (e.g. strided array slices) can only be sent after making them contiguous.
+            view = memoryview(view.tobytes())
+        self._view = view.cast("B")
+        self._position = 0
+
+    @property
+    def len(self) -> int:
+        """Number of bytes left to read."""
+        return len(self._view) - self._position
+
+    def read(self, size: int = -1) -> bytes:
+        check(self._token)
+        if size is None or size < 0:
+            size = self.len
+        chunk = self._view[self._position : self._position + size]
+        self._position += len(chunk)
+        return chunk.tobytes()
+
+    def close(self) -> None:
+        self._view.release()
+
+
+class StreamReader:
+    """File-like object of known length that is streamed in a multipart request.
+
+    Reading raises OperationCancelledError once the given cancellation token is cancelled, which aborts the request.
+    """
+
+    def __init__(self, file: Any, length: int, token: Optional[CancellationToken] = None) -> None:
+        self._token = token
+        self._file = file
+        self._remaining = length
+
+    @property
+    def len(self) -> int:
+        """Number of bytes left to read."""
+        return self._remaining
+
+    def read(self, size: int = -1) -> bytes:
+        check(self._token)
+        if size is None or size < 0:
+            size = self._remaining
+        chunk = self._file.read(min(size, self._remaining))
+        self._remaining -= len(chunk)
+        return chunk
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def gzip_stream(source: Any, level: int = 6, token: Optional[CancellationToken] = None) -> StreamReader:
+    """Compresses a readable source chunk by chunk into a temporary file, which only stays in memory if small.
+
+    The returned reader raises OperationCancelledError once the given cancellation token is cancelled.
+    """
+    compressed = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+    _gzip_into(source, compressed, level)
+    length = compressed.tell()
+    compressed.seek(0)
+    return StreamReader(compressed, length, token)
+
+
+def _gzip_into(source: Any, file: Any, level: int) -> None:
+    with gzip.GzipFile(fileobj=file, mode="wb", compresslevel=level, mtime=0) as gzip_file:
+        while chunk := source.read(TRANSFER_CHUNK_SIZE):
+            gzip_file.write(chunk)
+
+
+def is_compressed_file(path: str) -> bool:
+    """Checks if a local file is already in a compressed format."""
+    with open(path, "rb") as file:
+        header = file.read(6)
+    return any(header.startswith(signature) for signature in COMPRESSED_SIGNATURES)
+
+
+def iter_response(
+    response: Any,
+    chunk_size: int = TRANSFER_CHUNK_SIZE,
+    settings: Optional[TransferSettings] = None,
+    token: Optional[CancellationToken] = None,
+) -> Generator[bytes, None, None]:
+    """Iterates over the decoded content of a streaming response and records the transferred bytes.
+
+    Raises OperationCancelledError before the next chunk once the given cancellation token is cancelled.
+    """
+    received = 0
+    try:
+        for data in response.iter_content(chunk_size=chunk_size):
+            check(token)
+            if data:
+                received += len(data)
+                yield data
+    finally:
+        if settings:
+            # The raw stream counts the bytes received from the network, before any content decoding.
+            settings.record_download(received, response.raw.tell() or received)
+        response.close()
+
+
+def get_range(galaxy_instance: Any, url: str, start: int, end: int, **kwargs: Any) -> Any:
+    """Sends a streaming GET request for the bytes from start to end (inclusive) of a resource.
+
+    The request asks for the identity encoding, so the range refers to the stored bytes. Servers that do not support
+    ranges answer with the complete content and status 200 instead of 206. Like all file transfers, the request is not
+    sent through the rate limiter of the Galaxy instance.
+    """
+    import requests
+
+    headers = {**galaxy_instance.json_headers, "Range": f"bytes={start}-{end}", "Accept-Encoding": "identity"}
+    kwargs.setdefault("timeout", galaxy_instance.timeout)
+    kwargs.setdefault("verify", galaxy_instance.verify)
+    return requests.get(url, headers=headers, stream=True, **kwargs)
+
+
+def is_buffer(content: Any) -> bool:
+    """Checks if the content supports the buffer protocol and should be uploaded as binary data."""
+    if isinstance(content, str):
+        return False
+    try:
+        memoryview(content)
+    except TypeError:
+        return False
+    return True
+
+
+def upload_stream(
+    galaxy_instance: Any,
+    history_id: str,
+    file_name: str,
+    stream: Any,
+    file_type: str = "auto",
+    dbkey: str = "?",
+    to_posix_lines: bool = True,
+    auto_decompress: bool = False,
+) -> Dict[str, Any]:
+    """Uploads a file-like object as a new dataset with a single multipart request to the upload tool.
+
+    The request has the same inputs of the upload1 tool as ToolClient.upload_file() of bioblend sends for files that
+    are not uploaded with tus.
+
+    Parameters
+    ----------
+    galaxy_instance: GalaxyInstance
+        The Galaxy instance to upload to.
+    history_id: str
+        The history in which the dataset is created.
+    file_name: str
+        The name of the new dataset.
+    stream: Any
+        A file-like object with a read() method and a len attribute holding the number of bytes left to read.
+    file_type: str
+        The Galaxy datatype of the new dataset, detected by Galaxy by default.
+    dbkey: str
+        The genome build of the new dataset.
+    to_posix_lines: bool
+        Whether Galaxy converts line endings to POSIX. Galaxy skips the conversion for binary data.
+    auto_decompress: bool
+        Whether Galaxy decompresses a compressed stream on upload, using the auto_decompress input of the upload tool.
+
+    Returns
+    -------
+    Dict[str, Any]
+        Information about the upload job, including the new dataset in "outputs".
+    """
+    from bioblend.util import FileStream
+
+    inputs: Dict[str, Any] = {
+        "file_type": file_type,
+        "dbkey": dbkey,
+        "files_0|type": "upload_dataset",
+        "files_0|NAME": file_name,
+    }
+    if not to_posix_lines:
+        inputs["files_0|to_posix_lines"] = False
+    if auto_decompress:
+        inputs["files_0|auto_decompress"] = True
+    payload = {
+        "history_id": history_id,
+        "tool_id": "upload1",
+        "inputs": inputs,
+        "files_0|file_data": FileStream(file_name, stream),
+    }
+    return galaxy_instance.make_post_request(f"{galaxy_instance.url}/tools", payload=payload, files_attached=True)
+
+
+def upload_file(
+    galaxy_instance: Any,
+    history_id: str,
+    path: str,
+    file_name: str,
+    token: Optional[CancellationToken] = None,
+    to_posix_lines: bool = True,
+    auto_decompress: bool = False,
+) -> Dict[str, Any]:
+    """Uploads a local file like ToolClient.upload_file() of bioblend, but can be cancelled in the middle of the upload.
+
+    Galaxy 22.01 and later receive the file in chunks with the resumable tus protocol, and the token is checked before
+    every chunk. Older versions receive it in a single multipart request that checks the token for every read.
+
+    Parameters
+    ----------
+    galaxy_instance: GalaxyInstance
+        The Galaxy instance to upload to.
+    history_id: str
+        The history in which the dataset is created.
+    path: str
+        The local file to upload.
+    file_name: str
+        The name of the new dataset.
+    token: Optional[CancellationToken]
+        Aborts the upload with OperationCancelledError as soon as it is cancelled.
+    to_posix_lines: bool
+        Whether Galaxy converts line endings to POSIX. Galaxy skips the conversion for binary data.
+    auto_decompress: bool
+        Whether Galaxy decompresses a compressed file on upload.
+
+    Returns
+    -------
+    Dict[str, Any]
+        Information about the upload job, including the new dataset in "outputs".
+    """
+    if galaxy_instance.config.get_version()["version_major"] < "22.01":
+        stream = StreamReader(open(path, "rb"), os.path.getsize(path), token)
+        try:
+            return upload_stream(
+                galaxy_instance,
+                history_id,
+                file_name,
+                stream,
+                to_posix_lines=to_posix_lines,
+                auto_decompress=auto_decompress,
+            )
+        finally:
+            stream.close()
+    uploader = galaxy_instance.get_tus_uploader(path)
+    size = uploader.get_file_size()
+    while True:
+        check(token)
+        uploader.upload(stop_at=min(uploader.offset + uploader.chunk_size, size))
+        if uploader.offset >= size:
+            break
+    return galaxy_instance.tools.post_to_fetch(
+        path,
+        history_id,
+        uploader.session_id,
+        file_name=file_name,
+        to_posix_lines=to_posix_lines,
+        auto_decompress=auto_decompress,
+    )
+
+
+def upload_compressed(
+    galaxy_instance: Any,
+    history_id: str,
+    file_name: str,
+    source: Any,
+    level: int = 6,
+    to_posix_lines: bool = True,
+    token: Optional[CancellationToken] = None,
+) -> Tuple[Dict[str, Any], int]:
+    """Compresses a readable source with gzip and uploads it as a new dataset that Galaxy decompresses.
+
+    The content is compressed completely before it is sent, since both upload requests need its final size. Sources up
+    to RESUMABLE_UPLOAD_THRESHOLD bytes are sent in a single multipart request. Larger ones are compressed into a
+    temporary file, which is sent in chunks like upload_file().
+
+    Parameters
+    ----------
+    galaxy_instance: GalaxyInstance
+        The Galaxy instance to upload to.
+    history_id: str
+        The history in which the dataset is created.
+    file_name: str
+        The name of the new dataset.
+    source: Any
+        A file-like object with a read() method and a len attribute holding the number of bytes left to read.
+    level: int
+        The gzip compression level, from 1 (fastest) to 9 (smallest).
+    to_posix_lines: bool
+        Whether Galaxy converts line endings to POSIX. Galaxy skips the conversion for binary data.
+    token: Optional[CancellationToken]
+        Aborts the compression and the upload with OperationCancelledError as soon as it is cancelled.
+
+    Returns
+    -------
+    Tuple[Dict[str, Any], int]
+        Information about the upload job, including the new dataset in "outputs", and the number of bytes sent.
+    """
+    if source.len <= RESUMABLE_UPLOAD_THRESHOLD:
+        compressed = gzip_stream(source, level, token)
+        sent = compressed.len
+        try:
+            info = upload_stream(
+                galaxy_instance, history_id, file_name, compressed, to_posix_lines=to_posix_lines, auto_decompress=True
+            )
+        finally:
+            compressed.close()
+        return info, sent
+    fd, path = tempfile.mkstemp(suffix=".gz")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            _gzip_into(source, file, level)
+        sent = os.path.getsize(path)
+        info = upload_file(
+            galaxy_instance, history_id, path, file_name, token, to_posix_lines=to_posix_lines, auto_decompress=True
+        )
+        return info, sent
+    finally:
+        os.remove(path)
+
+
+def fetch_datasets(galaxy_instance: Any, history_id: str, elements: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Creates datasets from server paths or URLs with a single request to the fetch API of Galaxy.
+
+    Galaxy reads the data itself, so nothing is transferred from the client.
+
+    Parameters
+    ----------
+    galaxy_instance: GalaxyInstance
+        The Galaxy instance to import into.
+    history_id: str
+        The history in which the datasets are created.
+    elements: List[Dict[str, Any]]
+        One fetch element per dataset, e.g. {"src": "url", "url": ..., "name": ..., "ext": "auto"}.
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        The new datasets, in the order of the elements.
+    """
+    payload = {"history_id": history_id, "targets": [{"destination": {"type": "hdas"}, "elements": elements}]}
+    return galaxy_instance.make_post_request(f"{galaxy_instance.url}/tools/fetch", payload=payload)["outputs"]
@@ -0,0 +1,306 @@
+"""Contains classes to run workflows in Galaxy via Connection."""
+
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from .data_store import Datastore  # Only imports for type checking
+
+from nova.common.job import WorkState
+
+from .cancellation import MAX_SHED_BACKOFF
+from .dataset import AbstractData, Dataset, DatasetCollection
+from .job import Job, JobStatus
+from .outputs import Outputs
+from .parameters import Parameters
+from .rate_limit import Priority, RequestShedError, request_priority
+from .timeline import Timeline
+from .tool import AbstractWork
+
+# Galaxy job states in which a workflow step has stopped running.
+_FINISHED_JOB_STATES = {"ok", "skipped"}
+_FAILED_JOB_STATES = {"error", "failed", "deleted", "deleted_new", "paused"}
+_RUNNING_JOB_STATES = {"running"}
+
+
+def _step_state(states: Dict[str, int]) -> WorkState:
+    """Maps the job state counts of a workflow step to a single WorkState."""
+    if any(states.get(state, 0) for state in _FAILED_JOB_STATES):
+        return WorkState.ERROR
+    if states and all(state in _FINISHED_JOB_STATES for state, count in states.items() if count):
+        return WorkState.FINISHED
+    if any(states.get(state, 0) for state in _RUNNING_JOB_STATES):
+        return WorkState.RUNNING
+    return WorkState.QUEUED
+
+
+class WorkflowInvocation(Job):
+    """Internal class managing Galaxy workflow invocations. Should not be used by end users.
+
+    Inputs are uploaded and the status is tracked in the same way as for tool jobs, but the whole workflow is scheduled
+    by Galaxy in a single request, so steps start as soon as their inputs are ready without any client round trips.
+    """
+
+    def __init__(self, workflow_id: str, data_store: "Datastore", poll_interval: float = 1.0) -> None:
+        super().__init__(workflow_id, data_store)
+        self.poll_interval = poll_interval
+        self.steps: List[WorkState] = []
+        self.outputs: Dict[str, Dict[str, Any]] = {}
+        self.output_collections: Dict[str, Dict[str, Any]] = {}
+
+    def submit(self, params: Optional[Parameters]) -> None:
+        """Handles uploading inputs and invoking the workflow."""
+        self.update_status(WorkState.UPLOADING_DATA)
+        self.steps = []
+        datasets_to_upload = {}
+
+        # Workflow inputs are matched by the labels of the input steps.
+        workflow_inputs: Dict[str, Any] = {}
+        if params:
+            for param, val in params.inputs.items():
+                if isinstance(val, AbstractData) and self._is_in_store(val):
+                    src = "hdca" if isinstance(val, DatasetCollection) else "hda"
+                    workflow_inputs[param] = {"src": src, "id": val.id}
+                elif isinstance(val, Dataset):
+                    datasets_to_upload[param] = val
+                else:
+                    workflow_inputs[param] = val
+            ids = self.upload_datasets(datasets=datasets_to_upload)
+            if ids:
+                for param, val in ids.items():
+                    workflow_inputs[param] = {"src": "hda", "id": val}
+
+        if self.status.state in [WorkState.STOPPING, WorkState.CANCELING]:
+            self.update_status(WorkState.CANCELED)
+            return
+        self.update_status(WorkState.QUEUED)
+        with request_priority(Priority.HIGH):
+            invocation = self.galaxy_instance.workflows.invoke_workflow(
+                self.tool, inputs=workflow_inputs, history_id=self.store.history_id, inputs_by="name"
+            )
+        self.id = invocation["id"]
+        self.timeline.job_id = self.id
+        if self.cancel_token.cancelled:
+            # The invocation was canceled while it was being submitted, before its id was known.
+            self.cancel()
+
+    def wait_for_results(self, timeout: float = 1200000) -> None:
+        """Wait for the invocation to be scheduled and all of its jobs to finish.
+
+        A single loop polls the invocation until Galaxy has scheduled all steps, then the job summary of the steps until
+        all jobs have finished. The outputs are fetched once at the end.
+        """
+        if self.status.state == WorkState.CANCELED:
+            raise Exception("Workflow invocation was canceled before it was submitted.")
+        with request_priority(Priority.LOW):
+            self._poll_invocation(timeout)
+
+    def _poll_invocation(self, timeout: float) -> None:
+        invocations = self.galaxy_instance.invocations
+        deadline = time.monotonic() + timeout
+        scheduled = False
+        backoff = self.poll_interval
+        while True:
+            try:
+                if not scheduled:
+                    state = invocations.show_invocation(self.id)["state"]
+                    if state in ["failed", "cancelled", "cancelling"]:
+                        raise Exception(f"Workflow invocation {self.id} is {state}.")
+                    scheduled = state == "scheduled"
+                summary = invocations.get_invocation_step_jobs_summary(self.id)
+            except RequestShedError:
+                # Galaxy is overloaded, so back off instead of failing the invocation.
+                if time.monotonic() > deadline:
+                    raise Exception(f"Workflow invocation {self.id} did not finish in time.") from None
+                backoff = min(backoff * 2, MAX_SHED_BACKOFF)
+                self.cancel_token.sleep(backoff)
+                continue
+            backoff = self.poll_interval
+            self.steps = [_step_state(step.get("states", {})) for step in summary]
+            if WorkState.ERROR in self.steps:
+                raise Exception(f"Step {self.steps.index(WorkState.ERROR) + 1} of workflow {self.tool} failed.")
+            if scheduled and all(step == WorkState.FINISHED for step in self.steps):
+                break
+            if self.status.state == WorkState.QUEUED and WorkState.RUNNING in self.steps:
+                self.update_status(WorkState.RUNNING)
+            if time.monotonic() > deadline:
+                raise Exception(f"Workflow invocation {self.id} did not finish in time.")
+            # Interrupted as soon as the invocation is canceled.
+            self.cancel_token.sleep(self.poll_interval)
+        invocation = invocations.show_invocation(self.id)
+        self.outputs = invocation.get("outputs", {})
+        self.output_collections = invocation.get("output_collections", {})
+
+    def get_state(self) -> JobStatus:
+        """Returns current state of the invocation, which is kept up to date by the polling loop."""
+        return self.status
+
+    def get_results(self) -> Optional[Outputs]:
+        """Return the labeled outputs of the finished invocation."""
+        if self.status.state == WorkState.FINISHED:
+            outputs = Outputs()
+            for label, output in self.outputs.items():
+                d = Dataset(label)
+                d.id = output["id"]
+                d.store = self.store
+                d.timeline = self.timeline
+                outputs.add_output(d)
+            for label, output in self.output_collections.items():
+                dc = DatasetCollection(label)
+                dc.id = output["id"]
+                dc.store = self.store
+                outputs.add_output(dc)
+            return outputs
+        elif self.status.state == WorkState.ERROR:
+            return None
+        else:
+            raise Exception(f"Workflow invocation {self.id} has not finished running.")
+
+    def stop(self) -> bool:
+        """Workflows cannot be stopped while keeping partial results, so this cancels the invocation."""
+        return self.cancel()
+
+    def cancel(self) -> bool:
+        """Cancel the invocation in Galaxy. Running uploads and waits of the job thread are aborted right away."""
+        self.update_status(WorkState.CANCELING)
+        self.cancel_token.cancel()
+        if not self.id:
+            # The job thread stops its uploads and does not invoke the workflow.
+            return True
+        try:
+            with request_priority(Priority.HIGH):
+                self.galaxy_instance.invocations.cancel_invocation(self.id)
+            return True
+        except Exception:
+            return False
+
+
+class Workflow(AbstractWork):
+    """Represents a workflow from Galaxy that can be run.
+
+    All steps of the workflow are scheduled by Galaxy in one invocation, so outputs of one step are passed to the next
+    step on the server without waiting for the client. It's recommended to create a new Workflow object every time you
+    want to run a workflow to prevent results from being overridden.
+    """
+
+    def __init__(self, id: str, poll_interval: float = 1.0):
+        super().__init__(id)
+        self.poll_interval = poll_interval
+        self._invocation: Optional[WorkflowInvocation] = None
+
+    def run(self, data_store: "Datastore", params: Optional[Parameters] = None, wait: bool = True) -> Optional[Outputs]:
+        """Run this workflow.
+
+        By default, will be run in a blocking manner, unless `wait` is set to False. Will return the labeled workflow
+        outputs as an instance of the `Outputs` class if run in a blocking way. Otherwise, will return None, and the
+        user will be responsible for getting results by calling `get_results`.
+
+        Parameters
+        ----------
+        data_store: Datastore
+            The data store to run this workflow in.
+        params: Parameters
+            The inputs of this workflow, keyed by the labels of the workflow input steps.
+        wait: bool
+            Whether to run this workflow in a blocking manner (True) or not (False). Default is True.
+
+        Returns
+        -------
+        Optional[Outputs]
+            If run in a blocking manner, returns the Outputs once the workflow is finished. Otherwise, returns None.
+        """
+        self._invocation = WorkflowInvocation(self.id, data_store, self.poll_interval)
+        return self._invocation.run(params, wait)
+
+    def get_status(self) -> WorkState:
+        """Returns the current status of the workflow.
+
+        Returns
+        -------
+        WorkState
+           Returns the status of the workflow which will be a WorkState value.
+        """
+        if self._invocation:
+            return self._invocation.get_state().state
+        else:
+            return WorkState.NOT_STARTED
+
+    def get_full_status(self) -> JobStatus:
+        """Returns the full status and state of the workflow. Includes any error messages.
+
+        Raises
+        ------
+        Exception
+            If the workflow has not been started.
+
+        Returns
+        -------
+        JobStatus
+           Returns the full status of the workflow including the WorkState and any error messages.
+        """
+        if self._invocation:
+            return self._invocation.get_state()
+        else:
+            raise Exception("Workflow has not started.")
+
+    def get_step_states(self) -> List[WorkState]:
+        """Returns the states of the workflow steps that run jobs, in the order of the workflow.
+
+        Returns
+        -------
+        List[WorkState]
+           The state of each step as of the last poll. Empty if the workflow has not been scheduled yet.
+        """
+        if self._invocation:
+            return list(self._invocation.steps)
+        return []
+
+    def get_results(self) -> Optional[Outputs]:
+        """Returns the labeled outputs from running this workflow.
+
+        Throws an Exception if the workflow has not finished yet.
+
+        Returns
+        -------
+        Optional[Outputs]
+          An instance of Outputs that holds the labeled datasets and collections of this workflow if it is finished.
+        """
+        if self._invocation:
+            return self._invocation.get_results()
+        return None
+
+    def wait_for_results(self) -> None:
+        """Wait for this Workflow to finish running."""
+        if self._invocation:
+            self._invocation.join_job_thread()
+
+    def cancel(self) -> None:
+        """Cancels the workflow invocation."""
+        if self._invocation:
+            self._invocation.cancel()
+
+    def get_timeline(self) -> Optional[Timeline]:
+        """Get the lifecycle timeline of the last run of this workflow.
+
+        Returns
+        -------
+        Optional[Timeline]
+           The state transitions and result downloads of the workflow invocation, if it has been run.
+        """
+        if self._invocation:
+            return self._invocation.timeline
+        return None
+
+    def get_uid(self) -> Optional[str]:
+        """Get the invocation ID of this workflow.
+
+        Will only be available if Workflow.run() has been successfully invoked.
+
+        Returns
+        -------
+        Optional[str]
+           Returns the invocation id of this workflow if it is running or finished.
+        """
+        if self._invocation:
+            return self._invocation.id
+        return None
@@ -0,0 +1,199 @@
+"""Cancel latency benchmark for uploads and waits of running tools."""
+
+import os
+import time
+from threading import Thread
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import pytest
+from nova.common.job import WorkState
+
+from nova.galaxy.cancellation import CancellationToken, OperationCancelledError, wait_for_state
+from nova.galaxy.cleanup import get_cleanup_worker
+from nova.galaxy.data_store import Datastore
+from nova.galaxy.dataset import Dataset
+from nova.galaxy.parameters import Parameters
+from nova.galaxy.tool import Tool
+from nova.galaxy.transfer import TransferSettings, upload_file
+
+# Simulated time to send one chunk of an upload to Galaxy.
+CHUNK_TIME = 0.01
+CHUNK_SIZE = 64 * 1024
+# Allowed time (in seconds) between a cancel and the end of the job thread.
+LATENCY_BUDGET = float(os.environ.get("NOVA_GALAXY_CANCEL_LATENCY_BUDGET", "0.5"))
+
+
+class SlowGalaxy:
+    """Galaxy instance that receives uploads slowly and never finishes jobs."""
+
+    def __init__(self) -> None:
+        self.url = "http://galaxy.invalid/api"
+        self.requests: List[Any] = []
+        self.uploading = False
+        self.tools = SimpleNamespace(run_tool=self.run_tool)
+        self.datasets = SimpleNamespace(show_dataset=lambda dataset_id: {"id": dataset_id, "state": "ok"})
+        self.jobs = SimpleNamespace(show_job=lambda job_id: {"id": job_id, "state": "queued"}, cancel_job=self.cancel)
+
+    def make_post_request(self, url: str, payload: Dict[str, Any], files_attached: bool = False) -> Dict[str, Any]:
+        stream = payload["files_0|file_data"].fd
+        self.uploading = True
+        while stream.read(CHUNK_SIZE):
+            time.sleep(CHUNK_TIME)
+        self.requests.append("upload")
+        return {"outputs": [{"id": f"dataset_{len(self.requests)}"}]}
+
+    def make_put_request(self, url: str, payload: Dict[str, Any]) -> None:
+        self.requests.append(("purge", [item["id"] for item in payload["items"]]))
+
+    def run_tool(self, history_id: str, tool_id: str, tool_inputs: Any) -> Dict[str, Any]:
+        self.requests.append("run_tool")
+        return {"jobs": [{"id": "job_1"}], "outputs": [], "output_collections": []}
+
+    def cancel(self, job_id: str) -> bool:
+        self.requests.append(("cancel", job_id))
+        return True
+
+
+def make_store(galaxy: SlowGalaxy) -> Datastore:
+    connection = SimpleNamespace(
+        galaxy_instance=galaxy, galaxy_url="http://galaxy.invalid", tool_schemas=None, transfer=TransferSettings()
+    )
+    return Datastore("store", connection, "history_1")  # type: ignore
+
+
+def dataset_of_size(size: int) -> Dataset:
+    dataset = Dataset(name=f"data_{size}")
+    dataset.set_content(bytes(size))
+    return dataset
+
+
+def cancel_latency(tool: Tool) -> float:
+    assert tool._job is not None
+    start = time.monotonic()
+    tool.cancel()
+    tool._job.join_job_thread()
+    return time.monotonic() - start
+
+
+def wait_until(condition: Any) -> None:
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_cancel_during_upload() -> None:
+    galaxy = SlowGalaxy()
+    params = Parameters()
+    params.add_input("small", dataset_of_size(CHUNK_SIZE))
+    # Sending this dataset would take several seconds.
+    params.add_input("large", dataset_of_size(1000 * CHUNK_SIZE))
+    tool = Tool("tool")
+    tool.run(make_store(galaxy), params, wait=False)
+    wait_until(lambda: galaxy.requests)
+    wait_until(lambda: galaxy.uploading)
+
+    latency = cancel_latency(tool)
+    print(f"cancel latency during upload: {latency * 1000:.1f} ms")
+    assert latency < LATENCY_BUDGET
+    assert tool.get_status() == WorkState.CANCELED
+    # The dataset that was already uploaded is purged, and the job is never submitted.
+    assert get_cleanup_worker().drain(timeout=5)
+    assert galaxy.requests == ["upload", ("purge", ["dataset_1"])]
+
+
+def test_cancel_while_waiting_for_job() -> None:
+    galaxy = SlowGalaxy()
+    tool = Tool("tool")
+    tool.run(make_store(galaxy), Parameters(), wait=False)
+    wait_until(lambda: tool.get_uid())
+    time.sleep(0.05)
+
+    latency = cancel_latency(tool)
+    print(f"cancel latency while waiting: {latency * 1000:.1f} ms")
+    assert latency < LATENCY_BUDGET
+    assert tool.get_status() == WorkState.CANCELED
+    assert galaxy.requests == ["run_tool", ("cancel", "job_1")]
+
+
+def test_cancel_download(tmp_path: Any, monkeypatch: pytest.MonkeyPatch) -> None:
+    token = CancellationToken()
+
+    class Response:
+        headers: Dict[str, str] = {}
+        raw = SimpleNamespace(tell=lambda: 0)
+
+        def iter_content(self, chunk_size: int) -> Any:
+            yield b"first chunk"
+            token.cancel()
+            yield b"second chunk"
+
+        def close(self) -> None:
+            pass
+
+    dataset = Dataset(name="output")
+    dataset.id = "dataset_1"
+    dataset.store = make_store(SlowGalaxy())
+    monkeypatch.setattr(dataset, "_open_download", lambda token: Response())
+    path = tmp_path / "output.txt"
+    with pytest.raises(OperationCancelledError):
+        dataset.download(str(path), token=token)
+    assert not path.exists()
+
+
+def test_wait_for_state_is_interrupted() -> None:
+    token = CancellationToken()
+    Thread(target=lambda: (time.sleep(0.05), token.cancel())).start()
+    start = time.monotonic()
+    with pytest.raises(OperationCancelledError):
+        wait_for_state(lambda: {"state": "queued"}, ["ok", "error"], "Job 1", token, interval=60)
+    assert time.monotonic() - start < LATENCY_BUDGET
+    with pytest.raises(Exception, match="Job 1 is in terminal state error"):
+        wait_for_state(lambda: {"state": "error"}, ["ok", "error"], "Job 1")
+
+
+class FakeTusUploader:
+    """Resumable uploader that records the chunks it sends."""
+
+    def __init__(self, size: int, token: CancellationToken, cancel_after: int) -> None:
+        self.offset = 0
+        self.chunk_size = 10
+        self.session_id = "session_1"
+        self.size = size
+        self.token = token
+        self.cancel_after = cancel_after
+        self.chunks = 0
+
+    def get_file_size(self) -> int:
+        return self.size
+
+    def upload(self, stop_at: int) -> None:
+        self.offset = stop_at
+        self.chunks += 1
+        if self.chunks == self.cancel_after:
+            self.token.cancel()
+
+
+@pytest.mark.parametrize("cancel_after", [2, 0])
+def test_resumable_upload_checks_token_between_chunks(tmp_path: Any, cancel_after: int) -> None:
+    path = tmp_path / "input.txt"
+    path.write_bytes(b"x" * 45)
+    token = CancellationToken()
+    uploader = FakeTusUploader(45, token, cancel_after)
+    fetched: List[Any] = []
+    galaxy = SimpleNamespace(
+        config=SimpleNamespace(get_version=lambda: {"version_major": "24.1"}),
+        get_tus_uploader=lambda path: uploader,
+        tools=SimpleNamespace(post_to_fetch=lambda *args, **kwargs: fetched.append((args, kwargs)) or {"outputs": []}),
+    )
+    if cancel_after:
+        with pytest.raises(OperationCancelledError):
+            upload_file(galaxy, "history_1", str(path), "input.txt", token)
+        assert uploader.chunks == cancel_after
+        assert not fetched
+    else:
+        upload_file(galaxy, "history_1", str(path), "input.txt", token)
+        assert uploader.chunks == 5
+        options = {"file_name": "input.txt", "to_posix_lines": True, "auto_decompress": False}
+        assert fetched == [((str(path), "history_1", "session_1"), options)]
@@ -0,0 +1,92 @@
+"""Tests for the background cleanup worker."""
+
+from concurrent.futures import Future
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import pytest
+
+from nova.galaxy.cleanup import CleanupWorker, gather, wait
+
+
+class FakeGalaxy:
+    """Records purge requests and fails the first requests if asked to."""
+
+    def __init__(self, failures: int = 0, bulk_status: int = 200) -> None:
+        self.url = "http://galaxy.invalid/api"
+        self.failures = failures
+        self.bulk_status = bulk_status
+        self.requests: List[Any] = []
+        self.histories = SimpleNamespace(delete_dataset=self.delete_dataset, delete_history=self.delete_history)
+        self.jobs = SimpleNamespace(get_jobs=lambda history_id: [{"id": "job_1"}], cancel_job=self.cancel_job)
+
+    def _fail(self, status_code: int = 500) -> None:
+        error = Exception("request failed")
+        error.status_code = status_code  # type: ignore
+        raise error
+
+    def make_put_request(self, url: str, payload: Dict[str, Any]) -> None:
+        self.requests.append(("bulk", url, [item["id"] for item in payload["items"]]))
+        if self.failures:
+            self.failures -= 1
+            self._fail()
+        if self.bulk_status != 200:
+            self._fail(self.bulk_status)
+
+    def delete_dataset(self, history_id: str, dataset_id: str, purge: bool) -> None:
+        self.requests.append(("delete_dataset", dataset_id))
+
+    def delete_history(self, history_id: str, purge: bool) -> None:
+        self.requests.append(("delete_history", history_id))
+
+    def cancel_job(self, job_id: str) -> None:
+        self.requests.append(("cancel_job", job_id))
+
+
+def test_dataset_purges_are_batched() -> None:
+    galaxy = FakeGalaxy()
+    worker = CleanupWorker()
+    # Hold the worker so that all purges are queued before the first one is processed.
+    with worker._condition:
+        futures = [worker.purge_datasets(galaxy, "history_1", [f"dataset_{i}"]) for i in range(3)]
+    gather(futures).result(timeout=5)
+    assert galaxy.requests == [
+        ("bulk", "http://galaxy.invalid/api/histories/history_1/contents/bulk", ["dataset_0", "dataset_1", "dataset_2"])
+    ]
+
+
+def test_failed_purges_are_retried() -> None:
+    galaxy = FakeGalaxy(failures=2)
+    worker = CleanupWorker(max_attempts=3, retry_delay=0.01)
+    worker.purge_datasets(galaxy, "history_1", ["dataset_1"]).result(timeout=5)
+    assert len(galaxy.requests) == 3
+
+    galaxy = FakeGalaxy(failures=3)
+    with pytest.raises(Exception, match="request failed"):
+        worker.purge_datasets(galaxy, "history_1", ["dataset_1"]).result(timeout=5)
+    assert worker.drain(timeout=5)
+
+
+def test_fallback_without_bulk_operations() -> None:
+    galaxy = FakeGalaxy(bulk_status=405)
+    worker = CleanupWorker()
+    worker.purge_datasets(galaxy, "history_1", ["dataset_1", "dataset_2"]).result(timeout=5)
+    assert galaxy.requests[1:] == [("delete_dataset", "dataset_1"), ("delete_dataset", "dataset_2")]
+
+
+def test_purge_history_stops_jobs() -> None:
+    galaxy = FakeGalaxy()
+    worker = CleanupWorker()
+    worker.purge_history(galaxy, "history_1", stop_jobs=True).result(timeout=5)
+    assert galaxy.requests == [("cancel_job", "job_1"), ("delete_history", "history_1")]
+
+
+def test_wait_is_bounded() -> None:
+    pending: "Future[None]" = Future()
+    assert wait(pending, timeout=0.01) is pending
+    assert not pending.done()
+
+    failed: "Future[None]" = Future()
+    failed.set_exception(Exception("purge failed"))
+    with pytest.raises(Exception, match="purge failed"):
+        wait(failed)
@@ -0,0 +1,92 @@
+"""Tests for connection groups."""
+
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from nova.galaxy import Dataset, Parameters
+from nova.galaxy.connection import ConnectionHelper
+from nova.galaxy.connection_group import QUEUE_DEPTH_LIMIT, ConnectionGroupHelper, PlacementStrategy
+from nova.galaxy.tool import resolve_data_store
+
+
+class ToolNotFoundError(Exception):
+    """Error of a Galaxy instance that does not provide a tool."""
+
+    status_code = 404
+
+
+def _connection(name: str, active_jobs: int = 0, tools: Optional[List[str]] = None) -> ConnectionHelper:
+    def show_tool(tool_id: str) -> Dict[str, Any]:
+        if tools is not None and tool_id not in tools:
+            raise ToolNotFoundError()
+        return {"id": tool_id}
+
+    galaxy_instance = SimpleNamespace(
+        histories=SimpleNamespace(
+            get_histories=lambda name=None: [], create_history=lambda name: {"id": f"{name}_history"}
+        ),
+        jobs=SimpleNamespace(get_jobs=lambda state, limit: [{}] * min(active_jobs, limit)),
+        tools=SimpleNamespace(show_tool=show_tool),
+    )
+    return ConnectionHelper(galaxy_instance, name)  # type: ignore
+
+
+def _group(connections: List[ConnectionHelper], weights: List[float], strategy: PlacementStrategy) -> Any:
+    return ConnectionGroupHelper(connections, weights, strategy, queue_depth_ttl=60.0)
+
+
+def test_weighted_placement() -> None:
+    connections = [_connection("a"), _connection("b")]
+    group = _group(connections, [3.0, 1.0], PlacementStrategy.WEIGHTED)
+    placed = [group.place("tool").galaxy_url for _ in range(8)]
+    assert placed.count("a") == 6
+    assert placed.count("b") == 2
+
+
+def test_queue_depth_placement() -> None:
+    connections = [_connection("busy", active_jobs=10), _connection("idle", active_jobs=2)]
+    group = _group(connections, [1.0, 1.0], PlacementStrategy.QUEUE_DEPTH)
+    placed = [group.place("tool").galaxy_url for _ in range(12)]
+    # Runs go to the idle instance until both have the same number of active jobs.
+    assert placed[:8] == ["idle"] * 8
+    assert placed[8:].count("busy") == 2
+
+
+def test_queue_depth_is_fetched_outside_the_lock() -> None:
+    connections = [_connection("a"), _connection("b", active_jobs=1)]
+    group = _group(connections, [1.0, 1.0], PlacementStrategy.QUEUE_DEPTH)
+    fetched = []
+
+    def get_jobs(state: List[str], limit: int) -> List[Dict[str, Any]]:
+        # Another placement has to be able to take the lock while Galaxy is asked.
+        assert group._lock.acquire(blocking=False)
+        group._lock.release()
+        fetched.append(limit)
+        return []
+
+    for connection in connections:
+        connection.galaxy_instance.jobs.get_jobs = get_jobs
+    group.place("tool")
+    group.place("tool")
+    # Queue depths are fetched once per instance within the TTL, with an explicit limit.
+    assert fetched == [QUEUE_DEPTH_LIMIT, QUEUE_DEPTH_LIMIT]
+
+
+def test_tool_availability_and_input_affinity() -> None:
+    connections = [_connection("a", tools=["other_tool"]), _connection("b")]
+    group = _group(connections, [1.0, 1.0], PlacementStrategy.WEIGHTED)
+    assert {group.place("tool").galaxy_url for _ in range(4)} == {"b"}
+    with pytest.raises(Exception, match="not available"):
+        _group([connections[0]], [1.0], PlacementStrategy.WEIGHTED).place("tool")
+
+    stores = group.get_data_store("store")
+    dataset = Dataset(name="input")
+    dataset.id = "dataset_1"
+    dataset.store = connections[0].get_data_store("store")
+    params = Parameters()
+    params.add_input("input", dataset)
+    assert stores.select("other_tool", params) is dataset.store
+    assert resolve_data_store(stores, "other_tool", params) is dataset.store
+    assert stores.datastores == [dataset.store]
@@ -0,0 +1,46 @@
+"""Tests for the dataset content cache."""
+
+from pathlib import Path
+
+from nova.galaxy.content_cache import ContentCache
+
+
+def test_cache_hits_and_misses() -> None:
+    cache = ContentCache(max_bytes=100)
+    assert cache.get("a") is None
+    cache.put("a", b"content")
+    assert cache.get("a") == b"content"
+    assert cache.hits == 1
+    assert cache.misses == 1
+    assert cache.size == len(b"content")
+
+
+def test_cache_lru_eviction() -> None:
+    cache = ContentCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"5678")
+    # Access "a" so "b" becomes the least recently used entry
+    assert cache.get("a") == b"1234"
+    cache.put("c", b"9012")
+    assert "b" not in cache
+    assert "a" in cache
+    assert "c" in cache
+    assert cache.evictions == 1
+    assert cache.size <= 10
+
+
+def test_cache_spill(tmp_path: Path) -> None:
+    cache = ContentCache(max_bytes=10, spill_dir=str(tmp_path))
+    cache.put("a", b"1234")
+    cache.put("b", b"5678")
+    cache.put("c", b"9012")
+    assert len(cache) == 2
+    # The evicted entry is loaded back from the spill directory
+    assert "a" in cache
+    assert cache.get("a") == b"1234"
+    # Entries larger than the budget are only kept on disk
+    cache.put("big", b"x" * 20)
+    assert cache.get("big") == b"x" * 20
+    cache.clear()
+    assert cache.get("a") is None
+    assert list(tmp_path.iterdir()) == []
@@ -1,11 +1,13 @@
 """Tests for data stores."""
 
-from typing import Optional
+from threading import Lock, Thread
+from types import SimpleNamespace
+from typing import Dict, List, Optional
 
 from bioblend.galaxy import GalaxyInstance
 
 from nova.common.job import WorkState
-from nova.galaxy.connection import Connection
+from nova.galaxy.connection import Connection, ConnectionHelper
 from nova.galaxy.tool import Tool
 
 TEST_INT_TOOL_ID = "interactive_tool_generic_output"
@@ -15,6 +17,8 @@ def test_no_persist_store(nova_instance: Connection, galaxy_instance: GalaxyInst
     with nova_instance.connect() as connection:
         store = connection.create_data_store(name="nova_galaxy_testing")
         store.mark_for_cleanup()
+        # The history is created on first use.
+        assert store.history_id
         history = galaxy_instance.histories.get_histories(name=store.name)
         assert len(history) > 0
     history = galaxy_instance.histories.get_histories(name=store.history_id, deleted=False)
@@ -25,6 +29,8 @@ def test_persist_store(nova_instance: Connection, galaxy_instance: GalaxyInstanc
     with nova_instance.connect() as connection:
         store = connection.get_data_store(name="nova_galaxy_testing")
         store.persist()
+        # The history is created on first use.
+        assert store.history_id
         history = galaxy_instance.histories.get_histories(name=store.name)
         assert len(history) > 0
     history = galaxy_instance.histories.get_histories(name=store.name, deleted=False)
@@ -36,6 +42,8 @@ def test_persist_store(nova_instance: Connection, galaxy_instance: GalaxyInstanc
 def test_manual_cleanup_store(nova_instance: Connection, galaxy_instance: GalaxyInstance) -> None:
     with nova_instance.connect() as connection:
         store = connection.get_data_store(name="nova_galaxy_testing")
+        # The history is created on first use.
+        assert store.history_id
         history = galaxy_instance.histories.get_histories(name=store.name)
         assert len(history) > 0
         store.cleanup()
@@ -47,6 +55,8 @@ def test_manual_connection_close(nova_instance: Connection, galaxy_instance: Gal
     connection = nova_instance.connect()
     store = connection.get_data_store(name="nova_galaxy_testing")
     store.mark_for_cleanup()
+    # The history is created on first use.
+    assert store.history_id
     history = galaxy_instance.histories.get_histories(name=store.name)
     assert len(history) > 0
     assert connection.datastores is not None
@@ -73,3 +83,104 @@ def test_recover_tools(nova_instance: Connection) -> None:
         assert tools[0].get_url() is not None
         assert tools[0].get_status() == WorkState.RUNNING
         assert first_id == tools[0].get_uid()
+
+
+class FakeHistories:
+    """Counts history requests of a Galaxy history client."""
+
+    def __init__(self) -> None:
+        self.histories = [{"name": "existing", "id": "history_1"}, {"name": "other", "id": "history_2"}]
+        self.requests = 0
+        self.lock = Lock()
+
+    def get_histories(self, name: Optional[str] = None) -> List[Dict[str, str]]:
+        self.requests += 1
+        return [history for history in self.histories if name is None or history["name"] == name]
+
+    def create_history(self, name: str) -> Dict[str, str]:
+        with self.lock:
+            self.requests += 1
+            history = {"name": name, "id": f"history_{len(self.histories) + 1}"}
+            self.histories.append(history)
+            return history
+
+    def delete_history(self, history_id: str, purge: bool) -> None:
+        self.requests += 1
+        self.histories = [history for history in self.histories if history["id"] != history_id]
+
+
+def test_data_store_registry() -> None:
+    histories = FakeHistories()
+    jobs = SimpleNamespace(get_jobs=lambda history_id: [])
+    connection = ConnectionHelper(SimpleNamespace(histories=histories, jobs=jobs), "galaxy")  # type: ignore
+    store = connection.get_data_store("existing")
+    assert store.history_id == "history_1"
+    assert connection.get_data_store("existing") is store
+    assert connection.get_data_store("other").history_id == "history_2"
+    assert histories.requests == 1
+
+    created = connection.get_data_store("new")
+    assert connection.get_data_store("new") is created
+    assert len(connection.datastores) == 3
+    requests = histories.requests
+
+    store.mark_for_cleanup()
+    created.mark_for_cleanup()
+    connection.close()
+    assert histories.requests == requests + 2
+    assert [s.name for s in connection.datastores] == ["other"]
+
+
+def test_lazy_data_stores() -> None:
+    histories = FakeHistories()
+    jobs = SimpleNamespace(get_jobs=lambda history_id: [])
+    connection = ConnectionHelper(SimpleNamespace(histories=histories, jobs=jobs), "galaxy")  # type: ignore
+    unused = connection.get_data_store("unused")
+    used = connection.get_data_store("used")
+    assert histories.requests == 0
+    assert not used.has_history
+    assert used.history_id == "history_3"
+    assert histories.requests == 2
+    assert connection.get_data_store("used") is used
+
+    unused.mark_for_cleanup()
+    connection.close()
+    assert [history["name"] for history in histories.histories] == ["existing", "other", "used"]
+
+
+def test_provision_data_stores() -> None:
+    histories = FakeHistories()
+    connection = ConnectionHelper(SimpleNamespace(histories=histories), "galaxy")  # type: ignore
+    stores = connection.get_data_stores(["existing", "first", "second"], provision=True)
+    assert all(store.has_history for store in stores)
+    assert stores[0].history_id == "history_1"
+    # One request to list the histories and one per missing history.
+    assert histories.requests == 3
+    assert sorted(store.history_id for store in stores[1:]) == ["history_3", "history_4"]
+
+
+def test_histories_are_listed_outside_the_registry_lock() -> None:
+    histories = FakeHistories()
+    connection = ConnectionHelper(SimpleNamespace(histories=histories), "galaxy")  # type: ignore
+    list_histories = histories.get_histories
+    locked = []
+
+    def get_histories(name: Optional[str] = None) -> List[Dict[str, str]]:
+        # Other threads have to be able to use the registry while Galaxy is asked.
+        def try_lock() -> None:
+            acquired = connection._registry_lock.acquire(blocking=False)
+            locked.append(not acquired)
+            if acquired:
+                connection._registry_lock.release()
+
+        thread = Thread(target=try_lock)
+        thread.start()
+        thread.join()
+        return list_histories(name)
+
+    histories.get_histories = get_histories  # type: ignore
+    assert connection.get_data_store("existing", create=False).history_id == "history_1"
+    histories.histories.append({"name": "elsewhere", "id": "history_5"})
+    assert connection.get_data_store("elsewhere").history_id == "history_5"
+    connection.get_data_stores(["new"], provision=True)
+    assert locked == [False, False, False]
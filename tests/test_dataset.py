@@ -1,7 +1,16 @@
 """Tests for datasets."""
 
+from types import SimpleNamespace
+from typing import Any, Iterator, List
+
+import pytest
+
+from nova.galaxy import dataset as dataset_module
 from nova.galaxy.connection import Connection
+from nova.galaxy.content_cache import get_block_cache
 from nova.galaxy.dataset import Dataset
+from nova.galaxy.local_cache import configure_local_cache
+from nova.galaxy.transfer import RANGE_BLOCK_SIZE, TransferSettings
 
 
 def test_dataset_upload(nova_instance: Connection) -> None:
@@ -24,6 +33,219 @@ def test_dataset_set_content_upload(nova_instance: Connection) -> None:
         assert input.get_content() is not None
 
 
+def test_dataset_binary_content_upload(nova_instance: Connection) -> None:
+    with nova_instance.connect() as connection:
+        store = connection.get_data_store(name="nova_galaxy_testing")
+        store.mark_for_cleanup()
+        content = bytes(range(256)) * 16
+        input = Dataset(name="binary_content")
+        input.set_content(content=memoryview(content))
+        input.upload(store)
+        uploaded = Dataset(name="binary_content")
+        uploaded.id = input.id
+        uploaded.store = store
+        assert uploaded.get_content() == content
+
+
+def test_dataset_compressed_upload(nova_instance: Connection) -> None:
+    # Checks that Galaxy decompresses uploads that were compressed on the client.
+    nova_instance.compress_transfers = True
+    nova_instance.compression_threshold = 0
+    with nova_instance.connect() as connection:
+        store = connection.get_data_store(name="nova_galaxy_testing")
+        store.mark_for_cleanup()
+        content = b"x,y,e\n" + b"1.0,2.0,0.1\n" * 10000
+        input = Dataset(name="compressed_content")
+        input.set_content(content=content)
+        input.upload(store)
+        assert connection.transfer.bytes_sent < len(content)
+        uploaded = Dataset(name="compressed_content")
+        uploaded.id = input.id
+        uploaded.store = store
+        assert uploaded.get_content() == content
+
+
 def test_dataset_collection_upload(nova_instance: Connection) -> None:
     # TODO: Dataset collection uploading needs to be implemented
     pass
+
+
+def test_dataset_read_range(nova_instance: Connection) -> None:
+    with nova_instance.connect() as connection:
+        store = connection.get_data_store(name="nova_galaxy_testing")
+        store.mark_for_cleanup()
+        lines = [f"line {index}" for index in range(1000)]
+        input = Dataset(name="lines")
+        input.set_content(content="\n".join(lines) + "\n", file_type=".txt")
+        input.upload(store)
+        uploaded = Dataset(name="lines")
+        uploaded.id = input.id
+        uploaded.store = store
+        assert uploaded.read_range(5, 1) == b"0"
+        assert uploaded.head(3) == lines[:3]
+        assert uploaded.tail(3) == lines[-3:]
+
+
+class FakeRangeResponse:
+    """Streaming response to a range request."""
+
+    def __init__(self, content: bytes, status_code: int) -> None:
+        self.content = content
+        self.status_code = status_code
+        self.raw = SimpleNamespace(tell=lambda: len(content))
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def iter_content(self, chunk_size: int) -> Iterator[bytes]:
+        for index in range(0, len(self.content), chunk_size):
+            yield self.content[index : index + chunk_size]
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.mark.parametrize("supports_ranges", [True, False])
+def test_read_range_block_cache(monkeypatch: pytest.MonkeyPatch, supports_ranges: bool) -> None:
+    get_block_cache().clear()
+    content = b"".join(f"line {index}\n".encode() for index in range(100000))
+    requests: List[Any] = []
+
+    def get_range(galaxy_instance: Any, url: str, start: int, end: int) -> FakeRangeResponse:
+        requests.append((start, end))
+        if supports_ranges:
+            return FakeRangeResponse(content[start : end + 1], 206)
+        return FakeRangeResponse(content, 200)
+
+    monkeypatch.setattr(dataset_module, "get_range", get_range)
+    data = Dataset(name="lines")
+    data.id = f"ranged_{supports_ranges}"
+    data.store = SimpleNamespace(  # type: ignore
+        nova_connection=SimpleNamespace(galaxy_instance=None, galaxy_url="", transfer=TransferSettings())
+    )
+    data._dataset_info[data.id] = {"file_size": len(content)}
+
+    assert data.read_range(RANGE_BLOCK_SIZE - 2, 4) == content[RANGE_BLOCK_SIZE - 2 : RANGE_BLOCK_SIZE + 2]
+    assert len(requests) == 1
+    # Both blocks are cached now, so reading inside them again does not send another request.
+    assert data.read_range(10, 100) == content[10:110]
+    assert len(requests) == 1
+    assert data.head(2) == ["line 0", "line 1"]
+    assert data.tail(2) == ["line 99998", "line 99999"]
+    assert data.read_range(len(content) - 3, 10) == content[-3:]
+    assert data.read_range(len(content), 10) == b""
+
+
+def test_local_head_and_tail() -> None:
+    data = Dataset("tests/test_files/test_text_file.txt")
+    with open("tests/test_files/test_text_file.txt") as file:
+        lines = file.read().splitlines()
+    assert data.head(2) == lines[:2]
+    assert data.tail(1) == lines[-1:]
+    assert data.read_range(0, 4) == lines[0].encode()[:4]
+
+
+def test_as_mmap_and_as_array(monkeypatch: pytest.MonkeyPatch, tmp_path: Any) -> None:
+    numpy = pytest.importorskip("numpy")
+
+    cache = configure_local_cache(str(tmp_path))
+    values = numpy.arange(12, dtype="float32")
+    downloads: List[str] = []
+
+    def download_chunks(chunk_size: int = 0) -> Iterator[bytes]:
+        downloads.append("download")
+        yield values.tobytes()
+
+    data = Dataset(name="array")
+    data.id = "array_1"
+    data.store = SimpleNamespace(nova_connection=SimpleNamespace(galaxy_url=""))  # type: ignore
+    data._dataset_info[data.id] = {"uuid": "0a1b2c3d"}
+    monkeypatch.setattr(data, "_download_chunks", download_chunks)
+
+    array = data.as_array(dtype="float32", shape=(3, 4))
+    assert array.shape == (3, 4)
+    assert array[2, 3] == 11
+    # A copy of the dataset in another store has the same uuid and reuses the cached file.
+    copy = Dataset(name="array")
+    copy.id = "array_2"
+    copy.store = data.store
+    copy._dataset_info[copy.id] = {"uuid": "0a1b2c3d"}
+    mapped = copy.as_mmap()
+    assert mapped[:] == values.tobytes()
+    mapped.close()
+    assert downloads == ["download"]
+    assert cache.get("0a1b2c3d") is not None
+
+    in_memory = Dataset(name="in_memory")
+    in_memory.set_content(b"some bytes")
+    mapped = in_memory.as_mmap()
+    assert mapped[:] == b"some bytes"
+    mapped.close()
+
+    # Files converted to another extension are cached separately.
+    converted = Dataset(name="array")
+    converted.id = "array_3"
+    converted.store = data.store
+    converted.file_type = ".tabular"
+    converted._dataset_info[converted.id] = {"uuid": "0a1b2c3d"}
+    monkeypatch.setattr(converted, "_download_chunks", download_chunks)
+    with converted.as_mmap() as mapped:
+        assert len(mapped) == len(values.tobytes())
+    assert downloads == ["download", "download"]
+    assert cache.get("0a1b2c3d.tabular") is not None
+
+    empty = Dataset(name="empty")
+    empty.id = "empty_1"
+    empty.store = data.store
+    empty._dataset_info[empty.id] = {"uuid": "4e5f6a7b"}
+    monkeypatch.setattr(empty, "_download_chunks", lambda: iter([]))
+    with empty.as_mmap() as mapped:
+        assert len(mapped) == 0
+    assert empty.as_array(dtype="float32").shape == (0,)
+    configure_local_cache()
+
+
+class FakeFetchGalaxy:
+    """Records requests to the fetch API."""
+
+    def __init__(self) -> None:
+        self.url = "http://galaxy.invalid/api"
+        self.requests: List[Any] = []
+
+    def make_post_request(self, url: str, payload: Any) -> Any:
+        self.requests.append((url, payload))
+        elements = payload["targets"][0]["elements"]
+        return {"outputs": [{"id": f"dataset_{index}"} for index in range(len(elements))]}
+
+
+def test_import_datasets_in_one_request() -> None:
+    galaxy = FakeFetchGalaxy()
+    store = SimpleNamespace(nova_connection=SimpleNamespace(galaxy_instance=galaxy), history_id="history_1")
+    datasets = [
+        Dataset.from_server_path("/data/run_1.nxs", link=True),
+        Dataset.from_url("https://example.org/files/run_2.nxs?token=1"),
+        Dataset.from_server_path("/data/run_3.nxs", name="third", file_type="h5"),
+    ]
+    assert all(dataset.is_server_import for dataset in datasets)
+    assert dataset_module.import_datasets(store, datasets) == ["dataset_0", "dataset_1", "dataset_2"]  # type: ignore
+    assert [dataset.store for dataset in datasets] == [store] * 3
+    assert len(galaxy.requests) == 1
+    url, payload = galaxy.requests[0]
+    assert url == "http://galaxy.invalid/api/tools/fetch"
+    assert payload["history_id"] == "history_1"
+    assert payload["targets"][0]["elements"] == [
+        {"src": "path", "path": "/data/run_1.nxs", "ext": "auto", "link_data_only": True, "name": "run_1.nxs"},
+        {"src": "url", "url": "https://example.org/files/run_2.nxs?token=1", "ext": "auto", "name": "run_2.nxs"},
+        {"src": "path", "path": "/data/run_3.nxs", "ext": "h5", "name": "third"},
+    ]
+
+
+def test_start_upload_imports_on_server() -> None:
+    galaxy = FakeFetchGalaxy()
+    store = SimpleNamespace(nova_connection=SimpleNamespace(galaxy_instance=galaxy), history_id="history_1")
+    dataset = Dataset.from_url("https://example.org/files/run.nxs")
+    assert dataset.start_upload(store, name="renamed") == "dataset_0"  # type: ignore
+    assert galaxy.requests[0][1]["targets"][0]["elements"][0]["name"] == "renamed"
+    # Content set on the client takes precedence over the server-side source.
+    dataset.set_content("local content")
+    assert not dataset.is_server_import
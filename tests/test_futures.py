@@ -0,0 +1,139 @@
+"""Tests for futures of tool runs."""
+
+import asyncio
+import time
+from threading import Lock
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import pytest
+from nova.common.job import WorkState
+
+from nova.galaxy import futures
+from nova.galaxy.data_store import Datastore
+from nova.galaxy.futures import as_completed, wait_all
+from nova.galaxy.tool import Tool
+
+
+class FakeJobs:
+    """Galaxy jobs whose states are set by the test."""
+
+    def __init__(self) -> None:
+        self.states: Dict[str, str] = {}
+        self.requests: List[str] = []
+        self.lock = Lock()
+
+    def run_tool(self, history_id: str, tool_id: str, tool_inputs: Any) -> Dict[str, Any]:
+        with self.lock:
+            job_id = f"job_{len(self.states)}"
+            self.states[job_id] = "queued"
+        return {
+            "jobs": [{"id": job_id}],
+            "outputs": [{"output_name": "output", "id": f"{job_id}_output"}],
+            "output_collections": [],
+        }
+
+    def get_jobs(self, history_id: str) -> List[Dict[str, Any]]:
+        self.requests.append("get_jobs")
+        with self.lock:
+            return [{"id": job_id, "state": state} for job_id, state in self.states.items()]
+
+    def cancel_job(self, job_id: str) -> bool:
+        self.states[job_id] = "deleting"
+        return True
+
+
+@pytest.fixture
+def fake_jobs(monkeypatch: pytest.MonkeyPatch) -> FakeJobs:
+    monkeypatch.setattr(futures._watcher, "poll_interval", 0.01)
+    return FakeJobs()
+
+
+def make_store(jobs: FakeJobs) -> Datastore:
+    galaxy_instance = SimpleNamespace(jobs=jobs, tools=SimpleNamespace(run_tool=jobs.run_tool))
+    connection = SimpleNamespace(galaxy_instance=galaxy_instance, tool_schemas=None)
+    return Datastore("store", connection, "history_1")  # type: ignore
+
+
+def wait_for_state(tool: Tool, jobs: FakeJobs, state: str) -> None:
+    while True:
+        job_id = tool.get_uid()
+        if job_id and job_id in jobs.states:
+            jobs.states[job_id] = state
+            return
+        time.sleep(0.001)
+
+
+def test_submit_and_wait_all(fake_jobs: FakeJobs) -> None:
+    store = make_store(fake_jobs)
+    tools = [Tool("tool") for _ in range(5)]
+    for tool in tools:
+        tool.submit(store)
+    for tool in tools:
+        wait_for_state(tool, fake_jobs, "ok")
+    outputs = wait_all(tools, timeout=5)
+    assert [output.get_dataset("output").id for output in outputs] == [  # type: ignore
+        f"{tool.get_uid()}_output" for tool in tools
+    ]
+    assert all(tool.get_status() == WorkState.FINISHED for tool in tools)
+
+
+def test_as_completed_and_errors(fake_jobs: FakeJobs) -> None:
+    store = make_store(fake_jobs)
+    failing = Tool("failing")
+    succeeding = Tool("succeeding")
+    failing.submit(store)
+    succeeding.submit(store)
+    wait_for_state(failing, fake_jobs, "error")
+    completed = next(as_completed([failing, succeeding], timeout=5))
+    assert completed.tool is failing
+    with pytest.raises(Exception, match="terminal state error"):
+        completed.result()
+    assert failing.get_status() == WorkState.ERROR
+    wait_for_state(succeeding, fake_jobs, "ok")
+    assert [future.tool for future in as_completed([succeeding], timeout=5)] == [succeeding]
+
+
+def test_running_is_published_once(fake_jobs: FakeJobs) -> None:
+    store = make_store(fake_jobs)
+    tool = Tool("tool")
+    tool.submit(store)
+    wait_for_state(tool, fake_jobs, "running")
+    while tool.get_status() != WorkState.RUNNING:
+        time.sleep(0.001)
+    assert tool._job is not None
+    version = tool._job.status.version
+    requests = len(fake_jobs.requests)
+    while len(fake_jobs.requests) < requests + 5:
+        time.sleep(0.001)
+    assert tool._job.status.version == version
+    assert [transition.state for transition in tool._job.timeline.transitions].count(WorkState.RUNNING) == 1
+    tool.cancel()
+
+
+def test_await_and_cancel(fake_jobs: FakeJobs) -> None:
+    store = make_store(fake_jobs)
+    tool = Tool("tool")
+    future = tool.submit(store)
+    wait_for_state(tool, fake_jobs, "running")
+
+    async def cancel_and_await() -> None:
+        assert future.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await future
+
+    asyncio.run(cancel_and_await())
+    assert fake_jobs.states[tool.get_uid()] == "deleting"  # type: ignore
+
+
+def test_await_outputs(fake_jobs: FakeJobs) -> None:
+    store = make_store(fake_jobs)
+    tool = Tool("tool")
+    future = tool.submit(store)
+    wait_for_state(tool, fake_jobs, "ok")
+    outputs = asyncio.run(asyncio.wait_for(_await(future), timeout=5))
+    assert outputs.get_dataset("output").id == f"{tool.get_uid()}_output"
+
+
+async def _await(future: Any) -> Any:
+    return await future
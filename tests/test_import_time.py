@@ -0,0 +1,47 @@
+"""Import time benchmark for the nova.galaxy package."""
+
+import json
+import os
+import subprocess
+import sys
+
+# Budget (in seconds) for importing the package and the lightweight public names. Can be raised on slow machines.
+IMPORT_TIME_BUDGET = float(os.environ.get("NOVA_GALAXY_IMPORT_TIME_BUDGET", "0.25"))
+HEAVY_MODULES = ["bioblend", "blinker", "deprecated", "nova.common.signals", "nova.galaxy.tool_runner"]
+
+BENCHMARK_SCRIPT = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+import nova.galaxy
+from nova.galaxy import Dataset, Parameters
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def _run_benchmark() -> dict:
+    result = subprocess.run([sys.executable, "-c", BENCHMARK_SCRIPT], capture_output=True, check=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_does_not_load_heavy_modules() -> None:
+    modules = _run_benchmark()["modules"]
+    for module in HEAVY_MODULES:
+        assert module not in modules
+
+
+def test_import_time_budget() -> None:
+    # Take the best of several runs to keep the benchmark stable on noisy machines.
+    elapsed = min(_run_benchmark()["elapsed"] for _ in range(5))
+    assert elapsed < IMPORT_TIME_BUDGET, f"import took {elapsed:.3f}s, budget is {IMPORT_TIME_BUDGET:.3f}s"
+
+
+def test_lazy_attributes() -> None:
+    import nova.galaxy
+
+    assert nova.galaxy.Parameters.__name__ == "Parameters"
+    assert isinstance(nova.galaxy.__version__, str)
+    assert "ToolRunner" in dir(nova.galaxy)
@@ -0,0 +1,43 @@
+"""Tests for job status snapshots."""
+
+import pickle
+from copy import copy
+
+import pytest
+from nova.common.job import WorkState
+
+from nova.galaxy.job import JobStatus
+
+
+def test_job_status_is_immutable() -> None:
+    status = JobStatus()
+    with pytest.raises(AttributeError):
+        status.state = WorkState.RUNNING  # type: ignore
+    with pytest.raises(AttributeError):
+        status.extra = 1  # type: ignore
+
+
+def test_job_status_evolve() -> None:
+    status = JobStatus()
+    assert status.state == WorkState.NOT_STARTED
+    assert status.version == 0
+    running = status.evolve(state=WorkState.RUNNING)
+    assert running.state == WorkState.RUNNING
+    assert running.version == 1
+    assert running.timestamp >= status.timestamp
+    error = running.evolve(details="failed")
+    assert error.state == WorkState.RUNNING
+    assert error.details == "failed"
+    assert error.version == 2
+    # The original snapshots are unchanged
+    assert status.state == WorkState.NOT_STARTED
+    assert running.details == ""
+
+
+def test_job_status_copy_and_pickle() -> None:
+    status = JobStatus().evolve(state=WorkState.QUEUED, details="waiting")
+    for other in [copy(status), pickle.loads(pickle.dumps(status))]:
+        assert other.state == status.state
+        assert other.details == status.details
+        assert other.version == status.version
+        assert other.timestamp == status.timestamp
@@ -0,0 +1,32 @@
+"""Tests for the local file cache."""
+
+import os
+import time
+from pathlib import Path
+
+from nova.galaxy.local_cache import LocalFileCache
+
+
+def test_least_recently_used_files_are_evicted(tmp_path: Path) -> None:
+    cache = LocalFileCache(str(tmp_path), max_size=25)
+    first = cache.put("first", [b"x" * 10])
+    second = cache.put("second", [b"x" * 10])
+    # Make the modification times distinct, and use the first file again so that the second one is evicted.
+    os.utime(first, (time.time() - 20, time.time() - 20))
+    os.utime(second, (time.time() - 10, time.time() - 10))
+    assert cache.get("first") == first
+
+    third = cache.put("third", [b"x" * 10])
+    assert cache.get("second") is None
+    assert cache.get("first") == first
+    assert cache.get("third") == third
+
+
+def test_new_file_is_kept_above_limit(tmp_path: Path) -> None:
+    cache = LocalFileCache(str(tmp_path), max_size=5)
+    path = cache.put("large", [b"x" * 10])
+    assert cache.get("large") == path
+
+    unlimited = LocalFileCache(str(tmp_path), max_size=None)
+    unlimited.put("other", [b"x" * 10])
+    assert cache.get("large") == path
@@ -0,0 +1,108 @@
+"""Event loop lag benchmark for tool runners."""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+from nova.common.job import WorkState
+
+from nova.galaxy import BasicTool, Parameters, Tool, ToolRunner
+from nova.galaxy.job import JobStatus
+from nova.galaxy.loop_monitor import LoopLagMonitor, get_loop_lag_monitor
+
+# Simulated duration of a single blocking Galaxy request.
+REQUEST_TIME = 0.005
+# Allowed increase (in seconds) of the mean loop lag between 1 and 500 runners.
+LAG_BUDGET = float(os.environ.get("NOVA_GALAXY_LOOP_LAG_BUDGET", "0.02"))
+
+
+class BlockingTool(Tool):
+    """Tool that simulates blocking Galaxy requests without a Galaxy server."""
+
+    def __init__(self) -> None:
+        super().__init__("blocking_tool")
+        self.status = JobStatus(WorkState.RUNNING, version=1)
+
+    def get_full_status(self) -> JobStatus:
+        time.sleep(REQUEST_TIME)
+        return self.status
+
+    def get_stdout(self, position: Optional[int] = None, length: Optional[int] = None) -> Optional[str]:
+        time.sleep(REQUEST_TIME)
+        return ""
+
+    def get_stderr(self, position: Optional[int] = None, length: Optional[int] = None) -> Optional[str]:
+        time.sleep(REQUEST_TIME)
+        return ""
+
+
+class NoopTool(BasicTool):
+    """Tool that is never run."""
+
+    def prepare_tool(self) -> Tuple[Tool, Parameters]:
+        return BlockingTool(), Parameters()
+
+    def get_results(self, tool: Tool) -> bytes:
+        return b""
+
+
+class InvalidTool(NoopTool):
+    """Tool whose inputs never validate, so that its run stops right away."""
+
+    def validate_for_run(self) -> None:
+        raise ValueError("invalid inputs")
+
+
+async def _measure_lag(runner_count: int, duration: float = 2.0) -> float:
+    tasks: List[asyncio.Task] = []
+    for i in range(runner_count):
+        runner = ToolRunner(f"lag_benchmark_{runner_count}_{i}", NoopTool(), lambda: "unused", "", "")
+        runner.nova_tool = BlockingTool()
+        tasks.append(asyncio.create_task(runner._monitor_run()))
+        tasks.append(asyncio.create_task(runner._output_monitor_run()))
+    monitor = LoopLagMonitor(interval=0.05)
+    monitor.start()
+    await asyncio.sleep(duration)
+    await monitor.stop()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return monitor.mean_lag
+
+
+@pytest.mark.asyncio
+async def test_loop_lag_monitor() -> None:
+    monitor = LoopLagMonitor(interval=0.01)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    time.sleep(0.1)  # block the loop
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+    assert monitor.samples > 0
+    assert monitor.max_lag >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_loop_lag_flat_with_many_runners() -> None:
+    lags: Dict[int, Any] = {}
+    for runner_count in [1, 50, 500]:
+        lags[runner_count] = await _measure_lag(runner_count)
+    assert lags[500] - lags[1] < LAG_BUDGET, f"mean loop lag by runner count: {lags}"
+
+
+@pytest.mark.asyncio
+async def test_loop_lag_monitor_stops_with_last_runner() -> None:
+    monitor = get_loop_lag_monitor()
+    assert not monitor.running
+    runners = [ToolRunner(f"lag_lifetime_{i}", InvalidTool(), lambda: "unused", "", "") for i in range(2)]
+    for runner in runners:
+        runner._start_tool()
+    assert monitor.running
+    for runner in runners:
+        assert runner.monitoring_task
+        await asyncio.wait_for(runner.monitoring_task, timeout=5)
+        assert runner.output_monitoring_task
+        await asyncio.wait_for(runner.output_monitoring_task, timeout=5)
+    assert not monitor.running
@@ -1,5 +1,11 @@
 """Tests for outputs."""
 
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import pytest
+
+from nova.galaxy import outputs as outputs_module
 from nova.galaxy.dataset import Dataset, DatasetCollection
 from nova.galaxy.outputs import Outputs
 
@@ -14,3 +20,87 @@ def test_output_collection() -> None:
     outputs = Outputs()
     outputs.add_output(DatasetCollection(path="test_files/test_text_file.txt", name="test_file"))
     assert outputs.get_collection("test_file") is not None
+
+
+class FakeHistories:
+    """Records copy requests of a Galaxy history client."""
+
+    def __init__(self) -> None:
+        self.requests: List[str] = []
+
+    def create_dataset_collection(self, history_id: str, description: Dict[str, Any], copy_elements: bool) -> Any:
+        self.requests.append("create_dataset_collection")
+        elements = description["element_identifiers"]
+        return {
+            "id": "wrapper",
+            "elements": [{"element_identifier": e["name"], "object": {"id": f"copy_{e['id']}"}} for e in elements],
+        }
+
+    def copy_content(self, history_id: str, content_id: str, source: str) -> Any:
+        self.requests.append("copy_content")
+        return {"id": f"copy_{content_id}"}
+
+    def delete_dataset_collection(self, history_id: str, collection_id: str) -> None:
+        self.requests.append("delete_dataset_collection")
+
+    def copy_dataset(self, history_id: str, dataset_id: str) -> Any:
+        self.requests.append("copy_dataset")
+        return {"id": f"copy_{dataset_id}"}
+
+
+def make_outputs(names: List[str]) -> Outputs:
+    source: Any = SimpleNamespace(history_id="source")
+    outputs = Outputs()
+    for name in names:
+        dataset = Dataset(name=name)
+        dataset.id = f"id_{name}"
+        dataset.store = source
+        outputs.add_output(dataset)
+    collection = DatasetCollection(path="", name="collection")
+    collection.id = "id_collection"
+    collection.store = source
+    outputs.add_output(collection)
+    return outputs
+
+
+def make_target(histories: FakeHistories, put_request: Any = lambda *a, **k: None) -> Any:
+    galaxy_instance = SimpleNamespace(histories=histories, url="galaxy/api", make_put_request=put_request)
+    return SimpleNamespace(history_id="target", nova_connection=SimpleNamespace(galaxy_instance=galaxy_instance))
+
+
+def test_outputs_copy_to() -> None:
+    histories = FakeHistories()
+    target = make_target(histories)
+
+    copies = make_outputs(["a", "b", "c", "d"]).copy_to(target)
+
+    assert [data.id for data in copies] == ["copy_id_a", "copy_id_b", "copy_id_c", "copy_id_d", "copy_id_collection"]
+    assert all(data.store is target for data in copies)
+    assert copies.get_dataset("b").id == "copy_id_b"
+    assert histories.requests == ["create_dataset_collection", "delete_dataset_collection", "copy_content"]
+
+
+def test_few_outputs_are_copied_one_by_one() -> None:
+    histories = FakeHistories()
+    copies = make_outputs(["a", "b"]).copy_to(make_target(histories))
+    assert [data.id for data in copies] == ["copy_id_a", "copy_id_b", "copy_id_collection"]
+    assert histories.requests == ["copy_dataset", "copy_dataset", "copy_content"]
+
+
+def test_failed_copy_removes_temporary_collection(monkeypatch: pytest.MonkeyPatch) -> None:
+    histories = FakeHistories()
+    purged: List[Any] = []
+    monkeypatch.setattr(
+        outputs_module, "get_cleanup_worker", lambda: SimpleNamespace(purge_datasets=lambda *args: purged.append(args))
+    )
+
+    def fail(*args: Any, **kwargs: Any) -> None:
+        raise Exception("request failed")
+
+    target = make_target(histories, fail)
+    with pytest.raises(Exception, match="request failed"):
+        make_outputs(["a", "b", "c", "d"]).copy_to(target)
+    assert histories.requests == ["create_dataset_collection", "delete_dataset_collection"]
+    assert purged == [
+        (target.nova_connection.galaxy_instance, "target", ["copy_id_a", "copy_id_b", "copy_id_c", "copy_id_d"])
+    ]
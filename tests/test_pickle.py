@@ -0,0 +1,116 @@
+"""Tests for pickling handles to Galaxy objects."""
+
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from nova.common.job import WorkState
+
+from nova.galaxy import connection as connection_module
+from nova.galaxy.connection import ConnectionHelper, RateLimitedGalaxyInstance, get_pooled_connection
+from nova.galaxy.dataset import Dataset
+from nova.galaxy.rate_limit import RateLimiter, get_rate_limiter
+from nova.galaxy.tool import Tool
+from nova.galaxy.tool_schema import ToolSchemaCache
+from nova.galaxy.transfer import TransferSettings
+
+GALAXY_URL = "http://galaxy.invalid"
+
+
+def make_connection() -> ConnectionHelper:
+    galaxy_instance = RateLimitedGalaxyInstance(GALAXY_URL, "secret", get_rate_limiter(GALAXY_URL))
+    return ConnectionHelper(galaxy_instance, GALAXY_URL, tool_schemas=ToolSchemaCache(galaxy_instance))
+
+
+def make_finished_tool() -> Tool:
+    store = make_connection().bind_data_store("store", "history_1")
+    tool = Tool("tool_1")
+    tool.assign_id("job_1", store)
+    assert tool._job is not None
+    tool._job.datasets = [{"output_name": "output", "id": "dataset_1", "file_ext": "txt"}]  # type: ignore
+    tool._job.update_status(WorkState.FINISHED)
+    return tool
+
+
+def output_id(tool: Tool) -> str:
+    outputs = tool.get_results()
+    assert outputs is not None
+    dataset = outputs.get_dataset("output")
+    assert dataset.store is not None
+    return f"{dataset.store.history_id}/{dataset.id}"
+
+
+def test_pickle_tool_handle() -> None:
+    tool = make_finished_tool()
+    restored = pickle.loads(pickle.dumps(tool))
+    assert restored.get_status() == WorkState.FINISHED
+    assert restored.get_uid() == "job_1"
+    assert output_id(restored) == "history_1/dataset_1"
+    # The restored objects share the pooled connection of this process.
+    connection = get_pooled_connection(GALAXY_URL, "secret")
+    assert restored._job.store is connection.bind_data_store("store", "history_1")
+    assert pickle.loads(pickle.dumps(tool))._job.store is restored._job.store
+
+
+def test_pickle_submitted_tool(monkeypatch: pytest.MonkeyPatch) -> None:
+    connection = make_connection()
+    galaxy_instance = connection.galaxy_instance
+    outputs = [{"output_name": "output", "id": "dataset_1", "file_ext": "txt"}]
+    run_tool = lambda *args, **kwargs: {"jobs": [{"id": "job_1"}], "outputs": outputs, "output_collections": []}  # noqa: E731
+    monkeypatch.setattr(galaxy_instance.tools, "run_tool", run_tool)
+    monkeypatch.setattr(galaxy_instance.jobs, "get_jobs", lambda *args, **kwargs: [{"id": "job_1", "state": "ok"}])
+    tool = Tool("tool_1")
+    tool.submit(connection.bind_data_store("store", "history_1")).result(timeout=5)
+
+    restored = pickle.loads(pickle.dumps(tool))
+    assert restored.get_future() is None
+    assert restored.get_status() == WorkState.FINISHED
+    assert output_id(restored) == "history_1/dataset_1"
+
+
+def test_pickle_dataset_handle() -> None:
+    dataset = Dataset(name="output")
+    dataset.id = "dataset_1"
+    dataset.store = make_connection().bind_data_store("store", "history_1")
+    restored = pickle.loads(pickle.dumps(dataset))
+    assert restored.id == "dataset_1"
+    assert restored.store.history_id == "history_1"
+    assert restored.store.nova_connection.galaxy_url == GALAXY_URL
+
+
+def test_pickle_keeps_settings_but_not_key() -> None:
+    limiter = RateLimiter(rate=5.0, max_concurrency=4)
+    galaxy_instance = RateLimitedGalaxyInstance(GALAXY_URL, "secret", limiter)
+    connection = ConnectionHelper(
+        galaxy_instance,
+        GALAXY_URL,
+        TransferSettings(compress=True, compression_level=9),
+        ToolSchemaCache(galaxy_instance, 5.0),
+    )
+    data = pickle.dumps(connection.bind_data_store("store", "history_1"))
+    assert b"secret" not in data
+
+    restored = pickle.loads(data).nova_connection
+    assert restored.galaxy_instance.key == "secret"
+    assert restored.transfer.compress and restored.transfer.compression_level == 9
+    assert restored.tool_schemas is not None and restored.tool_schemas.ttl == 5.0
+    assert restored.galaxy_instance.limiter.rate == 5.0 and restored.galaxy_instance.limiter.max_concurrency == 4
+    # Connections with the default settings do not share the pooled connection.
+    assert restored is not get_pooled_connection(GALAXY_URL)
+
+
+def test_unpickling_takes_key_from_environment(monkeypatch: pytest.MonkeyPatch) -> None:
+    data = pickle.dumps(make_connection())
+    monkeypatch.setattr(connection_module, "_api_keys", {})
+    monkeypatch.setattr(connection_module, "_pool", {})
+    monkeypatch.delenv("GALAXY_API_KEY", raising=False)
+    with pytest.raises(ValueError, match="No Galaxy API key"):
+        pickle.loads(data)
+    monkeypatch.setenv("GALAXY_API_KEY", "from_environment")
+    assert pickle.loads(data).galaxy_instance.key == "from_environment"
+
+
+def test_tool_handles_in_process_pool() -> None:
+    tools = [make_finished_tool() for _ in range(4)]
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        assert list(pool.map(output_id, tools)) == ["history_1/dataset_1"] * 4
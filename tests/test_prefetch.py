@@ -0,0 +1,108 @@
+"""Tests for background prefetching of outputs."""
+
+from concurrent.futures import Future
+from threading import Event
+from types import SimpleNamespace
+from typing import Any, Iterator
+
+import pytest
+
+from nova.galaxy import prefetch as prefetch_module
+from nova.galaxy.content_cache import get_content_cache
+from nova.galaxy.dataset import Dataset
+from nova.galaxy.outputs import Outputs
+from nova.galaxy.prefetch import PrefetchPolicy, prefetch_dataset
+
+
+class FakeDataset(Dataset):
+    """Dataset that serves its content from memory instead of Galaxy."""
+
+    def __init__(self, name: str, dataset_id: str, content: bytes, release: Event) -> None:
+        super().__init__(name=name)
+        self.id = dataset_id
+        self.store = SimpleNamespace(nova_connection=SimpleNamespace(galaxy_url="http://galaxy.invalid"))  # type: ignore
+        self.content = content
+        self.release = release
+        self.downloads = 0
+        self._dataset_info[dataset_id] = {"file_size": len(content)}
+
+    def _download_chunks(self, chunk_size: int = 4) -> Iterator[bytes]:
+        self.downloads += 1
+        self.release.wait(5)
+        for index in range(0, len(self.content), chunk_size):
+            yield self.content[index : index + chunk_size]
+
+
+def test_prefetch_selected_outputs() -> None:
+    get_content_cache().clear()
+    release = Event()
+    outputs = Outputs()
+    selected = FakeDataset("selected", "prefetch_1", b"selected content", release)
+    other = FakeDataset("other", "prefetch_2", b"other content", release)
+    outputs.add_output(selected)
+    outputs.add_output(other)
+
+    futures = PrefetchPolicy(outputs=["selected"]).start(outputs)
+    assert len(futures) == 1
+    release.set()
+    # get_content waits for the running prefetch instead of downloading again.
+    assert selected.get_content() == b"selected content"
+    assert futures[0].result() is True
+    assert selected.downloads == 1
+    assert other.downloads == 0
+
+
+def test_prefetch_size_limit() -> None:
+    get_content_cache().clear()
+    release = Event()
+    release.set()
+    outputs = Outputs()
+    large = FakeDataset("large", "prefetch_3", b"x" * 100, release)
+    outputs.add_output(large)
+
+    futures = PrefetchPolicy(max_size=10).start(outputs)
+    assert futures[0].result() is False
+    assert large._cache_key() not in get_content_cache()
+    assert large.downloads == 0
+
+    # Outputs without a reported size are still limited while they are downloaded.
+    unknown = FakeDataset("unknown", "prefetch_4", b"x" * 100, release)
+    unknown._dataset_info[unknown.id] = {}
+    outputs = Outputs()
+    outputs.add_output(unknown)
+    assert PrefetchPolicy(max_size=10).start(outputs)[0].result() is False
+    assert unknown.downloads == 1
+
+
+def test_cache_keys_include_server() -> None:
+    release = Event()
+    release.set()
+    first = FakeDataset("output", "same_id", b"first server", release)
+    second = FakeDataset("output", "same_id", b"second server", release)
+    second.store = SimpleNamespace(nova_connection=SimpleNamespace(galaxy_url="http://other.invalid"))  # type: ignore
+    assert first.get_content() == b"first server"
+    # The same dataset id on another server is not served from the cache of the first one.
+    assert second.get_content() == b"second server"
+    assert second.downloads == 1
+
+
+class ImmediateExecutor:
+    """Executor that runs tasks right away, so their futures are done when they are returned."""
+
+    def submit(self, fn: Any, *args: Any) -> "Future[Any]":
+        future: "Future[Any]" = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def test_prefetch_cached_output_twice(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(prefetch_module, "_executor", ImmediateExecutor())
+    get_content_cache().clear()
+    release = Event()
+    release.set()
+    cached = FakeDataset("cached", "prefetch_5", b"cached content", release)
+    get_content_cache().put(cached._cache_key(), b"cached content")
+    for _ in range(2):
+        assert prefetch_dataset(cached).result(timeout=5) is True
+        assert cached._cache_key() not in prefetch_module._in_flight
+    assert cached.downloads == 0
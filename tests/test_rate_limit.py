@@ -0,0 +1,115 @@
+"""Tests for the client-side rate limiter."""
+
+import time
+from threading import Thread
+from types import SimpleNamespace
+from typing import Any, List
+
+import pytest
+
+from nova.galaxy.rate_limit import Priority, RateLimiter, RequestShedError, request_priority
+
+
+def test_aimd_concurrency_limit() -> None:
+    limiter = RateLimiter(max_concurrency=16, min_concurrency=2)
+    start = limiter.concurrency_limit
+    limiter.acquire()
+    limiter.release(0.01, congested=False)
+    assert limiter.concurrency_limit > start
+    for _ in range(10):
+        limiter.acquire()
+        limiter.release(0.01, congested=True)
+    assert limiter.concurrency_limit == 2
+    limiter.acquire()
+    limiter.release(limiter.target_latency + 1, congested=False)
+    assert limiter.congested == 11
+
+
+def test_call_detects_congestion() -> None:
+    limiter = RateLimiter()
+    start = limiter.concurrency_limit
+    response = limiter.call(lambda: SimpleNamespace(status_code=503, headers={}))
+    assert response.status_code == 503
+    assert limiter.concurrency_limit == start / 2
+
+    def timeout() -> None:
+        raise TimeoutError()
+
+    with pytest.raises(TimeoutError):
+        limiter.call(timeout)
+    assert limiter.concurrency_limit == start / 4
+    assert limiter.in_flight == 0
+
+
+def test_priority_order() -> None:
+    limiter = RateLimiter(max_concurrency=1, min_concurrency=1)
+    limiter.concurrency_limit = 1
+    limiter.acquire()
+    order: List[str] = []
+
+    def request(name: str, priority: Priority) -> None:
+        with request_priority(priority):
+            limiter.call(order.append, name)
+
+    threads = [Thread(target=request, args=("poll", Priority.LOW))]
+    threads[0].start()
+    time.sleep(0.05)
+    threads.append(Thread(target=request, args=("submit", Priority.HIGH)))
+    threads[1].start()
+    time.sleep(0.05)
+    limiter.release(0.01, congested=False)
+    for thread in threads:
+        thread.join()
+    assert order == ["submit", "poll"]
+
+
+def test_low_priority_requests_are_shed() -> None:
+    limiter = RateLimiter(max_concurrency=1, shed_after={Priority.LOW: 0.05})
+    limiter.concurrency_limit = 1
+    limiter.acquire()
+    with pytest.raises(RequestShedError):
+        limiter.acquire(Priority.LOW)
+    assert limiter.shed == 1
+    assert limiter.queue_length == 0
+
+
+def test_token_bucket_rate() -> None:
+    limiter = RateLimiter(rate=100.0, burst=5)
+    results: List[Any] = []
+    start = time.monotonic()
+    for i in range(25):
+        results.append(limiter.call(abs, i))
+    # The first 5 requests use the burst, the other 20 are sent at 100 requests per second.
+    assert time.monotonic() - start >= 0.15
+    assert len(results) == 25
+
+
+def test_file_transfers_bypass_limiter(monkeypatch: pytest.MonkeyPatch) -> None:
+    from bioblend import galaxy
+
+    from nova.galaxy.connection import RateLimitedGalaxyInstance
+
+    monkeypatch.setattr(galaxy.GalaxyInstance, "make_post_request", lambda self, *args: "posted")
+    monkeypatch.setattr(galaxy.GalaxyInstance, "make_get_request", lambda self, url, **kwargs: "fetched")
+    limiter = RateLimiter()
+    galaxy_instance = RateLimitedGalaxyInstance("http://galaxy.invalid", "secret", limiter)
+    assert galaxy_instance.make_post_request(f"{galaxy_instance.url}/tools", {}, files_attached=True) == "posted"
+    assert galaxy_instance.make_get_request(f"{galaxy_instance.url}/datasets/1/display", stream=True) == "fetched"
+    assert limiter.sent == 0
+    galaxy_instance.make_post_request(f"{galaxy_instance.url}/tools", {})
+    assert limiter.sent == 1
+
+
+def test_shed_polls_are_retried() -> None:
+    from nova.galaxy.cancellation import wait_for_state
+
+    responses: List[Any] = [RequestShedError("shed"), {"state": "running"}, RequestShedError("shed"), {"state": "ok"}]
+
+    def fetch() -> Any:
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    assert wait_for_state(fetch, ["ok", "error"], "Job 1", interval=0.001) == {"state": "ok"}
+    assert not responses
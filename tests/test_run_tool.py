@@ -1,6 +1,7 @@
 """Tests for tools."""
 
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from bioblend.galaxy import GalaxyInstance
 from bioblend.galaxy.datasets import DatasetClient
@@ -173,3 +174,37 @@ def test_wait_for_results(nova_instance: Connection, galaxy_instance: GalaxyInst
     test_tool.wait_for_results()
     assert test_tool.get_results() is not None
     connection.close()
+
+
+def test_get_url_many_interactive_tools(nova_instance: Connection) -> None:
+    with nova_instance.connect() as connection:
+        store = connection.get_data_store(name="nova_galaxy_testing")
+        store.mark_for_cleanup()
+        tools = [Tool(TEST_INT_TOOL_ID) for _ in range(3)]
+        for tool in tools:
+            tool.run_interactive(data_store=store, params=Parameters(), wait=False)
+        with ThreadPoolExecutor(max_workers=len(tools)) as executor:
+            urls = list(executor.map(lambda tool: tool.get_url(max_tries=100), tools))
+        assert all(url is not None for url in urls)
+        assert len(set(urls)) == len(tools)
+        for tool in tools:
+            tool.cancel()
+
+
+def test_run_tool_with_uploaded_dataset(nova_instance: Connection, galaxy_instance: GalaxyInstance) -> None:
+    with nova_instance.connect() as connection:
+        store = connection.get_data_store(name="nova_galaxy_testing")
+        store.mark_for_cleanup()
+        notebook = Dataset(path="tests/test_files/test_jupyter_notebook.ipynb")
+        notebook.upload(store)
+        uploaded_id = notebook.id
+        test_tool = Tool(TEST_INT_TOOL_ID)
+        params = Parameters()
+        params.add_input("mode|mode_select", "previous")
+        params.add_input("ipynb", notebook)
+        test_tool.run_interactive(data_store=store, params=params, check_url=False)
+        # The dataset is passed by reference instead of being uploaded again.
+        assert notebook.id == uploaded_id
+        contents = galaxy_instance.histories.show_history(store.history_id, contents=True)
+        assert len([c for c in contents if c["name"] == notebook.name]) == 1
+        test_tool.cancel()
@@ -0,0 +1,84 @@
+"""Tests for job lifecycle timelines."""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+from nova.common.job import WorkState
+
+from nova.galaxy import Datastore, cancellation, data_store
+from nova.galaxy.job import Job
+from nova.galaxy.timeline import DOWNLOADING, Timeline, summarize, to_trace_events
+
+
+def _timeline(name: str, offset: float = 0.0) -> Timeline:
+    timeline = Timeline(name)
+    timeline.record(WorkState.NOT_STARTED, timestamp=offset)
+    timeline.record(WorkState.UPLOADING_DATA, timestamp=offset + 1.0)
+    timeline.record(WorkState.QUEUED, timestamp=offset + 3.0)
+    timeline.record(WorkState.QUEUED, timestamp=offset + 4.0)
+    timeline.record(WorkState.RUNNING, timestamp=offset + 6.0)
+    timeline.record(WorkState.FINISHED, timestamp=offset + 10.0)
+    timeline.record_download(offset + 11.0, offset + 11.5)
+    return timeline
+
+
+def test_timeline_durations() -> None:
+    timeline = _timeline("tool")
+    assert [t.state for t in timeline.transitions] == [
+        WorkState.NOT_STARTED,
+        WorkState.UPLOADING_DATA,
+        WorkState.QUEUED,
+        WorkState.RUNNING,
+        WorkState.FINISHED,
+    ]
+    assert timeline.durations() == {"UPLOADING_DATA": 2.0, "QUEUED": 3.0, "RUNNING": 4.0, DOWNLOADING: 0.5}
+
+
+def test_summarize_and_trace_events(tmp_path: str) -> None:
+    timelines = [_timeline("tool_a"), _timeline("tool_b", offset=100.0)]
+    stats = summarize(timelines)
+    assert stats["RUNNING"] == {"count": 2, "total": 8.0, "mean": 4.0, "max": 4.0}
+
+    path = f"{tmp_path}/trace.json"
+    trace = to_trace_events(timelines, path)
+    with open(path) as file:
+        assert json.load(file) == trace
+    complete_events = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    assert len(complete_events) == 8
+    assert {event["tid"] for event in complete_events} == {1, 2}
+    assert complete_events[0]["dur"] == 2_000_000
+
+
+def test_job_records_transitions() -> None:
+    store = Datastore("store", SimpleNamespace(galaxy_instance=None), "history_1")  # type: ignore
+    job = Job("tool", store)
+    job.update_status(WorkState.UPLOADING_DATA)
+    job.update_status(details="still uploading")
+    job.update_status(WorkState.QUEUED)
+    assert [t.state for t in job.timeline.transitions] == [
+        WorkState.NOT_STARTED,
+        WorkState.UPLOADING_DATA,
+        WorkState.QUEUED,
+    ]
+    assert list(store.timelines) == [job.timeline]
+    assert set(store.get_timeline_stats()) == {"UPLOADING_DATA", "QUEUED"}
+
+
+def test_wait_records_running(monkeypatch: pytest.MonkeyPatch) -> None:
+    states = ["queued", "running", "running", "ok"]
+    jobs = SimpleNamespace(show_job=lambda job_id: {"id": job_id, "state": states.pop(0)})
+    store = Datastore("store", SimpleNamespace(galaxy_instance=SimpleNamespace(jobs=jobs)), "history_1")  # type: ignore
+    job = Job("tool", store)
+    job.id = "job_1"
+    job.update_status(WorkState.QUEUED)
+    monkeypatch.setattr(cancellation, "WAIT_INTERVAL", 0.001)
+    job.wait_for_results()
+    assert [t.state for t in job.timeline.transitions][-2:] == [WorkState.QUEUED, WorkState.RUNNING]
+
+
+def test_tracked_timelines_are_bounded() -> None:
+    store = Datastore("store", SimpleNamespace(galaxy_instance=None), "history_1")  # type: ignore
+    jobs = [Job("tool", store) for _ in range(data_store.MAX_TIMELINES + 5)]
+    assert len(store.timelines) == data_store.MAX_TIMELINES
+    assert store.timelines[-1] is jobs[-1].timeline
@@ -2,7 +2,7 @@
 
 import asyncio
 import os
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Iterator, List, Tuple
 
 import blinker
 import pytest
@@ -10,6 +10,8 @@ import pytest
 from nova.common.job import WorkState
 from nova.common.signals import Signal, ToolCommand, get_signal_id
 from nova.galaxy import BasicTool, Connection, Parameters, Tool, ToolRunner
+from nova.galaxy.dataset import DataChunk, iter_chunks
+from nova.galaxy.tool_runner import RESULTS_CHUNK_SIGNAL
 
 GALAXY_URL = os.environ.get("NOVA_GALAXY_TEST_GALAXY_URL", "https://calvera-test.ornl.gov")
 GALAXY_API_KEY = os.environ.get("NOVA_GALAXY_TEST_GALAXY_KEY", "")
@@ -69,3 +71,87 @@ async def test_tool_runner(nova_instance: Connection) -> None:
 
     assert results["res"] is not None
     assert "hostname:" in results["res"].decode("utf-8")
+
+
+class InMemoryResultsTool(BasicTool):
+    """Class that returns results without running anything in Galaxy."""
+
+    def __init__(self, results: Any) -> None:
+        super().__init__()
+        self.results = results
+
+    def prepare_tool(self) -> Tuple[Tool, Parameters]:
+        return Tool(id="in_memory"), Parameters()
+
+    def get_results(self, tool: Tool) -> bytes:
+        return self.results
+
+
+@pytest.mark.asyncio
+async def test_tool_runner_results_chunks() -> None:
+    id = "test_results_chunks"
+    runner = ToolRunner(
+        id, InMemoryResultsTool(b"0123456789"), lambda: "nova_galaxy_testing", GALAXY_URL, GALAXY_API_KEY
+    )
+    runner.result_chunk_size = 4
+    runner.nova_tool = Tool(id="in_memory")
+    execution_signal = blinker.signal(get_signal_id(id, Signal.TOOL_COMMAND))
+    chunks_signal = blinker.signal(get_signal_id(id, RESULTS_CHUNK_SIGNAL))
+    chunks: List[Dict[str, Any]] = []
+
+    async def receive_chunk(_sender: Any, **kwargs: Any) -> None:
+        chunks.append(kwargs)
+
+    chunks_signal.connect(receive_chunk, weak=False)
+    responses = await execution_signal.send_async(id, command=ToolCommand.GET_RESULTS)
+    assert responses[0][1]["results"] == b"0123456789"
+    assert [chunk["data"] for chunk in chunks] == [b"0123", b"4567", b"89"]
+    assert chunks[-1]["progress"] == 1.0
+
+    # Results larger than the limit are rejected
+    runner.max_result_size = 5
+    responses = await execution_signal.send_async(id, command=ToolCommand.GET_RESULTS)
+    assert responses[0][1]["results"] is None
+
+
+class StreamingResultsTool(InMemoryResultsTool):
+    """Class that streams its results in chunks of its own."""
+
+    def stream_results(self, tool: Tool, chunk_size: int = 4) -> Iterator[DataChunk]:
+        yield from iter_chunks(self.results, chunk_size)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("results", [None, {"value": 1}, "text"])
+async def test_tool_runner_returns_other_results_unchanged(results: Any) -> None:
+    id = f"test_other_results_{type(results).__name__}"
+    runner = ToolRunner(id, InMemoryResultsTool(results), lambda: "nova_galaxy_testing", GALAXY_URL, GALAXY_API_KEY)
+    runner.nova_tool = Tool(id="in_memory")
+    execution_signal = blinker.signal(get_signal_id(id, Signal.TOOL_COMMAND))
+    responses = await execution_signal.send_async(id, command=ToolCommand.GET_RESULTS)
+    assert responses[0][1]["results"] == results
+
+
+@pytest.mark.asyncio
+async def test_tool_runner_streams_without_keeping_results() -> None:
+    id = "test_streamed_results"
+    runner = ToolRunner(
+        id,
+        StreamingResultsTool(b"0123456789"),
+        lambda: "nova_galaxy_testing",
+        GALAXY_URL,
+        GALAXY_API_KEY,
+        keep_results=False,
+    )
+    runner.nova_tool = Tool(id="in_memory")
+    chunks: List[bytes] = []
+
+    async def receive_chunk(_sender: Any, data: bytes, **kwargs: Any) -> None:
+        chunks.append(data)
+
+    blinker.signal(get_signal_id(id, RESULTS_CHUNK_SIGNAL)).connect(receive_chunk, weak=False)
+    responses = await blinker.signal(get_signal_id(id, Signal.TOOL_COMMAND)).send_async(
+        id, command=ToolCommand.GET_RESULTS
+    )
+    assert responses[0][1]["results"] is None
+    assert b"".join(chunks) == b"0123456789"
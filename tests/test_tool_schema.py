@@ -0,0 +1,124 @@
+"""Tests for tool schemas and parameter validation."""
+
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import pytest
+from nova.common.job import WorkState
+
+from nova.galaxy.data_store import Datastore
+from nova.galaxy.dataset import Dataset, DatasetCollection
+from nova.galaxy.parameters import Parameters
+from nova.galaxy.tool import Tool
+from nova.galaxy.tool_schema import ParameterValidationError, ToolSchemaCache
+
+INPUTS: List[Dict[str, Any]] = [
+    {"name": "input", "type": "data", "optional": False},
+    {"name": "threshold", "type": "float", "min": 0, "max": 1},
+    {"name": "iterations", "type": "integer", "min": 1},
+    {"name": "normalize", "type": "boolean"},
+    {"name": "mode", "type": "select", "options": [["Fast", "fast", True], ["Exact", "exact", False]]},
+    {"name": "advanced", "type": "section", "inputs": [{"name": "label", "type": "text"}]},
+    {
+        "name": "source",
+        "type": "conditional",
+        "test_param": {"name": "kind", "type": "select", "options": [["File", "file", True], ["URL", "url", False]]},
+        "cases": [{"value": "url", "inputs": [{"name": "url", "type": "text"}]}],
+    },
+    {"name": "queries", "type": "repeat", "inputs": [{"name": "query", "type": "data_collection"}]},
+    {"name": "seed", "type": "integer", "optional": True, "min": 0},
+    {"name": "scale", "type": "float", "optional": True},
+    {"name": "channels", "type": "select", "multiple": True, "options": [["A", "a", True], ["B", "b", False]]},
+]
+
+
+class FakeTools:
+    """Galaxy tool client that returns a fixed schema."""
+
+    def __init__(self) -> None:
+        self.requests: List[str] = []
+
+    def show_tool(self, tool_id: str, io_details: bool = False) -> Dict[str, Any]:
+        self.requests.append("show_tool")
+        return {"id": tool_id, "version": "1.0", "inputs": INPUTS}
+
+    def run_tool(self, history_id: str, tool_id: str, tool_inputs: Any) -> Dict[str, Any]:
+        self.requests.append("run_tool")
+        raise AssertionError("Invalid parameters must not be submitted.")
+
+
+def make_params(**values: Any) -> Parameters:
+    params = Parameters()
+    params.add_input("input", Dataset("tests/test_files/test_text_file.txt"))
+    for name, value in values.items():
+        params.add_input(name.replace("__", "|"), value)
+    return params
+
+
+def test_valid_parameters() -> None:
+    cache = ToolSchemaCache(SimpleNamespace(tools=FakeTools()))
+    params = make_params(
+        threshold="0.5",
+        iterations=3,
+        normalize=True,
+        mode="exact",
+        advanced__label="run",
+        source__kind="url",
+        source__url="https://example.org",
+        queries_0__query=DatasetCollection("tests/test_files"),
+    )
+    cache.validate("tool", params)
+    assert cache.get("tool").version == "1.0"
+
+
+@pytest.mark.parametrize("empty", [None, ""])
+def test_empty_optional_numbers(empty: Any) -> None:
+    cache = ToolSchemaCache(SimpleNamespace(tools=FakeTools()))
+    cache.validate("tool", make_params(seed=empty, scale=empty))
+
+
+def test_multiple_select_values() -> None:
+    cache = ToolSchemaCache(SimpleNamespace(tools=FakeTools()))
+    cache.validate("tool", make_params(channels="a,b"))
+    cache.validate("tool", make_params(channels=["a", "b"]))
+    with pytest.raises(ParameterValidationError) as error:
+        cache.validate("tool", make_params(channels="a,c"))
+    assert error.value.errors == ["parameter 'channels' has invalid value 'c', expected one of a, b"]
+
+
+def test_invalid_parameters() -> None:
+    cache = ToolSchemaCache(SimpleNamespace(tools=FakeTools()))
+    params = make_params(threshhold=0.5, iterations=1.5, mode="slow", queries_0__query=Dataset("file.txt"))
+    params.remove_input("input")
+    with pytest.raises(ParameterValidationError) as error:
+        cache.validate("tool", params)
+    assert error.value.errors == [
+        "unknown parameter 'threshhold'. Did you mean 'threshold'?",
+        "parameter 'iterations' expects an integer, got 1.5",
+        "parameter 'mode' has invalid value 'slow', expected one of fast, exact",
+        "parameter 'queries_0|query' expects a dataset collection, got a dataset",
+        "required input 'input' is missing",
+    ]
+
+
+def test_schema_cache_ttl() -> None:
+    tools = FakeTools()
+    cache = ToolSchemaCache(SimpleNamespace(tools=tools), ttl=60)
+    cache.get("tool")
+    cache.get("tool")
+    assert tools.requests == ["show_tool"]
+    cache.ttl = 0
+    cache.get("tool")
+    assert tools.requests == ["show_tool", "show_tool"]
+
+
+def test_validation_before_upload() -> None:
+    tools = FakeTools()
+    galaxy_instance = SimpleNamespace(tools=tools)
+    connection = SimpleNamespace(galaxy_instance=galaxy_instance, tool_schemas=ToolSchemaCache(galaxy_instance))
+    store = Datastore("store", connection, "history_1")  # type: ignore
+    tool = Tool("tool")
+    assert tool.run(store, make_params(iterations=0)) is None
+    assert tool.get_status() == WorkState.ERROR
+    assert "must be at least 1" in tool.get_full_status().details
+    assert tools.requests == ["show_tool"]
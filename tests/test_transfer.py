@@ -0,0 +1,150 @@
+"""Tests for transfer helpers."""
+
+import gzip
+import os
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import pytest
+
+from nova.galaxy import transfer
+from nova.galaxy.cancellation import CancellationToken, OperationCancelledError
+from nova.galaxy.transfer import (
+    BufferReader,
+    TransferSettings,
+    gzip_stream,
+    is_buffer,
+    is_compressed_file,
+    upload_compressed,
+    upload_stream,
+)
+
+
+def test_is_buffer() -> None:
+    assert is_buffer(b"content")
+    assert is_buffer(bytearray(b"content"))
+    assert is_buffer(memoryview(b"content"))
+    assert not is_buffer("content")
+    assert not is_buffer(42)
+
+
+def test_buffer_reader() -> None:
+    content = bytes(range(100))
+    reader = BufferReader(memoryview(content)[10:])
+    assert reader.len == 90
+    assert reader.read(40) == content[10:50]
+    assert reader.len == 50
+    assert reader.read() == content[50:]
+    assert reader.len == 0
+    assert reader.read(10) == b""
+
+
+def test_gzip_stream() -> None:
+    content = b"x,y,e\n" + b"1.0,2.0,0.1\n" * 10000
+    compressed = gzip_stream(BufferReader(content))
+    size = compressed.len
+    assert size < len(content) / 5
+    data = compressed.read()
+    assert len(data) == size
+    assert compressed.len == 0
+    assert gzip.decompress(data) == content
+
+
+def test_is_compressed_file(tmp_path: str) -> None:
+    text_file = f"{tmp_path}/data.csv"
+    gzip_file = f"{tmp_path}/data.csv.gz"
+    with open(text_file, "w") as file:
+        file.write("1,2,3\n")
+    with open(gzip_file, "wb") as file:
+        file.write(gzip.compress(b"1,2,3\n"))
+    assert not is_compressed_file(text_file)
+    assert is_compressed_file(gzip_file)
+
+
+def test_transfer_settings_counters() -> None:
+    settings = TransferSettings(compress=True, compression_threshold=100)
+    assert not settings.should_compress(99)
+    assert settings.should_compress(100)
+    assert not TransferSettings().should_compress(10**9)
+
+    settings.record_upload(1000, 200)
+    settings.record_download(500, 100)
+    assert settings.bytes_sent == 200
+    assert settings.bytes_received_uncompressed == 500
+    assert settings.bytes_saved == 1200
+
+
+def test_upload_stream_payload() -> None:
+    requests: List[Dict[str, Any]] = []
+
+    def make_post_request(url: str, payload: Dict[str, Any], files_attached: bool) -> Dict[str, Any]:
+        assert url == "http://galaxy.invalid/api/tools" and files_attached
+        requests.append(payload)
+        return {"outputs": [{"id": "dataset_1"}]}
+
+    galaxy = SimpleNamespace(url="http://galaxy.invalid/api", make_post_request=make_post_request)
+    stream = BufferReader(b"content")
+    upload_stream(galaxy, "history_1", "data.bin", stream, to_posix_lines=False, auto_decompress=True)
+    payload = requests[0]
+    assert payload["history_id"] == "history_1"
+    assert payload["tool_id"] == "upload1"
+    assert payload["inputs"] == {
+        "file_type": "auto",
+        "dbkey": "?",
+        "files_0|type": "upload_dataset",
+        "files_0|NAME": "data.bin",
+        "files_0|to_posix_lines": False,
+        "files_0|auto_decompress": True,
+    }
+    assert payload["files_0|file_data"].name == "data.bin"
+    assert payload["files_0|file_data"].fd is stream
+
+
+def test_compressed_upload_can_be_cancelled() -> None:
+    token = CancellationToken()
+
+    def make_post_request(url: str, payload: Dict[str, Any], files_attached: bool) -> Dict[str, Any]:
+        stream = payload["files_0|file_data"].fd
+        stream.read(10)
+        token.cancel()
+        stream.read(10)
+        raise AssertionError("The upload must be aborted.")
+
+    galaxy = SimpleNamespace(url="http://galaxy.invalid/api", make_post_request=make_post_request)
+    with pytest.raises(OperationCancelledError):
+        upload_compressed(galaxy, "history_1", "data.csv", BufferReader(bytes(range(256)) * 100), token=token)
+
+
+def test_large_compressed_upload_is_resumable(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(transfer, "RESUMABLE_UPLOAD_THRESHOLD", 100)
+    content = b"x,y,e\n" + b"1.0,2.0,0.1\n" * 1000
+    uploaded: List[Any] = []
+
+    class Uploader:
+        offset = 0
+        chunk_size = 64
+        session_id = "session_1"
+
+        def __init__(self, path: str) -> None:
+            self.path = path
+
+        def get_file_size(self) -> int:
+            return os.path.getsize(self.path)
+
+        def upload(self, stop_at: int) -> None:
+            self.offset = stop_at
+
+    def post_to_fetch(path: str, history_id: str, session_id: str, **kwargs: Any) -> Dict[str, Any]:
+        with open(path, "rb") as file:
+            uploaded.append((gzip.decompress(file.read()), kwargs))
+        return {"outputs": [{"id": "dataset_1"}]}
+
+    galaxy = SimpleNamespace(
+        config=SimpleNamespace(get_version=lambda: {"version_major": "24.1"}),
+        get_tus_uploader=Uploader,
+        tools=SimpleNamespace(post_to_fetch=post_to_fetch),
+    )
+    info, sent = upload_compressed(galaxy, "history_1", "data.csv", BufferReader(content))
+    assert info == {"outputs": [{"id": "dataset_1"}]}
+    assert sent < len(content)
+    assert uploaded == [(content, {"file_name": "data.csv", "to_posix_lines": True, "auto_decompress": True})]
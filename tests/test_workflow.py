@@ -0,0 +1,134 @@
+"""Tests for workflows."""
+
+import time
+from threading import Event
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from nova.common.job import WorkState
+
+from nova.galaxy import Dataset, Datastore, Parameters, Workflow
+
+
+class FakeInvocations:
+    """Simulates a workflow invocation with two steps that run one after the other."""
+
+    def __init__(self, fail: bool = False) -> None:
+        self.polls = 0
+        self.fail = fail
+        self.cancelled = False
+
+    def show_invocation(self, invocation_id: str) -> Dict[str, Any]:
+        return {
+            "id": invocation_id,
+            "state": "scheduled" if self.polls > 0 else "new",
+            "outputs": {"reduced": {"id": "output_1", "src": "hda"}},
+            "output_collections": {},
+        }
+
+    def get_invocation_step_jobs_summary(self, invocation_id: str) -> List[Dict[str, Any]]:
+        self.polls += 1
+        progress: List[List[Dict[str, int]]] = [
+            [{"new": 1}],
+            [{"running": 1}, {"new": 1}],
+            [{"ok": 1}, {"error": 1} if self.fail else {"running": 1}],
+            [{"ok": 1}, {"ok": 1}],
+        ]
+        return [{"states": states} for states in progress[min(self.polls - 1, len(progress) - 1)]]
+
+    def cancel_invocation(self, invocation_id: str) -> None:
+        self.cancelled = True
+
+
+class FakeWorkflows:
+    """Records the inputs of workflow invocations."""
+
+    def __init__(self) -> None:
+        self.inputs: Dict[str, Any] = {}
+
+    def invoke_workflow(self, workflow_id: str, inputs: Dict[str, Any], history_id: str, inputs_by: str) -> Any:
+        self.inputs = inputs
+        return {"id": "invocation_1"}
+
+
+def _store(invocations: FakeInvocations) -> Datastore:
+    galaxy_instance = SimpleNamespace(invocations=invocations, workflows=FakeWorkflows())
+    return Datastore("store", SimpleNamespace(galaxy_instance=galaxy_instance), "history_1")  # type: ignore
+
+
+def test_workflow_run() -> None:
+    invocations = FakeInvocations()
+    store = _store(invocations)
+    existing = Dataset("existing.txt")
+    existing.id = "dataset_1"
+    existing.store = store
+    params = Parameters()
+    params.add_input("data", existing)
+    params.add_input("binning", 0.01)
+
+    workflow = Workflow("workflow_1", poll_interval=0.01)
+    outputs = workflow.run(store, params)
+
+    assert workflow.get_status() == WorkState.FINISHED
+    assert workflow.get_uid() == "invocation_1"
+    assert workflow.get_step_states() == [WorkState.FINISHED, WorkState.FINISHED]
+    assert store.nova_connection.galaxy_instance.workflows.inputs == {  # type: ignore
+        "data": {"src": "hda", "id": "dataset_1"},
+        "binning": 0.01,
+    }
+    assert outputs is not None
+    reduced = outputs.get_dataset("reduced")
+    assert reduced.id == "output_1"
+    assert reduced.store is store
+
+
+def test_workflow_step_error() -> None:
+    workflow = Workflow("workflow_1", poll_interval=0.01)
+    assert workflow.run(_store(FakeInvocations(fail=True)), Parameters()) is None
+    status = workflow.get_full_status()
+    assert status.state == WorkState.ERROR
+    assert "Step 2" in status.details
+    assert workflow.get_step_states() == [WorkState.FINISHED, WorkState.ERROR]
+
+
+def test_workflow_cancel_while_polling() -> None:
+    invocations = FakeInvocations()
+    # Never scheduled, so the invocation is polled until it is canceled.
+    invocations.show_invocation = lambda invocation_id: {"id": invocation_id, "state": "new"}  # type: ignore
+    workflow = Workflow("workflow_1", poll_interval=60)
+    workflow.run(_store(invocations), wait=False)
+    while invocations.polls == 0:
+        time.sleep(0.001)
+
+    start = time.monotonic()
+    workflow.cancel()
+    workflow.wait_for_results()
+    assert time.monotonic() - start < 0.5
+    assert workflow.get_status() == WorkState.CANCELED
+    assert invocations.cancelled
+
+
+def test_workflow_cancel_while_invoking() -> None:
+    invocations = FakeInvocations()
+    store = _store(invocations)
+    invoking = Event()
+    release = Event()
+    workflows = store.nova_connection.galaxy_instance.workflows  # type: ignore
+    invoke_workflow = workflows.invoke_workflow
+
+    def slow_invoke(*args: Any, **kwargs: Any) -> Any:
+        invoking.set()
+        release.wait(5)
+        return invoke_workflow(*args, **kwargs)
+
+    workflows.invoke_workflow = slow_invoke
+    workflow = Workflow("workflow_1", poll_interval=60)
+    workflow.run(store, wait=False)
+    assert invoking.wait(5)
+    workflow.cancel()
+    assert not invocations.cancelled
+    release.set()
+    workflow.wait_for_results()
+    # The cancel is sent once the id of the invocation is known.
+    assert invocations.cancelled
+    assert workflow.get_status() == WorkState.CANCELED